@@ -1,8 +1,9 @@
 from django.contrib import admin
 from .models import (
-    Comment, CommentReport, CommentVote, 
+    Comment, CommentReport, CommentVote, CommentStatus,
     ModerationAction, CommentReportGroup
 )
+from .moderation import delete_thread
 
 
 class CommentReportInline(admin.TabularInline):
@@ -24,10 +25,27 @@ class CommentAdmin(admin.ModelAdmin):
     search_fields = ('content', 'user__username')
     readonly_fields = ('created_at', 'updated_at', 'score')
     inlines = [CommentReportInline, ModerationActionInline]
+    actions = ['delete_threads']
     
     def content_preview(self, obj):
         return obj.content[:50] + "..." if len(obj.content) > 50 else obj.content
     content_preview.short_description = "Content"
+    
+    def delete_threads(self, request, queryset):
+        deleted = replies = 0
+        # Parents first; replies inside an already deleted thread are skipped
+        for comment in queryset.exclude(status=CommentStatus.THREAD_DELETED).order_by('path'):
+            comment.refresh_from_db(fields=['status'])
+            if comment.status in (CommentStatus.THREAD_DELETED, CommentStatus.REPLY_TO_DELETED):
+                continue
+            replies += delete_thread(
+                comment,
+                moderator=request.user,
+                reason=f"Thread deleted from the admin by {request.user.username}",
+            )
+            deleted += 1
+        self.message_user(request, f'{deleted} threads deleted ({replies} replies marked).')
+    delete_threads.short_description = 'Delete selected threads'
 
 
 @admin.register(CommentReport)
@@ -44,6 +44,9 @@ class CommentViewSet(viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
     
+    def get_queryset(self):
+        return Comment.objects.with_user_vote(self.request.user)
+    
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return CommentDetailSerializer
@@ -74,6 +77,8 @@ class CommentViewSet(viewsets.ModelViewSet):
                 )
                 
                 # Return the updated comment
+                comment.score = comment.get_current_score()
+                comment.user_vote = vote.vote_type
                 serializer = CommentSerializer(comment, context={'request': request})
                 return Response(serializer.data)
                 
@@ -93,6 +98,8 @@ class CommentViewSet(viewsets.ModelViewSet):
             vote.delete()
             
             # Return the updated comment
+            comment.score = comment.get_current_score()
+            comment.user_vote = None
             serializer = CommentSerializer(comment, context={'request': request})
             return Response(serializer.data)
             
@@ -108,7 +115,7 @@ class CommentViewSet(viewsets.ModelViewSet):
     def replies(self, request, pk=None):
         """Get all direct replies to a comment"""
         comment = self.get_object()
-        replies = comment.replies.all()
+        replies = comment.replies.with_user_vote(request.user)
         
         page = self.paginate_queryset(replies)
         if page is not None:
@@ -205,8 +212,10 @@ def filtered_comments_api(request):
         statuses = data.get('statuses', ['APPROVED', 'PENDING'])
         # object_type and object_id already extracted above
 
-        # Build the base queryset
-        comments = Comment.objects.select_related('user').prefetch_related('replies__user')
+        # Build the base queryset with the user's votes and the whole reply tree
+        comments = Comment.objects.select_related('user').with_user_vote(request.user).with_changelog().with_reply_tree(
+            Comment.objects.select_related('user').with_user_vote(request.user).with_changelog()
+        )
 
         # Filter by object type and ID
         if object_type == 'project' and object_id:
@@ -268,19 +277,6 @@ def filtered_comments_api(request):
         total_count = total_comments.count()
         filtered_count = comments.count()
 
-        # Add user vote info
-        if request.user.is_authenticated:
-            from .models import CommentVote
-            user_votes = {
-                vote.comment_id: vote.vote_type
-                for vote in CommentVote.objects.filter(
-                    user=request.user,
-                    comment__in=comments
-                )
-            }
-            for comment in comments:
-                comment.user_vote = user_votes.get(comment.id)
-
         # Prepare rendering context
         context = {
             'comments': comments,
@@ -353,8 +349,10 @@ def filtered_comments_view(request):
         statuses = data.get('statuses', ['APPROVED', 'PENDING'])
         # object_type and object_id already extracted above
         
-        # Build the base queryset
-        comments = Comment.objects.select_related('user').prefetch_related('replies__user')
+        # Build the base queryset with the user's votes and the whole reply tree
+        comments = Comment.objects.select_related('user').with_user_vote(request.user).with_changelog().with_reply_tree(
+            Comment.objects.select_related('user').with_user_vote(request.user).with_changelog()
+        )
         # Filter by object type and ID
         if object_type == 'project' and object_id:
             comments = comments.filter(to_project_id=object_id, parent__isnull=True)
@@ -410,24 +408,9 @@ def filtered_comments_view(request):
                 parent__isnull=True
             )
 
-        comments = comments
         total_count = total_comments.count()
         filtered_count = comments.count()
         
-        # Add user vote information
-        if request.user.is_authenticated:
-            from .models import CommentVote
-            user_votes = {
-                vote.comment_id: vote.vote_type 
-                for vote in CommentVote.objects.filter(
-                    user=request.user,
-                    comment__in=comments
-                )
-            }
-            
-            for comment in comments:
-                comment.user_vote = user_votes.get(comment.id)
-        
         # Render the comments
         context = {
             'comments': comments,
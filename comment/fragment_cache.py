@@ -0,0 +1,146 @@
+"""
+Cache of rendered comment nodes.
+
+comments.html renders the body of every comment (comment_node.html) through
+the {% comment_node %} tag, which keeps the HTML in the cache named by
+COMMENT_FRAGMENT_CACHE_ALIAS. A fragment is keyed by
+
+* the comment id and a per-comment version,
+* its updated_at, status, score and total_replies,
+* the viewer's permission class (staff, superuser, moderator of the
+  comment, author, or plain reader),
+* the object the thread is shown on (the reply form and admin link point
+  at it),
+
+so a cached node renders exactly like a fresh one for that viewer. Edits,
+moderation log entries and votes bump the comment's version once their
+transaction commits; a reply added, moved between statuses or deleted
+bumps the versions of all its ancestors, whose reply counts it changes.
+
+Nested replies are rendered outside the fragment, and the parts that vary
+per request (the CSRF token and the relative creation time) are
+stored as markers and filled in on every render. Author names and avatars
+are only picked up once the entry expires.
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.humanize.templatetags.humanize import naturaltime
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.template import Context
+from django.template.defaulttags import CsrfTokenNode
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+
+from comment.models import Comment, CommentVote, CommentChangeLog
+
+
+NODE_TEMPLATE = 'comment_node.html'
+
+CSRF_MARKER = 'comment-fragment-csrf-token'
+CREATED_AT_MARKER = 'comment-fragment-created-at'
+
+def get_cache():
+    return caches[getattr(settings, 'COMMENT_FRAGMENT_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'COMMENT_FRAGMENT_CACHE_TIMEOUT', 300)
+
+
+def _version_key(comment_id):
+    return f'comment_node:version:{comment_id}'
+
+
+def _entry_key(comment, version, viewer, target):
+    updated_at = comment.updated_at.timestamp() if comment.updated_at else ''
+    return (
+        f'comment_node:{comment.pk}:{version}:{viewer}:{target}:'
+        f'{updated_at}:{comment.status}:{comment.score}:{comment.total_replies}'
+    )
+
+
+def viewer_class(comment, user, can_moderate):
+    """The permission class the rendered node depends on, e.g. 'staff-author'"""
+    if not user or not user.is_authenticated:
+        return 'anonymous'
+    flags = []
+    if user.is_staff:
+        flags.append('staff')
+    if user.is_superuser:
+        flags.append('superuser')
+    if can_moderate and not flags:
+        flags.append('moderator')
+    if comment.user_id == user.pk:
+        flags.append('author')
+    return '-'.join(flags) or 'reader'
+
+
+def thread_target(context):
+    """The ids of the objects comment_node.html links the node to"""
+    return '.'.join(
+        str(getattr(context.get(name), 'pk', '') or '')
+        for name in ('problem', 'project', 'task', 'need')
+    )
+
+
+def _csrf_placeholder():
+    return CsrfTokenNode().render(Context({'csrf_token': CSRF_MARKER}))
+
+
+def _fill_in(html, comment, context):
+    html = html.replace(_csrf_placeholder(), CsrfTokenNode().render(context))
+    return html.replace(CREATED_AT_MARKER, conditional_escape(naturaltime(comment.created_at)))
+
+
+def render_node(context, comment, viewer):
+    """comment_node.html for one comment, from the cache when possible"""
+    cache = get_cache()
+    version = cache.get(_version_key(comment.pk), '0')
+    key = _entry_key(comment, version, viewer, thread_target(context))
+    html = cache.get(key)
+    if html is None:
+        template = context.template.engine.get_template(NODE_TEMPLATE)
+        with context.push(comment=comment, csrf_token=CSRF_MARKER, natural_created_at=CREATED_AT_MARKER):
+            html = template.render(context)
+        cache.set(key, html, get_timeout())
+    return mark_safe(_fill_in(html, comment, context))
+
+
+def invalidate(comment_ids):
+    """Retire the cached nodes of some comments by moving them to new versions"""
+    comment_ids = {comment_id for comment_id in comment_ids if comment_id}
+    if not comment_ids:
+        return
+    get_cache().set_many({_version_key(comment_id): uuid.uuid4().hex for comment_id in comment_ids}, None)
+
+
+def schedule_invalidate(comment_ids):
+    """invalidate() once the current transaction commits"""
+    comment_ids = set(comment_ids)
+    if comment_ids:
+        transaction.on_commit(lambda: invalidate(comment_ids))
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # The reply counts of every ancestor change along with the comment
+    ancestor_ids = instance.get_ancestor_ids() if instance.path else []
+    schedule_invalidate([instance.pk, instance.parent_id, *ancestor_ids])
+
+
+@receiver([post_save, post_delete], sender=CommentVote)
+def invalidate_voted_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_invalidate([instance.comment_id])
+
+
+@receiver([post_save, post_delete], sender=CommentChangeLog)
+def invalidate_changed_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_invalidate([instance.comment_id])
@@ -0,0 +1,281 @@
+"""
+Compressed storage of comment content history.
+
+Changelog entries refer to versions of a comment's text by number
+(CommentChangeLog.previous_revision / new_revision) instead of carrying
+copies of it. The versions are CommentRevision rows, zlib-compressed:
+every COMMENT_HISTORY_SNAPSHOT_INTERVAL-th one is a full snapshot, the
+others are deltas against the version before (a list of ranges copied
+from it and strings inserted). Reading a version replays the rows from
+the snapshot it is based on, so at most that many; a version equal to
+the latest one is not stored again.
+
+Entries written before revisions existed carry the text in
+previous_content / new_content, and older edits only live in
+Comment.edit_history; `manage.py compact_comment_history` moves both
+into revisions.
+"""
+import hashlib
+import json
+import zlib
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from comment.models import Comment, CommentChangeLog, CommentRevision, ModerationAction, ChangeType
+
+
+# Texts longer than this are stored as snapshots, diffing them costs more than it saves
+MAX_DELTA_LENGTH = 50000
+
+
+def get_snapshot_interval():
+    return getattr(settings, 'COMMENT_HISTORY_SNAPSHOT_INTERVAL', 10)
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def make_delta(old, new):
+    """Operations rebuilding new from old: [start, end] copies old[start:end], a string is inserted"""
+    operations = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            operations.append([i1, i2])
+        elif j2 > j1:
+            operations.append(new[j1:j2])
+    return operations
+
+
+def apply_delta(old, operations):
+    return ''.join(
+        old[operation[0]:operation[1]] if isinstance(operation, list) else operation
+        for operation in operations
+    )
+
+
+def _encode_snapshot(text):
+    return zlib.compress(text.encode())
+
+
+def _encode_delta(old, new):
+    return zlib.compress(json.dumps(make_delta(old, new), separators=(',', ':')).encode())
+
+
+def decode(revision, previous_text):
+    """The text of a revision, given the text of the one before it for a delta"""
+    data = zlib.decompress(bytes(revision.data)).decode()
+    if revision.is_snapshot:
+        return data
+    return apply_delta(previous_text, json.loads(data))
+
+
+def _replay(revisions):
+    """{number: text} for revisions of one comment in order, starting at a snapshot"""
+    texts = {}
+    text = None
+    for revision in revisions:
+        text = decode(revision, text)
+        texts[revision.number] = text
+    return texts
+
+
+def build_revision(comment_id, number, text, previous=None, previous_text=None):
+    """
+    An unsaved CommentRevision holding text as revision number, a delta
+    against previous (the revision before, whose text is previous_text)
+    unless a snapshot is due or would be as small
+    """
+    revision = CommentRevision(comment_id=comment_id, number=number, base=number, digest=_digest(text))
+    snapshot = _encode_snapshot(text)
+    revision.data = snapshot
+    if (
+        previous is not None
+        and number - previous.base < get_snapshot_interval()
+        and max(len(text), len(previous_text)) <= MAX_DELTA_LENGTH
+    ):
+        delta = _encode_delta(previous_text, text)
+        if len(delta) < len(snapshot):
+            revision.base = previous.base
+            revision.data = delta
+    return revision
+
+
+def record(comment, content):
+    """
+    The number of the revision holding content, stored as a new revision
+    of the comment unless it equals the latest one. None for no content.
+    """
+    if content is None:
+        return None
+    with transaction.atomic():
+        latest = CommentRevision.objects.select_for_update().filter(
+            comment_id=comment.pk
+        ).order_by('-number').first()
+        if latest is None:
+            revision = build_revision(comment.pk, 0, content)
+        elif latest.digest == _digest(content):
+            return latest.number
+        else:
+            chain = CommentRevision.objects.filter(
+                comment_id=comment.pk, number__gte=latest.base, number__lte=latest.number
+            ).order_by('number')
+            revision = build_revision(
+                comment.pk, latest.number + 1, content, latest, _replay(chain)[latest.number]
+            )
+        revision.save()
+    return revision.number
+
+
+def texts(wanted):
+    """
+    {(comment_id, number): text} for {comment_id: [number, ...]}, in two
+    queries: one for the snapshots the revisions are based on, one for
+    the rows from there on
+    """
+    wanted = {comment_id: set(numbers) for comment_id, numbers in wanted.items() if numbers}
+    if not wanted:
+        return {}
+    query = Q(pk__in=[])
+    for comment_id, numbers in wanted.items():
+        query |= Q(comment_id=comment_id, number__in=numbers)
+    ranges = {}
+    for comment_id, number, base in CommentRevision.objects.filter(query).values_list(
+        'comment_id', 'number', 'base'
+    ):
+        low, high = ranges.get(comment_id, (base, number))
+        ranges[comment_id] = (min(low, base), max(high, number))
+
+    query = Q(pk__in=[])
+    for comment_id, (low, high) in ranges.items():
+        query |= Q(comment_id=comment_id, number__gte=low, number__lte=high)
+    chains = defaultdict(list)
+    for revision in CommentRevision.objects.filter(query).order_by('comment_id', 'number'):
+        chains[revision.comment_id].append(revision)
+
+    found = {}
+    for comment_id, chain in chains.items():
+        for number, text in _replay(chain).items():
+            if number in wanted[comment_id]:
+                found[(comment_id, number)] = text
+    return found
+
+
+def versions(comment):
+    """Every stored version of a comment's text, oldest first"""
+    return list(_replay(CommentRevision.objects.filter(comment_id=comment.pk).order_by('number')).values())
+
+
+def attach_content(entries):
+    """Fill in previous_content / new_content of changelog entries that refer to revisions"""
+    wanted = defaultdict(set)
+    for entry in entries:
+        for number in (entry.previous_revision, entry.new_revision):
+            if number is not None:
+                wanted[entry.comment_id].add(number)
+    found = texts(wanted)
+    for entry in entries:
+        if entry.previous_revision is not None:
+            entry.previous_content = found.get((entry.comment_id, entry.previous_revision), '')
+        if entry.new_revision is not None:
+            entry.new_content = found.get((entry.comment_id, entry.new_revision))
+    return entries
+
+
+def original_content(comment):
+    """The content before the first logged change, or the first stored revision"""
+    first_change = comment.change_log.exclude(
+        previous_content='', previous_revision__isnull=True
+    ).order_by('timestamp', 'id').first()
+    if first_change is None:
+        number = 0
+    elif first_change.previous_revision is None:
+        return first_change.previous_content
+    else:
+        number = first_change.previous_revision
+    return texts({comment.pk: [number]}).get((comment.pk, number), comment.content)
+
+
+def _legacy_versions(comment, entries):
+    """
+    The versions of a comment's text in order, with the (entry, field) pairs
+    pointing at each one, from its edit history and changelog
+    """
+    versions = []
+
+    def add(text, pointer=None):
+        if not versions or versions[-1][0] != text:
+            versions.append((text, []))
+        if pointer:
+            versions[-1][1].append(pointer)
+
+    # edit_history holds the text each edit replaced; edits from before the
+    # changelog have no entry, later ones are repeated by their entry
+    first_logged = entries[0].timestamp if entries else None
+    for item in comment.edit_history or []:
+        edited_at = parse_datetime(item.get('edited_at') or '')
+        if first_logged is None or edited_at is None or edited_at < first_logged:
+            add(item.get('content', ''))
+    if not entries:
+        if versions:
+            add(comment.content)
+        return versions
+
+    for entry in entries:
+        for field in ('previous', 'new'):
+            text = getattr(entry, f'{field}_content')
+            if text or (text is not None and getattr(entry, f'{field}_revision') is not None):
+                add(text, (entry, field))
+    return versions
+
+
+def compact(comment):
+    """
+    Rewrite the history of one comment as revisions: the text carried by
+    its changelog entries and edit_history is stored once per version and
+    the entries point at it. Returns the number of revisions written.
+    """
+    with transaction.atomic():
+        entries = attach_content(list(
+            CommentChangeLog.objects.select_for_update().filter(comment=comment).order_by('timestamp', 'id')
+        ))
+        versions = _legacy_versions(comment, entries)
+
+        revisions = []
+        previous_text = None
+        for number, (text, pointers) in enumerate(versions):
+            revisions.append(build_revision(
+                comment.pk, number, text, revisions[-1] if revisions else None, previous_text
+            ))
+            previous_text = text
+            for entry, field in pointers:
+                setattr(entry, f'{field}_revision', number)
+                setattr(entry, f'{field}_content', '' if field == 'previous' else None)
+
+        CommentRevision.objects.filter(comment=comment).delete()
+        CommentRevision.objects.bulk_create(revisions)
+        CommentChangeLog.objects.bulk_update(
+            entries, ['previous_revision', 'new_revision', 'previous_content', 'new_content'], batch_size=500
+        )
+        if comment.edit_history:
+            Comment.objects.filter(pk=comment.pk).update(edit_history=[])
+        # The edit's changelog entry now holds the moderator's original text
+        ModerationAction.objects.filter(
+            comment=comment,
+            changelog_entries__change_type=ChangeType.MODERATOR_EDIT,
+        ).exclude(original_content=None).update(original_content=None)
+    return len(revisions)
+
+
+def needs_compaction():
+    """Comments whose history still carries full copies of their text"""
+    return Comment.objects.filter(
+        Q(change_log__previous_content__gt='') |
+        Q(change_log__new_content__isnull=False) |
+        ~Q(edit_history=[])
+    ).distinct()
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from comment import history
+
+
+class Command(BaseCommand):
+    help = 'Move the comment text copied into changelog entries and edit histories into compressed revisions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Comments read per query')
+
+    def handle(self, *args, **options):
+        comment_count = 0
+        revision_count = 0
+        comments = history.needs_compaction().order_by('pk')
+        last_pk = 0
+        while True:
+            batch = list(comments.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            for comment in batch:
+                revision_count += history.compact(comment)
+            comment_count += len(batch)
+            last_pk = batch[-1].pk
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully compacted the history of {comment_count} comments into {revision_count} revisions'
+            )
+        )
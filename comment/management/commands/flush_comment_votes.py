@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from comment.models import flush_vote_buffer
+
+
+class Command(BaseCommand):
+    help = 'Apply buffered comment vote deltas to comment scores'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--every',
+            type=int,
+            default=0,
+            help='Keep running and flush every N seconds'
+        )
+    
+    def handle(self, *args, **options):
+        interval = options['every']
+        while True:
+            updated_count = flush_vote_buffer()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Successfully flushed votes for {updated_count} comments'
+                )
+            )
+            if not interval:
+                break
+            time.sleep(interval)
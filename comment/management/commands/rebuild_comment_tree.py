@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from comment.models import Comment, TREE_PATH_STEP
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized thread path and depth of all comments'
+    
+    def handle(self, *args, **options):
+        positions = {}
+        updated = []
+        # Parents always have a lower id than their replies
+        for comment in Comment.objects.only('id', 'parent_id').order_by('id').iterator():
+            parent_path, parent_depth = positions.get(comment.parent_id, ('', -1))
+            comment.path = f"{parent_path}{comment.pk:0{TREE_PATH_STEP}d}/"
+            comment.depth = parent_depth + 1
+            positions[comment.pk] = (comment.path, comment.depth)
+            updated.append(comment)
+        
+        Comment.objects.bulk_update(updated, ['path', 'depth'], batch_size=500)
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully rebuilt thread index for {len(updated)} comments'
+            )
+        )
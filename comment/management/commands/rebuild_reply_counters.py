@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from comment.models import rebuild_reply_counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuild total_replies and per-status descendant counters of all comments'
+    
+    def handle(self, *args, **options):
+        counter_count = rebuild_reply_counters()
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully rebuilt reply counters ({counter_count} descendant counters)'
+            )
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from comment.models import CommentReportGroup
+
+
+class Command(BaseCommand):
+    help = 'Recompute all comment report groups from one grouped query over the reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Groups written per query')
+
+    def handle(self, *args, **options):
+        group_count = CommentReportGroup.rebuild(batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully rebuilt {group_count} report groups'
+            )
+        )
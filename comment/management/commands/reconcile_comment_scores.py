@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from comment.models import reconcile_comment_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute all comment scores from their votes'
+    
+    def handle(self, *args, **options):
+        updated_count = reconcile_comment_scores()
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully reconciled scores of {updated_count} comments'
+            )
+        )
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:36
+
+from django.db import migrations, models
+
+
+def build_comment_tree(apps, schema_editor):
+    Comment = apps.get_model('comment', 'Comment')
+    positions = {}
+    updated = []
+    # Parents always have a lower id than their replies
+    for comment in Comment.objects.only('id', 'parent_id').order_by('id').iterator():
+        parent_path, parent_depth = positions.get(comment.parent_id, ('', -1))
+        comment.path = f"{parent_path}{comment.pk:010d}/"
+        comment.depth = parent_depth + 1
+        positions[comment.pk] = (comment.path, comment.depth)
+        updated.append(comment)
+    Comment.objects.bulk_update(updated, ['path', 'depth'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comment', '0005_comment_to_problem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=2048),
+        ),
+        migrations.RunPython(build_comment_tree, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def count_descendants(apps, schema_editor):
+    Comment = apps.get_model('comment', 'Comment')
+    CommentDescendantCount = apps.get_model('comment', 'CommentDescendantCount')
+    totals = {}
+    for path, status in Comment.objects.values_list('path', 'status').iterator():
+        for segment in path.split('/')[:-2]:
+            key = (int(segment), status)
+            totals[key] = totals.get(key, 0) + 1
+    CommentDescendantCount.objects.bulk_create(
+        [CommentDescendantCount(comment_id=pk, status=status, count=count)
+         for (pk, status), count in totals.items()],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comment', '0006_comment_tree_path'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentDescendantCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending Approval'), ('APPROVED', 'Approved'), ('REJECTED', 'Rejected'), ('FLAGGED', 'Flagged for Review'), ('CONTENT_REMOVED', 'Content Removed by Moderation'), ('AUTHOR_REMOVED', 'Author Hidden by Moderation'), ('AUTHOR_AND_CONTENT_REMOVED', 'Author and Content Removed'), ('THREAD_DELETED', 'Thread Deleted by Moderation'), ('REPLY_TO_DELETED', 'Reply to Deleted Comment')], max_length=26)),
+                ('count', models.IntegerField(default=0)),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_counts', to='comment.comment')),
+            ],
+            options={
+                'unique_together': {('comment', 'status')},
+            },
+        ),
+        migrations.RunPython(count_descendants, migrations.RunPython.noop),
+    ]
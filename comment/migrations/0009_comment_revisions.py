@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comment', '0008_commentvotebuffer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='commentchangelog',
+            name='new_revision',
+            field=models.PositiveIntegerField(blank=True, help_text='Revision holding the content after the change', null=True),
+        ),
+        migrations.AddField(
+            model_name='commentchangelog',
+            name='previous_revision',
+            field=models.PositiveIntegerField(blank=True, help_text='Revision holding the content before the change', null=True),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='edit_history',
+            field=models.JSONField(blank=True, default=list, help_text='Edits made before revisions were stored (see manage.py compact_comment_history)'),
+        ),
+        migrations.AlterField(
+            model_name='commentchangelog',
+            name='new_content',
+            field=models.TextField(blank=True, help_text='Content after the change (entries not yet compacted into revisions)', null=True),
+        ),
+        migrations.AlterField(
+            model_name='commentchangelog',
+            name='previous_content',
+            field=models.TextField(blank=True, help_text='Content before the change (entries not yet compacted into revisions)'),
+        ),
+        migrations.CreateModel(
+            name='CommentRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('base', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('digest', models.CharField(max_length=40)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='comment.comment')),
+            ],
+            options={
+                'ordering': ['comment', 'number'],
+                'constraints': [models.UniqueConstraint(fields=('comment', 'number'), name='unique_comment_revision')],
+            },
+        ),
+    ]
@@ -1,13 +1,16 @@
-from django.db import models
+from django.db import models, transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
 from django.utils import timezone
 
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Q, F, Case, When, Value, Min, Max, Exists, OuterRef
+from django.db.models.functions import Coalesce, Concat, Greatest, RowNumber
 from django.utils.translation import gettext_lazy as _
 
-import uuid
+
+# Width of one zero-padded id segment in Comment.path
+TREE_PATH_STEP = 10
 
 
 class CommentStatus(models.TextChoices):
@@ -24,6 +27,128 @@ class CommentStatus(models.TextChoices):
     REPLY_TO_DELETED = 'REPLY_TO_DELETED', 'Reply to Deleted Comment'
 
 
+class CommentQuerySet(models.QuerySet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._reply_tree_queryset = None
+        self._changelog_recent = None
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._reply_tree_queryset = self._reply_tree_queryset
+        clone._changelog_recent = self._changelog_recent
+        return clone
+
+    def _fetch_all(self):
+        attach = (
+            self._result_cache is None
+            and issubclass(self._iterable_class, models.query.ModelIterable)
+        )
+        super()._fetch_all()
+        if attach and self._changelog_recent is not None:
+            attach_changelog(self._result_cache, self._changelog_recent)
+        if attach and self._reply_tree_queryset is not None:
+            self._reply_tree_queryset.attach_reply_tree(self._result_cache)
+
+    def with_user_vote(self, user):
+        """
+        Annotate each comment with ``user_vote``: the given user's vote type,
+        or None, read through a subquery instead of a query per comment.
+        """
+        if not user or not user.is_authenticated:
+            return self.annotate(user_vote=Value(None, output_field=models.CharField()))
+        vote = CommentVote.objects.filter(
+            comment=models.OuterRef('pk'), user=user
+        ).values('vote_type')[:1]
+        return self.annotate(user_vote=models.Subquery(vote))
+
+    def with_reply_tree(self, replies=None):
+        """
+        When evaluated, attach the full reply tree of every comment in one
+        extra query (see ``attach_reply_tree``). ``replies`` is the queryset
+        replies are loaded from, e.g. filtered by status or annotated with
+        ``with_user_vote``.
+        """
+        clone = self._chain()
+        clone._reply_tree_queryset = replies if replies is not None else self.model.objects.all()
+        return clone
+
+    def with_changelog(self, recent=0):
+        """
+        When evaluated, attach changelog counts (and the latest ``recent``
+        entries) to every comment with ``attach_changelog``, so the
+        changelog template tags don't query per comment. Use it on the
+        queryset passed to ``with_reply_tree`` as well to cover the replies.
+        """
+        clone = self._chain()
+        clone._changelog_recent = recent
+        return clone
+
+    def descendants_of(self, comment, include_self=False):
+        """
+        All replies below ``comment`` at any depth, in thread order.
+
+        Uses a range scan over the indexed ``path`` column, so the whole
+        subtree comes back in one query regardless of depth.
+        """
+        lower, upper = comment.get_subtree_path_range()
+        if include_self:
+            queryset = self.filter(path__gte=lower, path__lt=upper)
+        else:
+            queryset = self.filter(path__gt=lower, path__lt=upper)
+        return queryset.order_by('path')
+
+    def subtree_depth(self, comment):
+        """Number of reply levels below ``comment`` (0 if it has no replies)"""
+        deepest = self.descendants_of(comment).aggregate(deepest=models.Max('depth'))['deepest']
+        if deepest is None:
+            return 0
+        return deepest - comment.depth
+
+    def subtree_status_counts(self, comment):
+        """Count replies below ``comment`` per status in a single query"""
+        rows = self.descendants_of(comment).order_by().values('status').annotate(total=Count('id'))
+        return {row['status']: row['total'] for row in rows}
+
+    def attach_reply_tree(self, roots):
+        """
+        Load every reply below ``roots`` from this queryset in one query and
+        populate each node's ``replies`` cache, so ``comment.replies.all`` can
+        be walked to any depth without further queries.
+
+        Replies whose parent is excluded by this queryset's filters are
+        dropped along with their subtree, matching how the thread renders.
+        Descendant counters are prefetched for every node as well.
+        """
+        roots = list(roots)
+        if not roots:
+            return roots
+
+        ranges = Q()
+        for root in roots:
+            lower, upper = root.get_subtree_path_range()
+            ranges |= Q(path__gt=lower, path__lt=upper)
+
+        nodes = {root.pk: root for root in roots}
+        children = {root.pk: [] for root in roots}
+        for reply in self.filter(ranges).order_by('path'):
+            if reply.parent_id not in nodes:
+                continue
+            nodes[reply.pk] = reply
+            children[reply.pk] = []
+            children[reply.parent_id].append(reply)
+
+        models.prefetch_related_objects(list(nodes.values()), 'descendant_counts')
+        for pk, node in nodes.items():
+            replies = node.replies.all()
+            replies._result_cache = children[pk]
+            replies._prefetch_done = True
+            if not hasattr(node, '_prefetched_objects_cache'):
+                node._prefetched_objects_cache = {}
+            node._prefetched_objects_cache['replies'] = replies
+        return roots
+
+
 class Comment(models.Model):
     content = models.TextField("description")
     score = models.IntegerField(default=0)
@@ -85,11 +210,89 @@ class Comment(models.Model):
 
     is_edited = models.BooleanField(default=False)
     edit_history = models.JSONField(default=list, blank=True,
-        help_text="History of edits to this comment")
+        help_text="Edits made before revisions were stored (see manage.py compact_comment_history)")
+
+    # Thread index: zero-padded ids from the thread root down to this comment
+    path = models.CharField(max_length=2048, blank=True, default='', editable=False, db_index=True)
+    depth = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = CommentQuerySet.as_manager()
+
+    # Maintained by set-based UPDATEs, so a plain save() must not write back stale copies
+    DERIVED_FIELDS = ('score', 'total_replies', 'path', 'depth')
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so reply counters can be shifted on save,
+        # and the stored project so moving the comment refreshes both projects' stats
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_to_project_id = instance.__dict__.get('to_project_id')
+        return instance
+
+    def get_ancestor_ids(self):
+        """Ids of every comment above this one, read from the thread path"""
+        return [int(segment) for segment in self.path.split('/')[:-2]]
+
+    def get_descendant_count(self, include_statuses=None):
+        """
+        Count replies at any depth below this comment, like
+        get_total_nested_replies: a reply only counts when every reply
+        between it and this comment is included too.
+
+        The stored per-status counters answer directly when no reply in the
+        subtree is excluded; otherwise one query counts the included replies
+        with no excluded reply on their path.
+
+        Args:
+            include_statuses: List of statuses to include. If None, includes only APPROVED
+        """
+        if include_statuses is None:
+            include_statuses = [CommentStatus.APPROVED]
+        counters = self.descendant_counts.all()
+        if not any(counter.count and counter.status not in include_statuses for counter in counters):
+            return sum(counter.count for counter in counters if counter.status in include_statuses)
+
+        subtree = Comment.objects.descendants_of(self).order_by()
+        hidden_above = subtree.exclude(status__in=include_statuses).annotate(
+            path_upper=Concat('path', Value('~'))
+        ).filter(path__lt=OuterRef('path'), path_upper__gt=OuterRef('path'))
+        return subtree.filter(status__in=include_statuses).exclude(Exists(hidden_above)).count()
+
+    def get_current_score(self):
+        """Stored score plus any vote deltas still waiting in the buffer"""
+        score = Comment.objects.filter(pk=self.pk).values_list('score', flat=True).first() or 0
+        if getattr(settings, 'COMMENT_VOTE_BUFFERING', False):
+            pending = self.vote_buffer.aggregate(total=Sum('delta'))['total']
+            score += pending or 0
+        return score
+
+    def get_subtree_path_range(self):
+        """Bounds of the ``path`` range covering this comment and its replies"""
+        # Paths only contain digits and '/', which all sort below '~'
+        return self.path, self.path + '~'
+
+    def _get_visible_descendants(self, include_statuses, queryset):
+        """Walk a subtree in path order, skipping branches under excluded replies"""
+        visible = {self.pk}
+        descendants = []
+        for reply in queryset:
+            if reply.parent_id in visible and reply.status in include_statuses:
+                visible.add(reply.pk)
+                descendants.append(reply)
+        return descendants
 
     def get_total_nested_replies(self, include_statuses=None):
         """
-        Recursively count all nested replies (replies to replies, etc.)
+        Count all nested replies (replies to replies, etc.)
         
         Args:
             include_statuses: List of statuses to include. If None, includes only APPROVED
@@ -97,17 +300,8 @@ class Comment(models.Model):
         if include_statuses is None:
             include_statuses = [CommentStatus.APPROVED]
         
-        # Get direct replies with the specified statuses
-        direct_replies = self.replies.filter(status__in=include_statuses)
-        
-        # Count direct replies
-        total_count = direct_replies.count()
-        
-        # Recursively count nested replies
-        for reply in direct_replies:
-            total_count += reply.get_total_nested_replies(include_statuses)
-        
-        return total_count
+        subtree = Comment.objects.descendants_of(self).only('id', 'parent_id', 'status')
+        return len(self._get_visible_descendants(include_statuses, subtree))
 
     def get_all_nested_replies(self, include_statuses=None):
         """
@@ -128,27 +322,16 @@ class Comment(models.Model):
                 CommentStatus.AUTHOR_AND_CONTENT_REMOVED,
             ]
         
-        all_replies = []
-        
-        # Get direct replies
-        direct_replies = self.replies.filter(status__in=include_statuses)
-        
-        for reply in direct_replies:
-            all_replies.append(reply)
-            # Recursively get nested replies
-            all_replies.extend(reply.get_all_nested_replies(include_statuses))
-        
-        return all_replies
+        subtree = Comment.objects.descendants_of(self)
+        return self._get_visible_descendants(include_statuses, subtree)
 
     def __str__(self):
         return f"{self.content[:20]} by {self.user.username if self.user else self.author_name or 'Anonymous'}"
 
     def update_reply_count(self):
-        comment = self
-        while comment:
-            comment.total_replies = comment.replies.filter(status=CommentStatus.APPROVED).count()
-            comment.save(update_fields=["total_replies"])
-            comment = comment.parent
+        """Recount approved direct replies from scratch"""
+        self.total_replies = self.replies.filter(status=CommentStatus.APPROVED).count()
+        Comment.objects.filter(pk=self.pk).update(total_replies=self.total_replies)
 
     def approve(self, moderator=None):
         self.status = CommentStatus.APPROVED
@@ -173,16 +356,8 @@ class Comment(models.Model):
         self.save()
 
     def edit(self, new_content, editor=None):
-        history_entry = {
-            'content': self.content,
-            'edited_at': timezone.now().isoformat(),
-            'edited_by': editor.username if editor else None
-        }
-        if not self.is_edited:
-            self.is_edited = True
-            self.edit_history = [history_entry]
-        else:
-            self.edit_history.append(history_entry)
+        # Earlier versions are kept as revisions by the changelog entry of the edit
+        self.is_edited = True
         self.content = new_content
         self.save()
 
@@ -205,24 +380,9 @@ class Comment(models.Model):
         return False
 
     def soft_delete_thread(self, moderator=None, reason=None):
-        self.status = CommentStatus.THREAD_DELETED
-        self.moderated_by = moderator
-        self.moderated_at = timezone.now()
-        if reason:
-            self.moderation_note = reason
-        self.save()
-        self.mark_replies_deleted(moderator)
-
-    def mark_replies_deleted(self, moderator=None):
-        for reply in self.replies.all():
-            if reply.status == CommentStatus.APPROVED:
-                reply.status = CommentStatus.REPLY_TO_DELETED
-                reply.moderated_by = moderator
-                reply.moderated_at = timezone.now()
-                reply.save()
-                reply.mark_replies_deleted(moderator)
-        if self.parent:
-            self.parent.update_reply_count()
+        """Delete this comment and mark its approved replies, see comment.moderation.delete_thread"""
+        from comment.moderation import delete_thread
+        return delete_thread(self, moderator=moderator, reason=reason or '')
 
     def can_edit(self, user):
         if not user.is_authenticated:
@@ -257,29 +417,32 @@ class Comment(models.Model):
             self.moderation_note = reason
         self.save()
 
-    def log_change(self, change_type, changed_by, previous_content=None, new_content=None, 
-                   previous_status=None, new_status=None, reason='', moderation_action=None,
-                   ip_address=None, user_agent='', affected_children_count=0, bulk_operation_id=None):
-        """Create a changelog entry for this comment"""
-        project = None
+    def get_changelog_project(self):
+        """The project changelog entries of this comment are filed under"""
         if self.to_project:
-            project = self.to_project
+            return self.to_project
         elif self.to_task and self.to_task.to_project:
-            project = self.to_task.to_project
+            return self.to_task.to_project
         elif self.to_need and self.to_need.to_project:
-            project = self.to_need.to_project
+            return self.to_need.to_project
+        return None
 
+    def log_change(self, change_type, changed_by, previous_content=None, new_content=None, 
+                   previous_status=None, new_status=None, reason='', moderation_action=None,
+                   ip_address=None, user_agent='', affected_children_count=0, bulk_operation_id=None):
+        """Create a changelog entry for this comment, storing content as revisions"""
+        from comment import history
         return CommentChangeLog.objects.create(
             comment=self,
             changed_by=changed_by,
             change_type=change_type,
-            previous_content=previous_content or '',
-            new_content=new_content,
+            previous_revision=history.record(self, previous_content or None),
+            new_revision=history.record(self, new_content),
             previous_status=previous_status,
             new_status=new_status,
             reason=reason,
             moderation_action=moderation_action,
-            project=project,
+            project=self.get_changelog_project(),
             ip_address=ip_address,
             user_agent=user_agent,
             affected_children_count=affected_children_count,
@@ -287,48 +450,23 @@ class Comment(models.Model):
         )
 
     def get_change_history(self, include_user_edits=True):
-        """Get all changes for this comment"""
-        queryset = self.change_log.select_related('changed_by', 'moderation_action')
+        """Get all changes for this comment, with their content read back from the revisions"""
+        queryset = self.change_log.select_related('changed_by', 'moderation_action').with_content()
         if not include_user_edits:
-            queryset = queryset.filter(
-                change_type__in=[
-                    ChangeType.MODERATOR_EDIT,
-                    ChangeType.STATUS_CHANGE,
-                    ChangeType.CONTENT_REMOVAL,
-                    ChangeType.AUTHOR_REMOVAL,
-                    ChangeType.AUTHOR_AND_CONTENT_REMOVAL,
-                    ChangeType.THREAD_DELETION,
-                    ChangeType.BULK_THREAD_DELETION,
-                    ChangeType.APPROVAL,
-                    ChangeType.REJECTION,
-                    ChangeType.FLAGGED,
-                ]
-            )
+            queryset = queryset.filter(change_type__in=MODERATION_CHANGE_TYPES)
         return queryset
 
     def has_moderation_history(self):
         """Check if this comment has any moderation changes"""
-        return self.change_log.filter(
-            change_type__in=[
-                ChangeType.MODERATOR_EDIT,
-                ChangeType.STATUS_CHANGE,
-                ChangeType.CONTENT_REMOVAL,
-                ChangeType.AUTHOR_REMOVAL,
-                ChangeType.AUTHOR_AND_CONTENT_REMOVAL,
-                ChangeType.THREAD_DELETION,
-                ChangeType.BULK_THREAD_DELETION,
-                ChangeType.APPROVAL,
-                ChangeType.REJECTION,
-                ChangeType.FLAGGED,
-            ]
-        ).exists()
+        if hasattr(self, 'moderation_change_count'):
+            # Set by attach_changelog
+            return self.moderation_change_count > 0
+        return self.change_log.filter(change_type__in=MODERATION_CHANGE_TYPES).exists()
 
     def get_original_content(self):
         """Get the original content before any changes"""
-        first_change = self.change_log.order_by('timestamp').first()
-        if first_change and first_change.previous_content:
-            return first_change.previous_content
-        return self.content
+        from comment import history
+        return history.original_content(self)
 
     class Meta:
         indexes = [
@@ -336,17 +474,138 @@ class Comment(models.Model):
             models.Index(fields=['created_at']),
         ]
 
-# Signals to update `total_replies` automatically
+# Signals to keep the thread index (`path`/`depth`) and `total_replies` up to date
+@receiver(post_save, sender=Comment)
+def index_comment_tree(sender, instance, created, **kwargs):
+    if instance.path:
+        return
+    segment = f"{instance.pk:0{TREE_PATH_STEP}d}/"
+    if instance.parent_id:
+        parent = Comment.objects.only('path', 'depth').get(pk=instance.parent_id)
+        instance.path = parent.path + segment
+        instance.depth = parent.depth + 1
+    else:
+        instance.path = segment
+        instance.depth = 0
+    Comment.objects.filter(pk=instance.pk).update(path=instance.path, depth=instance.depth)
+
+
 @receiver(post_save, sender=Comment)
 def update_replies_on_save(sender, instance, created, **kwargs):
-    if created and instance.parent and instance.status == CommentStatus.APPROVED:
-        instance.parent.update_reply_count()
+    old_status = None if created else getattr(instance, '_loaded_status', None)
+    if not created and old_status in (None, instance.status):
+        instance._loaded_status = instance.status
+        return
+    if instance.parent_id:
+        shift_reply_counters(instance.parent_id, instance.get_ancestor_ids(), old_status, instance.status)
+    instance._loaded_status = instance.status
 
 
 @receiver(post_delete, sender=Comment)
 def update_replies_on_delete(sender, instance, **kwargs):
-    if instance.parent:
-        instance.parent.update_reply_count()
+    # Cascaded replies get their own post_delete, so each one only removes itself
+    if instance.parent_id:
+        status = getattr(instance, '_loaded_status', None) or instance.status
+        shift_reply_counters(instance.parent_id, instance.get_ancestor_ids(), status, None)
+
+
+def shift_reply_counters(parent_id, ancestor_ids, old_status, new_status):
+    """
+    Move one reply between status buckets: adjusts the parent's
+    ``total_replies`` and the per-status descendant counters of every
+    ancestor, each with a single set-based UPDATE.
+    """
+    if old_status == new_status:
+        return
+
+    approved_delta = (new_status == CommentStatus.APPROVED) - (old_status == CommentStatus.APPROVED)
+    if approved_delta:
+        Comment.objects.filter(pk=parent_id).update(
+            total_replies=Greatest(F('total_replies') + approved_delta, 0)
+        )
+
+    if new_status:
+        CommentDescendantCount.objects.bulk_create(
+            [CommentDescendantCount(comment_id=pk, status=new_status) for pk in ancestor_ids],
+            ignore_conflicts=True
+        )
+    CommentDescendantCount.objects.filter(
+        comment_id__in=ancestor_ids,
+        status__in=[status for status in (old_status, new_status) if status]
+    ).update(
+        count=F('count') + Case(When(status=new_status, then=Value(1)), default=Value(-1))
+    )
+
+
+def refresh_thread_counters(comment):
+    """
+    Recompute ``total_replies`` and the descendant counters of every
+    comment in the thread containing ``comment``, for status changes made
+    with set-based UPDATEs that bypass the save signals. One scan of the
+    thread's paths and three writes, whatever its size.
+    """
+    top = comment.path[:TREE_PATH_STEP + 1]
+    thread = Comment.objects.filter(path__gte=top, path__lt=top + '~')
+
+    approved_replies = Comment.objects.filter(
+        parent=models.OuterRef('pk'), status=CommentStatus.APPROVED
+    ).order_by().values('parent').annotate(total=Count('id')).values('total')
+    thread.update(total_replies=Coalesce(models.Subquery(approved_replies), 0))
+
+    totals = {}
+    for path, status in thread.values_list('path', 'status'):
+        for segment in path.split('/')[:-2]:
+            key = (int(segment), status)
+            totals[key] = totals.get(key, 0) + 1
+
+    CommentDescendantCount.objects.filter(comment__path__gte=top, comment__path__lt=top + '~').delete()
+    CommentDescendantCount.objects.bulk_create(
+        [CommentDescendantCount(comment_id=pk, status=status, count=count)
+         for (pk, status), count in totals.items()],
+        batch_size=500
+    )
+    return len(totals)
+
+
+def rebuild_reply_counters():
+    """Recompute ``total_replies`` and all descendant counters in bulk"""
+    approved_replies = Comment.objects.filter(
+        parent=models.OuterRef('pk'), status=CommentStatus.APPROVED
+    ).order_by().values('parent').annotate(total=Count('id')).values('total')
+    Comment.objects.update(
+        total_replies=Coalesce(models.Subquery(approved_replies), 0)
+    )
+
+    totals = {}
+    for path, status in Comment.objects.values_list('path', 'status').iterator():
+        for segment in path.split('/')[:-2]:
+            key = (int(segment), status)
+            totals[key] = totals.get(key, 0) + 1
+
+    CommentDescendantCount.objects.all().delete()
+    CommentDescendantCount.objects.bulk_create(
+        [CommentDescendantCount(comment_id=pk, status=status, count=count)
+         for (pk, status), count in totals.items()],
+        batch_size=500
+    )
+    return len(totals)
+
+
+class CommentDescendantCount(models.Model):
+    """Number of replies with a given status anywhere below a comment"""
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        related_name='descendant_counts'
+    )
+    status = models.CharField(max_length=26, choices=CommentStatus.choices)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('comment', 'status')
+
+    def __str__(self):
+        return f"{self.count} {self.status} replies below comment {self.comment_id}"
 
 
 class ReportType(models.TextChoices):
@@ -507,26 +766,32 @@ class CommentVote(models.Model):
     def __str__(self):
         return f"{self.user.username}'s {self.get_vote_type_display()} on comment {self.comment.id}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored vote so save() can work out the score delta
+        instance._loaded_vote_type = instance.__dict__.get('vote_type')
+        return instance
+    
     def save(self, *args, **kwargs):
-        if self.pk:
-            old_vote = CommentVote.objects.get(pk=self.pk)
-            vote_changed = old_vote.vote_type != self.vote_type
+        if self._state.adding:
+            old_value = 0
         else:
-            vote_changed = True
+            old_value = VOTE_VALUES.get(getattr(self, '_loaded_vote_type', None), 0)
         
         super().save(*args, **kwargs)
         
-        if vote_changed:
-            self.update_comment_score()
+        apply_score_delta(self.comment_id, VOTE_VALUES[self.vote_type] - old_value)
+        self._loaded_vote_type = self.vote_type
         
     def delete(self, *args, **kwargs):
-        comment = self.comment  # Store reference before deletion
-        super().delete(*args, **kwargs)
-        # Update score after deletion
-        self.update_comment_score(comment)
+        vote_type = getattr(self, '_loaded_vote_type', None) or self.vote_type
+        result = super().delete(*args, **kwargs)
+        apply_score_delta(self.comment_id, -VOTE_VALUES[vote_type])
+        return result
         
     def update_comment_score(self, comment=None):
-        """Update the score field on the associated comment"""
+        """Recount the score of the associated comment from its votes"""
         comment = comment or self.comment
         
         # Count upvotes and downvotes
@@ -537,6 +802,73 @@ class CommentVote(models.Model):
         comment.score = upvotes - downvotes
         comment.save(update_fields=['score'])
 
+
+# Score contribution of each vote type
+VOTE_VALUES = {
+    VoteType.UPVOTE: 1,
+    VoteType.DOWNVOTE: -1,
+}
+
+
+def apply_score_delta(comment_id, delta):
+    """
+    Apply a vote's effect on a comment score as an atomic ``F()`` update,
+    or queue it in the vote buffer when ``COMMENT_VOTE_BUFFERING`` is on.
+    """
+    if not delta:
+        return
+    if getattr(settings, 'COMMENT_VOTE_BUFFERING', False):
+        CommentVoteBuffer.objects.create(comment_id=comment_id, delta=delta)
+    else:
+        Comment.objects.filter(pk=comment_id).update(score=F('score') + delta)
+
+
+def flush_vote_buffer():
+    """
+    Apply all buffered vote deltas to comment scores, coalesced per comment
+    into a single UPDATE, and clear the flushed buffer rows.
+    """
+    with transaction.atomic():
+        last_id = CommentVoteBuffer.objects.aggregate(last=models.Max('id'))['last']
+        if last_id is None:
+            return 0
+        flushed = CommentVoteBuffer.objects.filter(id__lte=last_id)
+        totals = flushed.filter(
+            comment=models.OuterRef('pk')
+        ).order_by().values('comment').annotate(total=Sum('delta')).values('total')
+        updated = Comment.objects.filter(
+            pk__in=flushed.values('comment')
+        ).update(score=F('score') + models.Subquery(totals))
+        flushed.delete()
+    return updated
+
+
+def reconcile_comment_scores():
+    """Recompute every comment score from CommentVote in one UPDATE"""
+    with transaction.atomic():
+        CommentVoteBuffer.objects.all().delete()
+        totals = CommentVote.objects.filter(
+            comment=models.OuterRef('pk')
+        ).order_by().values('comment').annotate(
+            total=Count('id', filter=Q(vote_type=VoteType.UPVOTE))
+            - Count('id', filter=Q(vote_type=VoteType.DOWNVOTE))
+        ).values('total')
+        return Comment.objects.update(score=Coalesce(models.Subquery(totals), 0))
+
+
+class CommentVoteBuffer(models.Model):
+    """Score deltas queued by votes while COMMENT_VOTE_BUFFERING is on"""
+    comment = models.ForeignKey(
+        'comment.Comment',
+        on_delete=models.CASCADE,
+        related_name='vote_buffer'
+    )
+    delta = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.delta:+d} on comment {self.comment_id}"
+
 class ModeratorLevel(models.TextChoices):
     """Different levels of moderators with different permissions"""
     JUNIOR = 'JUNIOR', 'Junior Moderator'
@@ -653,7 +985,7 @@ class ModerationAction(models.Model):
         return f"{self.get_decision_display()} by {self.moderator.username} on comment {self.comment.id}"
     
 
-    def updated_apply_decision(self):
+    def updated_apply_decision(self, ip_address=None, user_agent=''):
         """Apply the moderation decision to the comment and related objects"""
         
         # Store original data for changelog
@@ -710,9 +1042,8 @@ class ModerationAction(models.Model):
             
         elif self.decision == ModerationDecision.EDIT:
             if self.new_content:
-                self.original_content = self.comment.content
-                
-                # Create changelog entry BEFORE changing content
+                # Create changelog entry BEFORE changing content; it keeps
+                # both versions as revisions of the comment
                 self.comment.log_change(
                     change_type=ChangeType.MODERATOR_EDIT,
                     changed_by=self.moderator,
@@ -726,17 +1057,6 @@ class ModerationAction(models.Model):
                 self.comment.content = self.new_content
                 self.comment.is_edited = True
                 
-                # Also update edit_history for backward compatibility
-                history_entry = {
-                    'content': original_content,
-                    'edited_at': timezone.now().isoformat(),
-                    'edited_by': self.moderator.username
-                }
-                if not self.comment.edit_history:
-                    self.comment.edit_history = [history_entry]
-                else:
-                    self.comment.edit_history.append(history_entry)
-                
         # New moderation decisions
         elif self.decision == ModerationDecision.REMOVE_CONTENT_ONLY:
             # Create changelog entry before applying change
@@ -779,49 +1099,16 @@ class ModerationAction(models.Model):
             self.comment.remove_author_and_content(moderator=self.moderator, reason=self.reason)
             
         elif self.decision == ModerationDecision.DELETE_THREAD:
-            # Count affected children
-            affected_children = self.comment.replies.all()
-            children_count = affected_children.count()
-            bulk_operation_id = uuid.uuid4() if children_count > 0 else None
-            
-            if children_count > 0:
-                # Bulk deletion changelog
-                self.comment.log_change(
-                    change_type=ChangeType.BULK_THREAD_DELETION,
-                    changed_by=self.moderator,
-                    previous_content=original_content,
-                    previous_status=original_status,
-                    new_status=CommentStatus.THREAD_DELETED,
-                    reason=self.reason or f"Thread deleted by moderator {self.moderator.username}",
-                    moderation_action=self,
-                    affected_children_count=children_count,
-                    bulk_operation_id=bulk_operation_id
-                )
-                
-                # Individual entries for children
-                for child_comment in affected_children:
-                    child_comment.log_change(
-                        change_type=ChangeType.STATUS_CHANGE,
-                        changed_by=self.moderator,
-                        previous_status=child_comment.status,
-                        new_status=CommentStatus.REPLY_TO_DELETED,
-                        reason=f"Parent comment deleted in bulk operation by moderator {self.moderator.username}",
-                        moderation_action=self,
-                        bulk_operation_id=bulk_operation_id
-                    )
-            else:
-                # Single deletion
-                self.comment.log_change(
-                    change_type=ChangeType.THREAD_DELETION,
-                    changed_by=self.moderator,
-                    previous_content=original_content,
-                    previous_status=original_status,
-                    new_status=CommentStatus.THREAD_DELETED,
-                    reason=self.reason or f"Comment deleted by moderator {self.moderator.username}",
-                    moderation_action=self
-                )
-            
-            self.comment.soft_delete_thread(moderator=self.moderator, reason=self.reason)
+            # The whole subtree in a few set-based queries, logged as one bulk operation
+            from comment.moderation import delete_thread
+            delete_thread(
+                self.comment,
+                moderator=self.moderator,
+                reason=self.reason or f"Thread deleted by moderator {self.moderator.username}",
+                moderation_action=self,
+                ip_address=ip_address,
+                user_agent=user_agent,
+            )
             
         # Only save if it's not a thread deletion (that method handles its own saving)
         if self.decision != ModerationDecision.DELETE_THREAD:
@@ -844,6 +1131,19 @@ class ModerationAction(models.Model):
                 reports_to_resolve = [self.target_report]
         
         # Update report statuses
+        if isinstance(reports_to_resolve, models.QuerySet):
+            # One UPDATE and one group recount however many reports there are
+            resolved = reports_to_resolve.update(
+                status=ReportStatus.REJECTED if self.decision == ModerationDecision.FALSE_REPORT else ReportStatus.RESOLVED,
+                reviewed_by=self.moderator,
+                moderator_notes=f"Resolved via moderation action: {self.get_decision_display()}",
+                updated_at=timezone.now(),
+            )
+            if resolved:
+                from project import stats
+                CommentReportGroup.refresh([self.comment_id])
+                stats.schedule_refresh([self.comment.to_project_id], 'comments')
+            reports_to_resolve = []
         for report in reports_to_resolve:
             if self.decision == ModerationDecision.FALSE_REPORT:
                 report.status = ReportStatus.REJECTED
@@ -858,6 +1158,11 @@ class ModerationAction(models.Model):
             self.affected_user = self.comment.user
             # User impact will be implemented later as requested
         
+        # Tell the author what happened to their comment
+        from comment.notifications import AUTHOR_OUTCOMES, notify_comment_moderation
+        if self.decision in AUTHOR_OUTCOMES and self.comment.user_id != self.moderator_id:
+            notify_comment_moderation(self.comment, AUTHOR_OUTCOMES[self.decision], self.moderator)
+
         # Notify reporters if requested
         if self.notify_reporters:
             self.notify_reporters_func()
@@ -866,21 +1171,19 @@ class ModerationAction(models.Model):
     # ModerationAction.apply_decision = updated_apply_decision
     def notify_reporters_func(self):
         """Notify reporters about the moderation decision"""
+        from comment.notifications import notify_reporters
+
         # Get relevant reports based on scope
+        reports = []
         if self.decision_scope == DecisionScope.ALL_REPORTS:
             reports = self.comment.reports.all()
         elif self.decision_scope == DecisionScope.REPORT_TYPE:
             reports = self.comment.reports.filter(report_type=self.target_report_type)
         elif self.decision_scope == DecisionScope.SINGLE_REPORT:
             reports = [self.target_report] if self.target_report else []
-        
-        for report in reports:
-            if report.reportee:
-                # For now, just print as requested
-                print(f"Report by {report.reportee.username} of comment '{self.comment.content[:50]}...' resolved as {self.get_decision_display()}")
-                
-                # TODO: Later implement actual notification system
-                # This could be email, in-app notification, etc.
+
+        # Queued in the notification outbox, delivered by manage.py send_notifications
+        notify_reporters(self, reports)
 
 
 class CommentReportGroup(models.Model):
@@ -903,42 +1206,125 @@ class CommentReportGroup(models.Model):
     class Meta:
         ordering = ['-last_reported_at']
     
+    # Fields written from the aggregated reports
+    AGGREGATE_FIELDS = ['total_reports', 'report_types_summary', 'first_reported_at', 'last_reported_at', 'status']
+
+    @staticmethod
+    def combine_status(*statuses):
+        """Pending while any report is pending, then reviewed, otherwise resolved"""
+        if ReportStatus.PENDING in statuses:
+            return ReportStatus.PENDING
+        if ReportStatus.REVIEWED in statuses:
+            return ReportStatus.REVIEWED
+        return ReportStatus.RESOLVED
+
+    @classmethod
+    def aggregate_reports(cls, comment_ids=None):
+        """
+        {comment_id: group field values} for some comments (every reported
+        comment by default), from a single query grouped by comment with a
+        conditional count per report type and status.
+        """
+        reports = CommentReport.objects.all()
+        if comment_ids is not None:
+            reports = reports.filter(comment_id__in=comment_ids)
+        type_counts = {
+            f'type_{report_type}': Count('id', filter=Q(report_type=report_type))
+            for report_type in ReportType.values
+        }
+        groups = {}
+        for row in reports.values('comment_id').annotate(
+            total=Count('id'),
+            first=Min('created_at'),
+            last=Max('created_at'),
+            pending=Count('id', filter=Q(status=ReportStatus.PENDING)),
+            reviewed=Count('id', filter=Q(status=ReportStatus.REVIEWED)),
+            **type_counts,
+        ).order_by():
+            groups[row['comment_id']] = {
+                'total_reports': row['total'],
+                'report_types_summary': {
+                    report_type: row[f'type_{report_type}']
+                    for report_type in ReportType.values if row[f'type_{report_type}']
+                },
+                'first_reported_at': row['first'],
+                'last_reported_at': row['last'],
+                'status': cls.combine_status(
+                    ReportStatus.PENDING if row['pending'] else None,
+                    ReportStatus.REVIEWED if row['reviewed'] else None,
+                ),
+            }
+        return groups
+
+    @classmethod
+    def refresh(cls, comment_ids):
+        """
+        Recompute the groups of some comments: one aggregate query, then one
+        upsert, plus a delete for comments left without reports.
+        Returns the saved groups.
+        """
+        comment_ids = set(comment_ids)
+        groups = cls.aggregate_reports(comment_ids)
+        if comment_ids - set(groups):
+            cls.objects.filter(comment_id__in=comment_ids - set(groups)).delete()
+        if not groups:
+            return []
+        return cls.objects.bulk_create(
+            [cls(comment_id=comment_id, **values) for comment_id, values in groups.items()],
+            update_conflicts=True,
+            unique_fields=['comment'],
+            update_fields=cls.AGGREGATE_FIELDS,
+        )
+
     @classmethod
     def update_for_comment(cls, comment):
         """Update or create report group for a comment"""
-        reports = comment.reports.all()
-        
-        if not reports.exists():
-            # Delete group if no reports
-            cls.objects.filter(comment=comment).delete()
-            return None
-        
-        # Calculate summary
-        report_summary = {}
-        for report_type, _ in ReportType.choices:
-            count = reports.filter(report_type=report_type).count()
-            if count > 0:
-                report_summary[report_type] = count
-        
-        # Determine overall status
-        if reports.filter(status=ReportStatus.PENDING).exists():
-            group_status = ReportStatus.PENDING
-        elif reports.filter(status=ReportStatus.REVIEWED).exists():
-            group_status = ReportStatus.REVIEWED
-        else:
-            group_status = ReportStatus.RESOLVED
-        
-        group, created = cls.objects.update_or_create(
-            comment=comment,
-            defaults={
-                'total_reports': reports.count(),
-                'report_types_summary': report_summary,
-                'first_reported_at': reports.order_by('created_at').first().created_at,
-                'last_reported_at': reports.order_by('-created_at').first().created_at,
-                'status': group_status,
+        groups = cls.refresh([comment.pk])
+        return groups[0] if groups else None
+
+    @classmethod
+    def add_report(cls, report):
+        """
+        Apply one new report to its comment's group without recounting:
+        the group row is locked, adjusted and written back.
+        """
+        with transaction.atomic():
+            group = cls.objects.select_for_update().filter(comment_id=report.comment_id).first()
+            if group is None:
+                groups = cls.refresh([report.comment_id])
+                return groups[0] if groups else None
+            summary = dict(group.report_types_summary)
+            summary[report.report_type] = summary.get(report.report_type, 0) + 1
+            group.total_reports += 1
+            group.report_types_summary = {
+                report_type: summary[report_type] for report_type in ReportType.values if report_type in summary
             }
-        )
+            group.first_reported_at = min(group.first_reported_at, report.created_at)
+            group.last_reported_at = max(group.last_reported_at, report.created_at)
+            group.status = cls.combine_status(group.status, report.status)
+            group.save(update_fields=cls.AGGREGATE_FIELDS)
         return group
+
+    @classmethod
+    def rebuild(cls, batch_size=500):
+        """
+        Recompute every group from one GROUP BY over all reports, written
+        with bulk_update/bulk_create; groups without reports are deleted.
+        Returns the number of groups.
+        """
+        with transaction.atomic():
+            groups = cls.aggregate_reports()
+            cls.objects.exclude(comment_id__in=groups.keys()).delete()
+            existing = {group.comment_id: group for group in cls.objects.only('id', 'comment_id')}
+            changed, created = [], []
+            for comment_id, values in groups.items():
+                group = existing.get(comment_id) or cls(comment_id=comment_id)
+                for field, value in values.items():
+                    setattr(group, field, value)
+                (changed if group.pk else created).append(group)
+            cls.objects.bulk_update(changed, cls.AGGREGATE_FIELDS, batch_size=batch_size)
+            cls.objects.bulk_create(created, batch_size=batch_size)
+        return len(groups)
     
     def get_report_types_display(self):
         """Get human-readable report types summary"""
@@ -954,13 +1340,20 @@ class CommentReportGroup(models.Model):
 
 # Update CommentReport model with signals
 @receiver(post_save, sender=CommentReport)
-def update_report_group_on_save(sender, instance, **kwargs):
-    CommentReportGroup.update_for_comment(instance.comment)
+def update_report_group_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        CommentReportGroup.add_report(instance)
+    else:
+        from comment.tasks import refresh_report_groups
+        refresh_report_groups.defer([instance.comment_id])
 
 
 @receiver(post_delete, sender=CommentReport)
 def update_report_group_on_delete(sender, instance, **kwargs):
-    CommentReportGroup.update_for_comment(instance.comment)
+    from comment.tasks import refresh_report_groups
+    refresh_report_groups.defer([instance.comment_id])
 
 class ChangeType(models.TextChoices):
     """Types of changes that can be logged for comments"""
@@ -977,6 +1370,52 @@ class ChangeType(models.TextChoices):
     FLAGGED = 'FLAGGED', 'Comment Flagged'
 
 
+# Change types recorded for moderator actions, as opposed to the author's own edits
+MODERATION_CHANGE_TYPES = [
+    ChangeType.MODERATOR_EDIT,
+    ChangeType.STATUS_CHANGE,
+    ChangeType.CONTENT_REMOVAL,
+    ChangeType.AUTHOR_REMOVAL,
+    ChangeType.AUTHOR_AND_CONTENT_REMOVAL,
+    ChangeType.THREAD_DELETION,
+    ChangeType.BULK_THREAD_DELETION,
+    ChangeType.APPROVAL,
+    ChangeType.REJECTION,
+    ChangeType.FLAGGED,
+]
+
+
+class CommentChangeLogQuerySet(models.QuerySet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._with_content = False
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._with_content = self._with_content
+        return clone
+
+    def _fetch_all(self):
+        attach = (
+            self._result_cache is None
+            and issubclass(self._iterable_class, models.query.ModelIterable)
+        )
+        super()._fetch_all()
+        if attach and self._with_content:
+            from comment import history
+            history.attach_content(self._result_cache)
+
+    def with_content(self):
+        """
+        When evaluated, fill in ``previous_content`` and ``new_content`` of
+        entries that refer to revisions, reconstructing all of them with
+        two queries (see ``comment.history.attach_content``).
+        """
+        clone = self._chain()
+        clone._with_content = True
+        return clone
+
+
 class CommentChangeLog(models.Model):
     """Model to track all changes made to comments for audit purposes"""
     
@@ -1005,15 +1444,26 @@ class CommentChangeLog(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True, help_text='Browser user agent string')
     
-    # Content tracking
+    # Content tracking: revisions of the comment (CommentRevision.number);
+    # entries logged before revisions existed carry the text itself
+    previous_revision = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text='Revision holding the content before the change'
+    )
+    new_revision = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text='Revision holding the content after the change'
+    )
     previous_content = models.TextField(
         blank=True,
-        help_text='Content before the change'
+        help_text='Content before the change (entries not yet compacted into revisions)'
     )
     new_content = models.TextField(
         blank=True, 
         null=True,
-        help_text='Content after the change'
+        help_text='Content after the change (entries not yet compacted into revisions)'
     )
     previous_status = models.CharField(
         max_length=26, 
@@ -1064,6 +1514,8 @@ class CommentChangeLog(models.Model):
         blank=True,
         help_text='UUID to group related bulk operations'
     )
+
+    objects = CommentChangeLogQuerySet.as_manager()
     
     class Meta:
         ordering = ['-timestamp']
@@ -1137,3 +1589,78 @@ class CommentChangeLog(models.Model):
             'before': self.previous_content[:max_length] + ('...' if len(self.previous_content) > max_length else ''),
             'after': self.new_content[:max_length] + ('...' if len(self.new_content) > max_length else '')
         }
+
+
+class CommentRevision(models.Model):
+    """
+    One version of a comment's text, zlib-compressed: a full snapshot, or a
+    delta against the revision before it (see comment.history)
+    """
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='revisions')
+    number = models.PositiveIntegerField()
+    # Number of the snapshot the revision is reconstructed from; its own number for a snapshot
+    base = models.PositiveIntegerField()
+    data = models.BinaryField()
+    digest = models.CharField(max_length=40)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['comment', 'number']
+        constraints = [
+            models.UniqueConstraint(fields=['comment', 'number'], name='unique_comment_revision'),
+        ]
+
+    def __str__(self):
+        return f"Revision {self.number} of comment {self.comment_id}"
+
+    @property
+    def is_snapshot(self):
+        return self.base == self.number
+
+
+def attach_changelog(comments, recent=0):
+    """
+    Set changelog metadata on a page of comments with one or two queries:
+
+    * ``change_log_count`` and ``moderation_change_count``, from one query
+      grouped by comment and change type
+    * ``recent_changes``: the latest ``recent`` entries (with ``changed_by``),
+      ranked per comment by a window function; that query is skipped when
+      ``recent`` is 0
+
+    The changelog template tags and ``has_moderation_history`` read these
+    instead of querying.
+    """
+    comments = [comment for comment in comments if comment.pk]
+    if not comments:
+        return comments
+    comment_ids = [comment.pk for comment in comments]
+
+    totals = {pk: 0 for pk in comment_ids}
+    moderation = {pk: 0 for pk in comment_ids}
+    for comment_id, change_type, total in CommentChangeLog.objects.filter(
+        comment_id__in=comment_ids
+    ).values('comment_id', 'change_type').annotate(total=Count('id')).values_list(
+        'comment_id', 'change_type', 'total'
+    ).order_by():
+        totals[comment_id] += total
+        if change_type in MODERATION_CHANGE_TYPES:
+            moderation[comment_id] += total
+
+    entries = {pk: [] for pk in comment_ids}
+    with_entries = [pk for pk in comment_ids if totals[pk]]
+    if recent and with_entries:
+        for entry in CommentChangeLog.objects.filter(comment_id__in=with_entries).annotate(
+            rank=models.Window(
+                RowNumber(),
+                partition_by=F('comment_id'),
+                order_by=[F('timestamp').desc(), F('id').desc()],
+            )
+        ).filter(rank__lte=recent).select_related('changed_by').order_by('comment_id', 'rank'):
+            entries[entry.comment_id].append(entry)
+
+    for comment in comments:
+        comment.change_log_count = totals[comment.pk]
+        comment.moderation_change_count = moderation[comment.pk]
+        comment.recent_changes = entries[comment.pk]
+    return comments
@@ -0,0 +1,120 @@
+"""
+Moderation decisions applied to a whole comment subtree at once.
+
+The subtree is read and written through the ``path`` index: one UPDATE
+for the root, one set-based UPDATE over the descendants, a single
+bulk_create of CommentChangeLog rows sharing a ``bulk_operation_id``, and
+a background recount of the thread's reply counters. The UPDATEs bypass the save
+signals, so the fragment cache and ProjectStats are refreshed here
+instead.
+"""
+import uuid
+
+from django.db import transaction
+from django.utils import timezone
+
+from comment import fragment_cache, history
+from comment.models import Comment, CommentChangeLog, CommentStatus, ChangeType
+from comment.tasks import refresh_thread_counters
+from project import stats
+
+
+def moderate_subtree(root, status, reply_status, moderator=None, reason='', reply_reason='',
+                     change_type=ChangeType.STATUS_CHANGE, bulk_change_type=None,
+                     reply_statuses=(CommentStatus.APPROVED,), moderation_action=None,
+                     ip_address=None, user_agent=''):
+    """
+    Give ``root`` the status ``status`` and every reply below it whose
+    status is in ``reply_statuses`` the status ``reply_status``, logging
+    one change per comment. The root's entry uses ``bulk_change_type``
+    (when given) if any reply changed. Returns the number of replies changed.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        replies = Comment.objects.descendants_of(root).filter(status__in=reply_statuses)
+        previous = dict(replies.select_for_update().values_list('pk', 'status'))
+        reply_ids = list(previous)
+        previous_status = root.status
+
+        Comment.objects.filter(pk=root.pk).update(
+            status=status,
+            moderated_by=moderator,
+            moderated_at=now,
+            moderation_note=reason or root.moderation_note,
+            updated_at=now,
+        )
+        if reply_ids:
+            replies.update(
+                status=reply_status,
+                moderated_by=moderator,
+                moderated_at=now,
+                updated_at=now,
+            )
+
+        project = root.get_changelog_project()
+        bulk_operation_id = uuid.uuid4() if reply_ids else None
+        entries = [CommentChangeLog(
+            comment=root,
+            changed_by=moderator,
+            change_type=bulk_change_type if reply_ids and bulk_change_type else change_type,
+            previous_revision=history.record(root, root.content),
+            previous_status=previous_status,
+            new_status=status,
+            reason=reason,
+            moderation_action=moderation_action,
+            project=project,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            affected_children_count=len(reply_ids),
+            bulk_operation_id=bulk_operation_id,
+        )]
+        entries.extend(
+            CommentChangeLog(
+                comment_id=reply_id,
+                changed_by=moderator,
+                change_type=ChangeType.STATUS_CHANGE,
+                previous_status=previous[reply_id],
+                new_status=reply_status,
+                reason=reply_reason,
+                moderation_action=moderation_action,
+                project=project,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                bulk_operation_id=bulk_operation_id,
+            )
+            for reply_id in reply_ids
+        )
+        CommentChangeLog.objects.bulk_create(entries, batch_size=500)
+
+        # Counted for the whole thread, so one pending recount per thread top
+        refresh_thread_counters.defer((root.get_ancestor_ids() or [root.pk])[0])
+        fragment_cache.schedule_invalidate([root.pk, *root.get_ancestor_ids(), *reply_ids])
+        stats.schedule_refresh([root.to_project_id], 'comments')
+
+    root.status = status
+    root.moderated_by = moderator
+    root.moderated_at = now
+    root.moderation_note = reason or root.moderation_note
+    root._loaded_status = status
+    return len(reply_ids)
+
+
+def delete_thread(root, moderator=None, reason='', moderation_action=None, ip_address=None, user_agent=''):
+    """
+    Soft-delete a comment: it becomes THREAD_DELETED and its approved
+    replies, at any depth, REPLY_TO_DELETED. Returns the number of replies.
+    """
+    moderator_name = moderator.username if moderator else 'a moderator'
+    return moderate_subtree(
+        root,
+        CommentStatus.THREAD_DELETED,
+        CommentStatus.REPLY_TO_DELETED,
+        moderator=moderator,
+        reason=reason,
+        reply_reason=f"Parent comment deleted in bulk operation by moderator {moderator_name}",
+        change_type=ChangeType.THREAD_DELETION,
+        bulk_change_type=ChangeType.BULK_THREAD_DELETION,
+        moderation_action=moderation_action,
+        ip_address=ip_address,
+        user_agent=user_agent,
+    )
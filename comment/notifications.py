@@ -1,20 +1,72 @@
+"""
+Comment notifications, queued in the notification outbox
+(notifications.outbox) and delivered by manage.py send_notifications.
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.urls import reverse
+
+from comment.models import Comment, CommentStatus, ModerationDecision
+from notifications.outbox import emit, emit_many
+
+
+# What a decision did to the author's comment; other decisions are not sent to the author
+AUTHOR_OUTCOMES = {
+    ModerationDecision.HIDE: 'hidden',
+    ModerationDecision.REMOVE: 'removed',
+    ModerationDecision.EDIT: 'edited',
+    ModerationDecision.REMOVE_CONTENT_ONLY: 'removed',
+    ModerationDecision.REMOVE_AUTHOR_ONLY: 'made anonymous',
+    ModerationDecision.REMOVE_AUTHOR_AND_CONTENT: 'removed',
+    ModerationDecision.DELETE_THREAD: 'deleted',
+}
+
+
+def _comment_url(comment):
+    return reverse('comments:single_comment', args=[comment.pk])
+
+
 def notify_comment_reply(comment):
     """Notify a user when someone replies to their comment"""
-    if comment.parent and comment.parent.user:
-        # Create a notification record
-        Notification.objects.create(
-            user=comment.parent.user,
-            content_type=ContentType.objects.get_for_model(Comment),
-            object_id=comment.id,
-            notification_type='REPLY',
-            text=f"{comment.user.username if comment.user else 'Someone'} replied to your comment"
+    parent = comment.parent
+    if parent and parent.user_id and comment.status == CommentStatus.APPROVED:
+        emit(
+            parent.user_id,
+            'reply',
+            f"{comment.user.username if comment.user else 'Someone'} replied to your comment",
+            group=f'comment:{parent.pk}',
+            url=_comment_url(comment),
+            actor=comment.user_id,
         )
 
+
 def notify_comment_moderation(comment, action, moderator):
     """Notify a user when their comment is moderated"""
-    if comment.user:
-        Notification.objects.create(
-            user=comment.user,
-            notification_type='MODERATION',
-            text=f"Your comment was {action} by a moderator"
-        )
\ No newline at end of file
+    if comment.user_id:
+        emit(
+            comment.user_id,
+            'moderation',
+            f"Your comment was {action} by a moderator",
+            group=f'comment:{comment.pk}',
+            url=_comment_url(comment),
+            actor=moderator,
+        )
+
+
+def notify_reporters(moderation_action, reports):
+    """Tell the users who filed some reports how they were resolved"""
+    comment = moderation_action.comment
+    return emit_many(
+        [report.reportee_id for report in reports],
+        'report',
+        f"Your report of a comment was resolved: {moderation_action.get_decision_display()}",
+        group=f'comment:{comment.pk}',
+        url=_comment_url(comment),
+        actor=moderation_action.moderator_id,
+    )
+
+
+@receiver(post_save, sender=Comment)
+def notify_new_reply(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.parent_id:
+        notify_comment_reply(instance)
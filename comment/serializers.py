@@ -36,6 +36,9 @@ class CommentSerializer(serializers.ModelSerializer):
     
     def get_current_user_vote(self, obj):
         """Get the current user's vote on this comment"""
+        if hasattr(obj, 'user_vote'):
+            # Annotated by CommentQuerySet.with_user_vote
+            return obj.user_vote
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             try:
@@ -59,5 +62,6 @@ class CommentDetailSerializer(CommentSerializer):
     
     def get_replies(self, obj):
         """Get first-level replies to this comment"""
-        replies = obj.replies.all()
+        request = self.context.get('request')
+        replies = obj.replies.with_user_vote(request.user if request else None)
         return CommentSerializer(replies, many=True, context=self.context).data
\ No newline at end of file
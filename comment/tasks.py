@@ -0,0 +1,17 @@
+"""Side effects of comment changes run by manage.py run_jobs (see jobs.queue)"""
+from jobs.queue import background_task
+
+from comment import models
+
+
+@background_task(dedup_key=lambda comment_ids: 'comment-report-groups:' + ','.join(map(str, comment_ids)))
+def refresh_report_groups(comment_ids):
+    models.CommentReportGroup.refresh(comment_ids)
+
+
+@background_task(priority=5, dedup_key=lambda comment_id: f'comment-thread-counters:{comment_id}')
+def refresh_thread_counters(comment_id):
+    """Recount the reply counters of the thread a comment belongs to"""
+    comment = models.Comment.objects.filter(pk=comment_id).first()
+    if comment is not None:
+        models.refresh_thread_counters(comment)
@@ -3,6 +3,7 @@ from django.templatetags.static import static
 from django.utils.safestring import mark_safe
 from django.db import models
 from comment.models import ModeratorLevel
+from utils.permissions import get_project_perms, get_project_id
 
 register = template.Library()
 
@@ -101,23 +102,12 @@ def can_moderate_comment(comment, user):
     if user.is_superuser or user.is_staff:
         return True
     
-    # Check project-specific comment moderation permissions
+    # Check project-specific comment moderation permissions against the
+    # user's memberships, which are loaded once per request
     try:
-        if comment.to_project:
-            return comment.to_project.user_can_moderate_comments(user)
-        elif comment.to_task and comment.to_task.to_project:
-            return comment.to_task.to_project.user_can_moderate_comments(user)
-        elif comment.to_need and comment.to_need.to_project:
-            return comment.to_need.to_project.user_can_moderate_comments(user)
-        elif hasattr(comment, 'to_problem') and comment.to_problem:
-            # Handle problems - they might be related to projects through various paths
-            problem = comment.to_problem
-            if hasattr(problem, 'to_project') and problem.to_project:
-                return problem.to_project.user_can_moderate_comments(user)
-            elif hasattr(problem, 'to_task') and problem.to_task and problem.to_task.to_project:
-                return problem.to_task.to_project.user_can_moderate_comments(user)
-            elif hasattr(problem, 'to_need') and problem.to_need and problem.to_need.to_project:
-                return problem.to_need.to_project.user_can_moderate_comments(user)
+        project_id = get_project_id(comment)
+        if project_id:
+            return get_project_perms(user).can_moderate_comments(project_id)
     except:
         # If any error occurs, fall back to checking the comment's can_moderate method
         pass
@@ -129,6 +119,19 @@ def can_moderate_comment(comment, user):
     return False
 
 
+@register.simple_tag(takes_context=True)
+def comment_node(context, comment):
+    """
+    Render the body of a comment (comment_node.html) through the fragment cache
+
+    Usage: {% comment_node comment %}
+    """
+    from comment import fragment_cache
+    user = context.get('user')
+    viewer = fragment_cache.viewer_class(comment, user, can_moderate_comment(comment, user))
+    return fragment_cache.render_node(context, comment, viewer)
+
+
 # ADDED: Enhanced template tag for checking if user can view comment history
 @register.filter
 def can_view_comment_history(user, comment):
@@ -159,10 +162,15 @@ def show_moderation_status(comment):
 
 
 # New template tags for changelog functionality
+# Counts and recent entries come from comment.models.attach_changelog
+# (CommentQuerySet.with_changelog) when the page loaded them, otherwise
+# they are queried per comment.
 
 @register.filter
 def has_change_history(comment):
     """Check if comment has any change history"""
+    if hasattr(comment, 'change_log_count'):
+        return comment.change_log_count > 0
     return hasattr(comment, 'change_log') and comment.change_log.exists()
 
 
@@ -177,6 +185,8 @@ def has_moderation_history(comment):
 @register.filter
 def change_count(comment):
     """Get total number of changes for a comment"""
+    if hasattr(comment, 'change_log_count'):
+        return comment.change_log_count
     if hasattr(comment, 'change_log'):
         return comment.change_log.count()
     return 0
@@ -185,22 +195,11 @@ def change_count(comment):
 @register.filter
 def moderation_change_count(comment):
     """Get number of moderation changes for a comment"""
+    if hasattr(comment, 'moderation_change_count'):
+        return comment.moderation_change_count
     if hasattr(comment, 'change_log'):
-        from comment.models import ChangeType
-        return comment.change_log.filter(
-            change_type__in=[
-                ChangeType.MODERATOR_EDIT,
-                ChangeType.STATUS_CHANGE,
-                ChangeType.CONTENT_REMOVAL,
-                ChangeType.AUTHOR_REMOVAL,
-                ChangeType.AUTHOR_AND_CONTENT_REMOVAL,
-                ChangeType.THREAD_DELETION,
-                ChangeType.BULK_THREAD_DELETION,
-                ChangeType.APPROVAL,
-                ChangeType.REJECTION,
-                ChangeType.FLAGGED,
-            ]
-        ).count()
+        from comment.models import MODERATION_CHANGE_TYPES
+        return comment.change_log.filter(change_type__in=MODERATION_CHANGE_TYPES).count()
     return 0
 
 
@@ -256,11 +255,15 @@ def changelog_summary(comment, max_entries=3):
     if not hasattr(comment, 'change_log'):
         return {'changes': [], 'comment': comment}
     
-    recent_changes = comment.change_log.select_related('changed_by')[:max_entries]
+    loaded = getattr(comment, 'recent_changes', None)
+    if loaded is not None and (len(loaded) >= max_entries or len(loaded) == comment.change_log_count):
+        recent_changes = loaded[:max_entries]
+    else:
+        recent_changes = comment.change_log.select_related('changed_by')[:max_entries]
     return {
         'changes': recent_changes,
         'comment': comment,
-        'total_changes': comment.change_log.count(),
+        'total_changes': change_count(comment),
         'max_entries': max_entries
     }
 
@@ -402,9 +405,9 @@ def nested_reply_count(comment, user=None):
         # Anonymous users only see approved
         include_statuses = [CommentStatus.APPROVED]
     
-    # Use the new method if it exists, otherwise fallback to the old field
-    if hasattr(comment, 'get_total_nested_replies'):
-        return comment.get_total_nested_replies(include_statuses)
+    # Read the maintained descendant counters, otherwise fallback to the old field
+    if hasattr(comment, 'get_descendant_count'):
+        return comment.get_descendant_count(include_statuses)
     else:
         return comment.total_replies or 0
 
@@ -1,3 +1,390 @@
-from django.test import TestCase
+import random
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from comment import fragment_cache, history
+from comment.models import (
+    ChangeType, Comment, CommentChangeLog, CommentDescendantCount, CommentReport, CommentReportGroup,
+    CommentRevision, CommentStatus, CommentVote, DecisionScope, ModerationAction, ModerationDecision, ReportStatus,
+    ReportType, VoteType, attach_changelog, flush_vote_buffer, rebuild_reply_counters, reconcile_comment_scores,
+)
+from comment.moderation import delete_thread
+from comment.templatetags.comment_tags import (
+    change_count, changelog_summary, has_change_history, moderation_change_count, nested_reply_count,
+)
+from project.models import Project
+
+
+def counter_snapshot():
+    return (
+        sorted(Comment.objects.values_list('id', 'total_replies')),
+        sorted(CommentDescendantCount.objects.exclude(count=0).values_list('comment_id', 'status', 'count')),
+    )
+
+
+class ThreadPathTests(TestCase):
+    def setUp(self):
+        self.root = Comment.objects.create(content='root')
+        self.a = Comment.objects.create(content='a', parent=self.root)
+        self.b = Comment.objects.create(content='b', parent=self.a, status=CommentStatus.PENDING)
+        self.c = Comment.objects.create(content='c', parent=self.b)
+        self.d = Comment.objects.create(content='d', parent=self.root)
+        self.other = Comment.objects.create(content='other')
+
+    def test_paths_follow_the_thread(self):
+        self.c.refresh_from_db()
+        self.assertEqual(self.c.depth, 3)
+        self.assertEqual(self.c.get_ancestor_ids(), [self.root.pk, self.a.pk, self.b.pk])
+        self.assertEqual(list(Comment.objects.descendants_of(self.root)), [self.a, self.b, self.c, self.d])
+        self.assertEqual(Comment.objects.subtree_depth(self.root), 3)
+        self.assertEqual(Comment.objects.subtree_status_counts(self.root), {'APPROVED': 3, 'PENDING': 1})
+
+    def test_rebuild_command_restores_paths(self):
+        expected = sorted(Comment.objects.values_list('pk', 'path', 'depth'))
+        Comment.objects.update(path='', depth=0)
+        call_command('rebuild_comment_tree', stdout=StringIO())
+        self.assertEqual(sorted(Comment.objects.values_list('pk', 'path', 'depth')), expected)
+
+    def test_attach_reply_tree_loads_visible_replies_in_one_query(self):
+        roots = list(Comment.objects.filter(parent__isnull=True).order_by('pk'))
+        with self.assertNumQueries(2):
+            Comment.objects.filter(status=CommentStatus.APPROVED).attach_reply_tree(roots)
+            self.assertEqual([reply.content for reply in roots[0].replies.all()], ['a', 'd'])
+            self.assertEqual(list(roots[0].replies.all()[0].replies.all()), [])
+            self.assertEqual(list(roots[1].replies.all()), [])
+
+    def test_nested_replies_stop_at_hidden_replies(self):
+        self.assertEqual(self.root.get_total_nested_replies(), 2)
+        self.assertEqual(
+            self.root.get_total_nested_replies([CommentStatus.APPROVED, CommentStatus.PENDING]), 4
+        )
+
+
+class ReplyCountTests(TestCase):
+    def setUp(self):
+        self.root = Comment.objects.create(content='root')
+        self.a = Comment.objects.create(content='a', parent=self.root)
+        self.b = Comment.objects.create(content='b', parent=self.a)
+        self.c = Comment.objects.create(content='c', parent=self.b)
+        self.d = Comment.objects.create(content='d', parent=self.root)
+
+    def set_status(self, comment, status):
+        comment = Comment.objects.get(pk=comment.pk)
+        comment.status = status
+        comment.save()
+
+    def test_counts_all_approved_descendants(self):
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.total_replies, 2)
+        self.assertEqual(self.root.get_descendant_count(), 4)
+        self.assertEqual(self.root.get_descendant_count(), self.root.get_total_nested_replies())
+
+    def test_replies_under_a_hidden_reply_are_not_counted(self):
+        for status in (CommentStatus.PENDING, CommentStatus.REJECTED, CommentStatus.THREAD_DELETED):
+            self.set_status(self.b, status)
+            root = Comment.objects.get(pk=self.root.pk)
+            self.assertEqual(root.get_descendant_count(), 2)
+            self.assertEqual(root.get_descendant_count(), root.get_total_nested_replies())
+            self.assertEqual(nested_reply_count(root, User()), 2)
+        all_statuses = list(CommentStatus.values)
+        self.assertEqual(root.get_descendant_count(all_statuses), 4)
+
+    def test_status_changes_move_counters(self):
+        self.set_status(self.b, CommentStatus.PENDING)
+        self.set_status(self.b, CommentStatus.APPROVED)
+        self.a.refresh_from_db()
+        self.assertEqual(self.a.total_replies, 1)
+        live = counter_snapshot()
+        rebuild_reply_counters()
+        self.assertEqual(counter_snapshot(), live)
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_deletes_keep_counters_consistent(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.get(pk=self.a.pk).soft_delete_thread()
+        live = counter_snapshot()
+        rebuild_reply_counters()
+        self.assertEqual(counter_snapshot(), live)
+        Comment.objects.get(pk=self.a.pk).delete()
+        live = counter_snapshot()
+        rebuild_reply_counters()
+        self.assertEqual(counter_snapshot(), live)
+        root = Comment.objects.get(pk=self.root.pk)
+        self.assertEqual(root.total_replies, 1)
+        self.assertEqual(root.get_descendant_count(list(CommentStatus.values)), 1)
+
+
+class VoteTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+        self.comment = Comment.objects.create(content='x')
+
+    def score(self):
+        return Comment.objects.get(pk=self.comment.pk).score
+
+    def test_votes_apply_deltas(self):
+        CommentVote.objects.create(comment=self.comment, user=self.alice, vote_type=VoteType.UPVOTE)
+        vote = CommentVote.objects.create(comment=self.comment, user=self.bob, vote_type=VoteType.UPVOTE)
+        self.assertEqual(self.score(), 2)
+        vote.vote_type = VoteType.DOWNVOTE
+        vote.save()
+        self.assertEqual(self.score(), 0)
+        vote.delete()
+        self.assertEqual(self.score(), 1)
+
+    def test_saving_a_stale_comment_keeps_the_score(self):
+        CommentVote.objects.create(comment=self.comment, user=self.alice, vote_type=VoteType.UPVOTE)
+        self.comment.content = 'y'
+        self.comment.save()
+        self.assertEqual(self.score(), 1)
+
+    @override_settings(COMMENT_VOTE_BUFFERING=True)
+    def test_buffered_votes_are_flushed(self):
+        CommentVote.objects.create(comment=self.comment, user=self.alice, vote_type=VoteType.UPVOTE)
+        self.assertEqual(self.score(), 0)
+        self.assertEqual(self.comment.get_current_score(), 1)
+        self.assertEqual(flush_vote_buffer(), 1)
+        self.assertEqual(self.score(), 1)
+
+    def test_reconcile_recounts_scores(self):
+        CommentVote.objects.create(comment=self.comment, user=self.alice, vote_type=VoteType.DOWNVOTE)
+        Comment.objects.filter(pk=self.comment.pk).update(score=99)
+        reconcile_comment_scores()
+        self.assertEqual(self.score(), -1)
+
+    def test_vote_views_return_the_new_score(self):
+        self.client.force_login(self.bob)
+        response = self.client.post(
+            reverse('comments:vote_comment', args=[self.comment.pk]), {'vote_type': 'DOWNVOTE'}
+        )
+        self.assertEqual(response.json()['score'], -1)
+        response = self.client.post(reverse('comments:remove_vote', args=[self.comment.pk]))
+        self.assertEqual(response.json()['score'], 0)
+
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'nodes'}})
+class FragmentCacheTests(TestCase):
+    template = Template('{% load comment_tags %}{% comment_node comment %}')
+
+    def setUp(self):
+        fragment_cache.get_cache().clear()
+        self.staff = User.objects.create_user('staff', is_staff=True)
+        self.reader = User.objects.create_user('reader')
+        self.comment = Comment.objects.create(content='first', status=CommentStatus.PENDING)
+
+    def render(self, user, csrf_token='token'):
+        comment = Comment.objects.get(pk=self.comment.pk)
+        return self.template.render(Context({'comment': comment, 'user': user, 'csrf_token': csrf_token}))
+
+    def test_nodes_are_cached_until_the_comment_changes(self):
+        self.assertIn('first', self.render(self.reader))
+        Comment.objects.filter(pk=self.comment.pk).update(content='second')
+        self.assertIn('first', self.render(self.reader))
+        with self.captureOnCommitCallbacks(execute=True):
+            vote = CommentVote.objects.create(comment=self.comment, user=self.reader, vote_type=VoteType.UPVOTE)
+            vote.delete()
+        self.assertIn('second', self.render(self.reader))
+
+    def test_viewers_and_requests_get_their_own_parts(self):
+        self.assertIn('Pending Approval', self.render(self.staff))
+        self.assertNotIn('Pending Approval', self.render(self.reader))
+        self.assertIn('value="other"', self.render(self.reader, csrf_token='other'))
+        self.assertNotIn(fragment_cache.CSRF_MARKER, self.render(self.reader))
+
+
+class ChangelogLoaderTests(TestCase):
+    def setUp(self):
+        self.moderator = User.objects.create_user('moderator')
+        self.edited, self.moderated, self.untouched = [
+            Comment.objects.create(content=name) for name in ('edited', 'moderated', 'untouched')
+        ]
+        for comment, change_types in (
+            (self.edited, [ChangeType.USER_EDIT] * 4),
+            (self.moderated, [ChangeType.USER_EDIT, ChangeType.STATUS_CHANGE, ChangeType.MODERATOR_EDIT]),
+        ):
+            for change_type in change_types:
+                CommentChangeLog.objects.create(comment=comment, changed_by=self.moderator, change_type=change_type)
+
+    def metadata(self, comment):
+        summary = changelog_summary(comment, max_entries=2)
+        return (
+            has_change_history(comment), change_count(comment), moderation_change_count(comment),
+            comment.has_moderation_history(), [entry.pk for entry in summary['changes']],
+            [entry.changed_by.username for entry in summary['changes']],
+        )
+
+    def comments(self, queryset):
+        return {comment.pk: comment for comment in queryset.filter(pk__in=[
+            self.edited.pk, self.moderated.pk, self.untouched.pk
+        ])}
+
+    def test_loaded_metadata_matches_the_queries(self):
+        expected = {pk: self.metadata(comment) for pk, comment in self.comments(Comment.objects.all()).items()}
+        self.assertEqual(expected[self.moderated.pk][:4], (True, 3, 2, True))
+        self.assertEqual(expected[self.untouched.pk][:4], (False, 0, 0, False))
+
+        with self.assertNumQueries(3):
+            comments = self.comments(Comment.objects.with_changelog(recent=2))
+        with self.assertNumQueries(0):
+            loaded = {pk: self.metadata(comment) for pk, comment in comments.items()}
+        self.assertEqual(loaded, expected)
+
+    def test_short_recent_lists_fall_back_to_a_query(self):
+        comment = attach_changelog([Comment.objects.get(pk=self.edited.pk)], recent=1)[0]
+        self.assertEqual(len(comment.recent_changes), 1)
+        with self.assertNumQueries(1):
+            changes = list(changelog_summary(comment, max_entries=3)['changes'])
+        self.assertEqual(len(changes), 3)
+
+
+@override_settings(JOBS_RUN_INLINE=True)
+class ReportGroupTests(TestCase):
+    def setUp(self):
+        self.reporter = User.objects.create_user('reporter')
+        self.spam, self.abuse = [Comment.objects.create(content=name) for name in ('spam', 'abuse')]
+
+    def report(self, comment, report_type, **kwargs):
+        return CommentReport.objects.create(comment=comment, reportee=self.reporter, report_type=report_type, **kwargs)
+
+    def groups(self):
+        return sorted(CommentReportGroup.objects.values_list('comment_id', *CommentReportGroup.AGGREGATE_FIELDS))
+
+    def assertMatchesRebuild(self):
+        live = self.groups()
+        CommentReportGroup.objects.all().delete()
+        self.assertEqual(CommentReportGroup.rebuild(), len(live))
+        self.assertEqual(self.groups(), live)
+        return live
+
+    def test_new_reports_are_added_incrementally(self):
+        self.report(self.spam, ReportType.SPAM, status=ReportStatus.REVIEWED)
+        self.report(self.spam, ReportType.OTHER)
+        self.report(self.spam, ReportType.SPAM)
+        self.report(self.abuse, ReportType.HARASSMENT, status=ReportStatus.RESOLVED)
+
+        group = CommentReportGroup.objects.get(comment=self.spam)
+        self.assertEqual((group.total_reports, group.status), (3, ReportStatus.PENDING))
+        self.assertEqual(group.report_types_summary, {'SPAM': 2, 'OTHER': 1})
+        self.assertEqual(CommentReportGroup.objects.get(comment=self.abuse).status, ReportStatus.RESOLVED)
+        self.assertMatchesRebuild()
+
+        # A new report adjusts the stored group rather than recounting it
+        CommentReportGroup.objects.filter(comment=self.spam).update(total_reports=10)
+        self.report(self.spam, ReportType.SCAM)
+        self.assertEqual(CommentReportGroup.objects.get(comment=self.spam).total_reports, 11)
+
+    def test_updates_and_deletes_recount_the_group(self):
+        reports = [self.report(self.spam, report_type) for report_type in (ReportType.SPAM, ReportType.SCAM)]
+        CommentReport.objects.filter(pk=reports[0].pk).update(status=ReportStatus.RESOLVED)
+        with self.captureOnCommitCallbacks(execute=True):
+            reports[1].status = ReportStatus.REVIEWED
+            reports[1].save()
+        group = CommentReportGroup.objects.get(comment=self.spam)
+        self.assertEqual((group.total_reports, group.status), (2, ReportStatus.REVIEWED))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reports[1].delete()
+        group = CommentReportGroup.objects.get(comment=self.spam)
+        self.assertEqual((group.report_types_summary, group.status), ({'SPAM': 1}, ReportStatus.RESOLVED))
+        self.assertMatchesRebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            reports[0].delete()
+        self.assertFalse(CommentReportGroup.objects.exists())
+
+    def test_rebuild_command_recomputes_every_group(self):
+        self.report(self.spam, ReportType.SPAM)
+        self.report(self.abuse, ReportType.HATE_SPEECH)
+        expected = self.groups()
+        CommentReportGroup.objects.filter(comment=self.spam).update(total_reports=9)
+        CommentReportGroup.objects.filter(comment=self.abuse).delete()
+        call_command('rebuild_report_groups', stdout=StringIO())
+        self.assertEqual(self.groups(), expected)
+
+
+class HistoryTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user('olga')
+        self.moderator = User.objects.create_user('mod', is_staff=True, is_superuser=True)
+        self.project = Project.objects.create(name='P', created_by=self.author)
+        self.comment = Comment.objects.create(user=self.author, content='hello world ' * 20, to_project=self.project)
+
+    def edit(self, text):
+        previous = self.comment.content
+        self.comment.edit(text, editor=self.author)
+        self.comment.log_change(ChangeType.USER_EDIT, self.author, previous_content=previous, new_content=text)
+
+    def test_deltas_round_trip(self):
+        rnd = random.Random(1)
+        for _ in range(200):
+            old = ''.join(rnd.choice('abc \n') for _ in range(rnd.randint(0, 60)))
+            new = ''.join(rnd.choice('abcd \n') for _ in range(rnd.randint(0, 60)))
+            self.assertEqual(history.apply_delta(old, history.make_delta(old, new)), new)
+
+    @override_settings(COMMENT_HISTORY_SNAPSHOT_INTERVAL=10)
+    def test_edits_are_replayed_from_revisions(self):
+        texts = [self.comment.content]
+        for i in range(25):
+            texts.append(texts[-1].replace('world', f'w{i}', 1) + f' edit {i}')
+            self.edit(texts[-1])
+        revisions = CommentRevision.objects.filter(comment=self.comment)
+        self.assertEqual(revisions.count(), 26)
+        self.assertTrue(all(number - base < 10 for number, base in revisions.values_list('number', 'base')))
+        self.assertEqual(history.versions(self.comment), texts)
+        self.assertFalse(CommentChangeLog.objects.exclude(previous_content='').exists())
+
+        with self.assertNumQueries(3):
+            entries = list(self.comment.get_change_history())
+        for entry in entries:
+            self.assertEqual(entry.previous_content, texts[texts.index(entry.new_content) - 1])
+        self.assertEqual(self.comment.get_original_content(), texts[0])
+
+    def test_moderator_edit_keeps_the_original_in_revisions(self):
+        delete_thread(self.comment, moderator=self.moderator)
+        self.assertEqual(self.comment.change_log.get().previous_revision, 0)
+        action = ModerationAction.objects.create(
+            comment=self.comment, moderator=self.moderator, decision=ModerationDecision.EDIT,
+            new_content='clean', decision_scope=DecisionScope.SINGLE_REPORT,
+        )
+        action.updated_apply_decision()
+        action.refresh_from_db()
+        self.assertIsNone(action.original_content)
+        self.assertEqual(history.versions(self.comment), ['hello world ' * 20, 'clean'])
+        self.assertEqual(self.comment.get_original_content(), 'hello world ' * 20)
+
+    def test_compaction_moves_legacy_text_into_revisions(self):
+        comment = Comment.objects.create(
+            user=self.author, content='v3', to_project=self.project,
+            edit_history=[
+                {'content': 'v0', 'edited_at': '2020-01-01T00:00:00+00:00'},
+                {'content': 'v1', 'edited_at': '2020-01-02T00:00:00+00:00'},
+            ],
+        )
+        CommentChangeLog.objects.create(
+            comment=comment, change_type=ChangeType.USER_EDIT, previous_content='v1', new_content='v2'
+        )
+        CommentChangeLog.objects.create(comment=comment, change_type=ChangeType.STATUS_CHANGE, previous_content='v2')
+        CommentChangeLog.objects.create(
+            comment=comment, change_type=ChangeType.USER_EDIT, previous_content='v2', new_content='v3'
+        )
+        before = {entry.pk: (entry.previous_content, entry.new_content) for entry in CommentChangeLog.objects.all()}
+        self.assertEqual(set(history.needs_compaction()), {comment})
+
+        call_command('compact_comment_history', batch_size=1, stdout=StringIO())
+        self.assertFalse(history.needs_compaction().exists())
+        self.assertEqual(history.versions(comment), ['v0', 'v1', 'v2', 'v3'])
+        for entry in comment.get_change_history():
+            self.assertEqual((entry.previous_content, entry.new_content), before[entry.pk])
+        comment.refresh_from_db()
+        self.assertEqual(comment.edit_history, [])
+
+        previous = comment.content
+        comment.edit('v4')
+        comment.log_change(ChangeType.USER_EDIT, self.author, previous_content=previous, new_content='v4')
+        self.assertEqual(history.versions(comment), ['v0', 'v1', 'v2', 'v3', 'v4'])
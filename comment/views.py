@@ -8,7 +8,6 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.paginator import Paginator
 from django.utils import timezone
-import uuid
 from .models import CommentChangeLog, ChangeType, CommentStatus
 User = get_user_model()
 
@@ -121,16 +120,19 @@ ensure_comment_methods()
 
 def comment_list_view(request, object_type, object_id):
     if object_type == "project":
-        comments = Comment.objects.filter(to_project=object_id, parent__isnull=True).select_related("user").prefetch_related("replies__user")
+        comments = Comment.objects.filter(to_project=object_id, parent__isnull=True)
     elif object_type == "task":
-        comments = Comment.objects.filter(to_task=object_id, parent__isnull=True).select_related("user").prefetch_related("replies__user")
+        comments = Comment.objects.filter(to_task=object_id, parent__isnull=True)
     elif object_type == "need":
-        comments = Comment.objects.filter(to_need=object_id, parent__isnull=True).select_related("user").prefetch_related("replies__user")
+        comments = Comment.objects.filter(to_need=object_id, parent__isnull=True)
     # NEW: Handle problem comments
     elif object_type == "problem":
-        comments = Comment.objects.filter(to_problem=object_id, parent__isnull=True).select_related("user").prefetch_related("replies__user")
+        comments = Comment.objects.filter(to_problem=object_id, parent__isnull=True)
     else:
         return JsonResponse({"error": "Invalid object type"}, status=400)
+    comments = comments.select_related("user").with_user_vote(request.user).with_changelog().with_reply_tree(
+        Comment.objects.select_related("user").with_user_vote(request.user).with_changelog()
+    )
     return render(request, "comments.html", {"comments": comments})
 
 
@@ -199,9 +201,6 @@ def report_comment_view(request, comment_id):
                 report = form.save()
                 messages.success(request, "Thank you for your report. A moderator will review it soon.")
                 
-                # Update the report group after creating a new report
-                CommentReportGroup.update_for_comment(comment)
-                
                 if is_moderator(request.user):
                     return redirect('comments:enhanced_report_detail', comment_id=comment.id)
                 else:
@@ -296,21 +295,27 @@ def add_comment(request):
 
 def load_replies(request, comment_id):
     parent_comment = get_object_or_404(Comment, id=comment_id)
-    replies = parent_comment.replies.select_related("user", "user__profile").all()
-    
-    reply_data = []
-    for reply in replies:
-        reply_info = {
-            "id": reply.id,
-            "content": reply.content,
-            "user": reply.user.username if reply.user else "Anonymous",
-            "user_id": reply.user.id if reply.user else None,
-            "author_avatar": get_avatar_url(reply.user),
-            "total_replies": reply.total_replies,
-            "score": reply.score,
-        }
-        reply_data.append(reply_info)
-    return JsonResponse({"replies": reply_data})
+    # Fetch the whole subtree in one query so nested replies come along
+    Comment.objects.select_related("user", "user__profile").attach_reply_tree([parent_comment])
+    
+    def serialize_replies(comment):
+        reply_data = []
+        for reply in comment.replies.all():
+            reply_info = {
+                "id": reply.id,
+                "content": reply.content,
+                "user": reply.user.username if reply.user else "Anonymous",
+                "user_id": reply.user.id if reply.user else None,
+                "author_avatar": get_avatar_url(reply.user),
+                "total_replies": reply.total_replies,
+                "score": reply.score,
+                "depth": reply.depth,
+                "replies": serialize_replies(reply),
+            }
+            reply_data.append(reply_info)
+        return reply_data
+    
+    return JsonResponse({"replies": serialize_replies(parent_comment)})
 
 
 def vote_comment(request, comment_id):
@@ -334,10 +339,7 @@ def vote_comment(request, comment_id):
         user=request.user,
         defaults={"vote_type": vote_type}
     )
-    upvotes = comment.votes.filter(vote_type=VoteType.UPVOTE).count()
-    downvotes = comment.votes.filter(vote_type=VoteType.DOWNVOTE).count()
-    comment.score = upvotes - downvotes
-    comment.save(update_fields=['score'])
+    comment.score = comment.get_current_score()
     return JsonResponse({
         "id": comment.id,
         "score": comment.score,
@@ -354,10 +356,7 @@ def remove_vote(request, comment_id):
     try:
         vote = CommentVote.objects.get(comment=comment, user=request.user)
         vote.delete()
-        upvotes = comment.votes.filter(vote_type=VoteType.UPVOTE).count()
-        downvotes = comment.votes.filter(vote_type=VoteType.DOWNVOTE).count()
-        comment.score = upvotes - downvotes
-        comment.save(update_fields=['score'])
+        comment.score = comment.get_current_score()
         return JsonResponse({
             "id": comment.id,
             "score": comment.score,
@@ -458,79 +457,24 @@ def enhanced_delete_comment(request, comment_id):
         apply_to_all = request.POST.get('apply_to_all', False)
         
         try:
-            # Count affected children for bulk operations
-            affected_children = comment.replies.all()
-            children_count = affected_children.count()
-            bulk_operation_id = uuid.uuid4() if children_count > 0 else None
-            
-            # Store original data for changelog
-            original_content = comment.content
-            original_status = comment.status
-            
             # Create moderation action for audit trail
             moderation_action = ModerationAction.objects.create(
                 moderator=request.user,
                 comment=comment,
-                decision=ModerationDecision.REMOVE,
+                decision=ModerationDecision.DELETE_THREAD,
                 decision_scope=DecisionScope.ALL_REPORTS if apply_to_all else DecisionScope.SINGLE_REPORT,
                 reason=reason,
                 notify_reporters=True,
                 project=comment.to_project or (comment.to_task.to_project if comment.to_task else None) or (comment.to_need.to_project if comment.to_need else None)
             )
             
-            # Create changelog entry for the main comment deletion
-            if children_count > 0:
-                # Bulk deletion
-                comment.log_change(
-                    change_type=ChangeType.BULK_THREAD_DELETION,
-                    changed_by=request.user,
-                    previous_content=original_content,
-                    previous_status=original_status,
-                    new_status=CommentStatus.THREAD_DELETED,
-                    reason=reason,
-                    moderation_action=moderation_action,
-                    ip_address=get_client_ip(request),
-                    user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                    affected_children_count=children_count,
-                    bulk_operation_id=bulk_operation_id
-                )
-                
-                # Create individual changelog entries for affected children
-                for child_comment in affected_children:
-                    child_comment.log_change(
-                        change_type=ChangeType.STATUS_CHANGE,
-                        changed_by=request.user,
-                        previous_status=child_comment.status,
-                        new_status=CommentStatus.REPLY_TO_DELETED,
-                        reason=f"Parent comment deleted in bulk operation",
-                        moderation_action=moderation_action,
-                        ip_address=get_client_ip(request),
-                        user_agent=request.META.get('HTTP_USER_AGENT', ''),
-                        bulk_operation_id=bulk_operation_id
-                    )
-            else:
-                # Single comment deletion
-                comment.log_change(
-                    change_type=ChangeType.THREAD_DELETION,
-                    changed_by=request.user,
-                    previous_content=original_content,
-                    previous_status=original_status,
-                    new_status=CommentStatus.THREAD_DELETED,
-                    reason=reason,
-                    moderation_action=moderation_action,
-                    ip_address=get_client_ip(request),
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')
-                )
-            
-            # Apply the decision (this will update comment status and resolve reports)
-            moderation_action.apply_decision()
-            
-            # Actually delete the comment
+            # Soft-delete the whole thread (one set-based update and one batch
+            # of changelog entries) and resolve the reports
             comment_content_preview = comment.content[:50] + "..." if len(comment.content) > 50 else comment.content
-            comment.delete()
-            
-            # Update report group (will be deleted if no reports remain)
-            CommentReportGroup.update_for_comment(comment)
+            moderation_action.updated_apply_decision(
+                ip_address=get_client_ip(request),
+                user_agent=request.META.get('HTTP_USER_AGENT', '')
+            )
             
             messages.success(request, f"Comment '{comment_content_preview}' has been deleted successfully.")
             logger.info(f"Comment {comment_id} deleted by moderator {request.user.username}")
@@ -713,7 +657,7 @@ def enhanced_report_detail_view(request, comment_id):
             
             # Apply the decision
             try:
-                action.apply_decision()
+                action.updated_apply_decision()
                 messages.success(request, f"Moderation action '{action.get_decision_display()}' applied successfully.")
                 
                 # Update report group
@@ -4,7 +4,7 @@ from comment.models import Comment
 
 def decision_details(request, decision_id):
     decision = get_object_or_404(Decision, id=decision_id)
-    comments = Comment.objects.filter(to_decision=decision).all()  # Comments related to this decision
+    comments = Comment.objects.filter(to_decision=decision).select_related('user').with_user_vote(request.user)  # Comments related to this decision
 
     context = {
         'decision': decision,
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from feed.recommend import build_feed
+
+
+class Command(BaseCommand):
+    help = 'Rank open tasks, needs and problems for each user and store the results as their feed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only rebuild the feed of this user id (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        count = build_feed(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Successfully built {count} feed items'))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('task', 'Task'), ('need', 'Need'), ('problem', 'Problem')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('built_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'kind', '-score'], name='feed_feedit_user_id_879e0c_idx'), models.Index(fields=['user', '-score'], name='feed_feedit_user_id_c93a10_idx')],
+                'unique_together': {('user', 'kind', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import models
+
+
+class FeedItem(models.Model):
+    """
+    One precomputed recommendation: an open task, need or problem for a user.
+
+    Rows are written by feed.recommend.build_feed (manage.py build_feed) and
+    only read by the pages, so they can be a little stale; readers re-check
+    visibility and status.
+    """
+    KIND_CHOICES = [
+        ('task', 'Task'),
+        ('need', 'Need'),
+        ('problem', 'Problem'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='feed_items'
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    score = models.FloatField()
+    built_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'kind', 'object_id')
+        indexes = [
+            models.Index(fields=['user', 'kind', '-score']),
+            models.Index(fields=['user', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} for {self.user} ({self.score:.2f})"
@@ -0,0 +1,256 @@
+"""
+"Work for you": open tasks, needs and problems ranked per user.
+
+Scoring is a batch job (manage.py build_feed) that writes the best
+FEED_ITEMS_PER_KIND items of each kind per user to FeedItem; pages only
+read that table. An item's score for a user is
+
+    AFFINITY_WEIGHT * affinity      mean log(1 + weight) of the user's
+                                    demonstrated skills (need.matching) over
+                                    the item's skills
+  + MEMBER_WEIGHT                   if the user is a member of its project
+  + PRIORITY_WEIGHT * priority      priority scaled to 0..1
+  + DEADLINE_WEIGHT * urgency       1 when due or overdue, falling to 0
+                                    DEADLINE_HORIZON days out
+
+and only users with some affinity or a membership get the item. For each
+item the affinities of all users come from one pass over the skill columns
+of the volunteer matrix, so the job is a sparse matrix product rather than
+a query per user and item.
+"""
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from feed.models import FeedItem
+from need.matching import get_matrix
+
+
+AFFINITY_WEIGHT = 1.0
+MEMBER_WEIGHT = 1.0
+PRIORITY_WEIGHT = 0.5
+DEADLINE_WEIGHT = 0.5
+DEADLINE_HORIZON = timedelta(days=14)
+
+
+class FeedSource:
+    """Where the candidates of one kind come from and how to read them"""
+
+    def __init__(self, kind, model, skills_field, open_statuses, deadline_field,
+                 priority_range, project_fields, public_visibility,
+                 member_visibility=(), filters=None, detail_url=None):
+        self.kind = kind
+        self.model_label = model
+        self.skills_field = skills_field
+        self.open_statuses = open_statuses
+        self.deadline_field = deadline_field
+        self.priority_range = priority_range
+        self.project_fields = project_fields
+        # Visibilities anyone logged in can see, and those members of the
+        # item's project can see; anything else never enters the feed
+        self.public_visibility = set(public_visibility)
+        self.member_visibility = set(member_visibility)
+        self.filters = filters or {}
+        self.detail_url = detail_url
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def open_items(self):
+        return self.model.objects.filter(status__in=self.open_statuses, **self.filters)
+
+    def priority(self, value):
+        low, high = self.priority_range
+        if value is None:
+            return 0.0
+        return min(max((value - low) / (high - low), 0.0), 1.0)
+
+    def candidates(self):
+        """(pk, skill_ids, project_ids, visibility, created_by_id, priority, deadline) per open item"""
+        skills = defaultdict(list)
+        through = getattr(self.model, self.skills_field).through
+        source_field = f'{self.model._meta.model_name}_id'
+        for object_id, skill_id in through.objects.filter(
+            **{f'{self.model._meta.model_name}__in': self.open_items().values('pk')}
+        ).values_list(source_field, 'skill_id'):
+            skills[object_id].append(skill_id)
+
+        for pk, visibility, created_by_id, priority, deadline, *project_ids in (
+            self.open_items().values_list(
+                'pk', 'visibility', 'created_by_id', 'priority', self.deadline_field,
+                *[f'{field}_id' for field in self.project_fields],
+            ).order_by()
+        ):
+            yield (
+                pk, skills.get(pk, []), {project_id for project_id in project_ids if project_id},
+                visibility, created_by_id, self.priority(priority), deadline,
+            )
+
+
+SOURCES = {
+    source.kind: source for source in [
+        FeedSource(
+            'task', 'task.Task', 'skills',
+            open_statuses=['todo', 'in_progress'],
+            deadline_field='due_date',
+            priority_range=(1, 4),
+            project_fields=['to_project', 'main_project'],
+            public_visibility=['public', 'logged_in'],
+            detail_url='task:task_detail',
+        ),
+        FeedSource(
+            'need', 'need.Need', 'required_skills',
+            open_statuses=['pending', 'in_progress'],
+            deadline_field='deadline',
+            priority_range=(0, 100),
+            project_fields=['to_project', 'main_project'],
+            public_visibility=['public'],
+            member_visibility=['members'],
+            filters={'is_current': True},
+            detail_url='need:need',
+        ),
+        FeedSource(
+            'problem', 'problems.Problem', 'skills',
+            open_statuses=['open', 'reopened', 'in_progress', 'needs_info', 'pending'],
+            deadline_field='due_date',
+            priority_range=(1, 4),
+            project_fields=['to_project'],
+            public_visibility=['public', 'logged_in'],
+            member_visibility=['restricted'],
+            detail_url='problems:detail',
+        ),
+    ]
+}
+
+
+def _feed_size():
+    return getattr(settings, 'FEED_ITEMS_PER_KIND', 30)
+
+
+def _urgency(deadline, now):
+    if deadline is None:
+        return 0.0
+    remaining = deadline - now
+    if remaining <= timedelta(0):
+        return 1.0
+    return max(0.0, 1.0 - remaining / DEADLINE_HORIZON)
+
+
+def score_items(source, user_ids, members, now, size):
+    """
+    {user_id: [(score, object_id), ...]} for one kind, at most size items
+    per user, from the in-memory volunteer matrix and project members.
+    """
+    matrix = get_matrix()
+    feeds = defaultdict(list)
+    for pk, skill_ids, project_ids, visibility, created_by_id, priority, deadline in source.candidates():
+        item_members = set()
+        for project_id in project_ids:
+            item_members |= members.get(project_id, set())
+        if visibility in source.public_visibility:
+            readers = None
+        elif visibility in source.member_visibility:
+            readers = item_members
+        else:
+            continue
+
+        affinity = {
+            user_id: score / len(skill_ids)
+            for user_id, (_, score) in matrix.scores(skill_ids).items()
+        } if skill_ids else {}
+        base = PRIORITY_WEIGHT * priority + DEADLINE_WEIGHT * _urgency(deadline, now)
+        for user_id in affinity.keys() | item_members:
+            if user_id == created_by_id or user_id not in user_ids:
+                continue
+            if readers is not None and user_id not in readers:
+                continue
+            score = (
+                base +
+                AFFINITY_WEIGHT * affinity.get(user_id, 0.0) +
+                (MEMBER_WEIGHT if user_id in item_members else 0.0)
+            )
+            heap = feeds[user_id]
+            if len(heap) < size:
+                heapq.heappush(heap, (score, pk))
+            elif (score, pk) > heap[0]:
+                heapq.heapreplace(heap, (score, pk))
+    return feeds
+
+
+def build_feed(user_ids=None):
+    """
+    Recompute the feeds of some active users (all of them by default).
+    Returns the number of FeedItem rows written.
+    """
+    from project.models import Membership
+
+    users = get_user_model().objects.filter(is_active=True)
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    user_ids = set(users.values_list('pk', flat=True))
+
+    members = defaultdict(set)
+    for user_id, project_id in Membership.objects.values_list('user_id', 'project_id'):
+        members[project_id].add(user_id)
+
+    now = timezone.now()
+    size = _feed_size()
+    rows = []
+    for kind, source in SOURCES.items():
+        for user_id, heap in score_items(source, user_ids, members, now, size).items():
+            rows.extend(
+                FeedItem(user_id=user_id, kind=kind, object_id=pk, score=score, built_at=now)
+                for score, pk in heap
+            )
+
+    with transaction.atomic():
+        FeedItem.objects.filter(user_id__in=user_ids).delete()
+        FeedItem.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def recommended(user, kind=None, limit=5, queryset=None):
+    """
+    The user's best feed items, of one kind or all of them, best first.
+
+    Each object gets `feed_kind`, `feed_score` and `feed_url`. Visibility and
+    status are checked again since the feed is built ahead of time; pass
+    queryset to narrow one kind further (e.g. to a project's problems).
+    """
+    if not user.is_authenticated:
+        return []
+    items = FeedItem.objects.filter(user=user).order_by('-score', 'kind', 'object_id')
+    if kind is not None:
+        items = items.filter(kind=kind)
+    # Read past the limit so items that closed or became hidden are made up for
+    ranked = list(items.values_list('kind', 'object_id', 'score')[:limit * 3])
+
+    objects = {}
+    for item_kind in {item_kind for item_kind, _, _ in ranked}:
+        source = SOURCES[item_kind]
+        items_of_kind = queryset if queryset is not None and item_kind == kind else source.model.objects
+        found = items_of_kind.visible_to(user).filter(
+            status__in=source.open_statuses, **source.filters
+        ).in_bulk([object_id for ranked_kind, object_id, _ in ranked if ranked_kind == item_kind])
+        objects.update({(item_kind, pk): obj for pk, obj in found.items()})
+
+    results = []
+    for item_kind, object_id, score in ranked:
+        obj = objects.get((item_kind, object_id))
+        if obj is None:
+            continue
+        obj.feed_kind = item_kind
+        obj.feed_score = round(score, 3)
+        obj.feed_url = reverse(SOURCES[item_kind].detail_url, args=[object_id])
+        results.append(obj)
+        if len(results) == limit:
+            break
+    return results
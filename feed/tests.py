@@ -0,0 +1,82 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from feed.models import FeedItem
+from feed.recommend import build_feed, recommended
+from need import matching
+from need.models import Need
+from problems.models import Problem
+from project.models import Membership, Project
+from skills.models import Skill
+from task.models import Task
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        matching.reset_matrix()
+        self.owner, self.coder, self.member = [
+            User.objects.create_user(name) for name in ('owner', 'coder', 'member')
+        ]
+        self.python = Skill.objects.create(name='Python')
+        self.project = Project.objects.create(name='p', created_by=self.owner)
+        Membership.objects.create(user=self.member, project=self.project)
+        with self.captureOnCommitCallbacks(execute=True):
+            done = Need.objects.create(name='done', desc='d', status='fulfilled', completed_by=self.coder)
+            done.required_skills.add(self.python)
+
+        self.task = Task.objects.create(name='t', desc='d', created_by=self.owner)
+        self.task.skills.add(self.python)
+        self.urgent = Task.objects.create(
+            name='u', desc='d', created_by=self.owner, priority=4, due_date=timezone.now() - timedelta(days=1)
+        )
+        self.urgent.skills.add(self.python)
+        self.hidden = Problem.objects.create(
+            name='x', desc='d', visibility='restricted', created_by=self.owner, to_project=self.project
+        )
+        self.hidden.skills.add(self.python)
+        self.members_need = Need.objects.create(
+            name='n', desc='d', visibility='members', to_project=self.project, created_by=self.owner
+        )
+        Task.objects.create(name='closed', desc='d', created_by=self.owner, status='completed').skills.add(self.python)
+
+    def tearDown(self):
+        matching.reset_matrix()
+
+    def feed(self, user):
+        return list(
+            FeedItem.objects.filter(user=user).order_by('-score').values_list('kind', 'object_id')
+        )
+
+    def test_items_go_to_matching_users_and_project_members(self):
+        build_feed()
+        self.assertEqual(self.feed(self.coder), [('task', self.urgent.pk), ('task', self.task.pk)])
+        self.assertEqual(
+            set(self.feed(self.member)), {('problem', self.hidden.pk), ('need', self.members_need.pk)}
+        )
+        self.assertEqual(self.feed(self.owner), [])
+
+    def test_readers_recheck_status_and_visibility(self):
+        call_command('build_feed', stdout=StringIO())
+        self.assertEqual(recommended(self.coder), [self.urgent, self.task])
+        self.urgent.status = 'completed'
+        self.urgent.save()
+        self.task.visibility = 'restricted'
+        self.task.save()
+        self.assertEqual(recommended(self.coder), [])
+        self.assertEqual(recommended(self.member, kind='need'), [self.members_need])
+        self.assertEqual(
+            recommended(self.member, kind='need')[0].feed_url, reverse('need:need', args=[self.members_need.pk])
+        )
+
+    def test_rebuilding_some_users_keeps_the_others(self):
+        build_feed()
+        Membership.objects.filter(user=self.member).delete()
+        build_feed([self.member.pk])
+        self.assertEqual(self.feed(self.member), [])
+        self.assertEqual(len(self.feed(self.coder)), 2)
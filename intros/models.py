@@ -164,24 +164,21 @@ class Intro(models.Model):
             return False
         
         # Creator can always edit
-        if user == self.by_user:
+        if self.by_user_id == user.pk:
             return True
         
         # Project admins/moderators can edit if intro belongs to their project
-        if self.main_project:
-            from project.models import Membership
-            return Membership.objects.filter(
-                project=self.main_project,
-                user=user,
-                is_administrator=True
-            ).exists() or Membership.objects.filter(
-                project=self.main_project,
-                user=user, 
-                is_moderator=True
-            ).exists()
+        if self.main_project_id:
+            return self._is_project_staff(user)
         
         return False
     
+    def _is_project_staff(self, user):
+        """Whether user administers or moderates the intro's main project"""
+        from utils.permissions import get_project_perms
+        membership = get_project_perms(user).membership(self.main_project_id)
+        return bool(membership and (membership.is_administrator or membership.is_moderator))
+    
     def can_view(self, user):
         """Check if user can view this intro"""
         # Check intro's own status first
@@ -189,19 +186,10 @@ class Intro(models.Model):
             # Only creator and project admins can view non-published intros
             if not user or not user.is_authenticated:
                 return False
-            if user == self.by_user:
+            if self.by_user_id == user.pk:
                 return True
-            if self.main_project:
-                from project.models import Membership
-                return Membership.objects.filter(
-                    project=self.main_project,
-                    user=user,
-                    is_administrator=True
-                ).exists() or Membership.objects.filter(
-                    project=self.main_project,
-                    user=user,
-                    is_moderator=True
-                ).exists()
+            if self.main_project_id:
+                return self._is_project_staff(user)
             return False
         
         # For published intros, check visibility
@@ -210,16 +198,13 @@ class Intro(models.Model):
         elif self.visibility == 'logged_in' and user and user.is_authenticated:
             return True
         elif self.visibility == 'restricted' and user and user.is_authenticated:
-            if user == self.by_user:
+            if self.by_user_id == user.pk:
                 return True
-            if self.main_project:
-                from project.models import Membership
-                return Membership.objects.filter(
-                    project=self.main_project,
-                    user=user
-                ).exists()
+            if self.main_project_id:
+                from utils.permissions import get_project_perms
+                return get_project_perms(user).is_member(self.main_project_id)
         elif self.visibility == 'private' and user and user.is_authenticated:
-            return user == self.by_user
+            return self.by_user_id == user.pk
         
         return False
     
@@ -441,13 +426,9 @@ class IntroRelation(models.Model):
         # Project admins/moderators can edit
         entity_project = self.get_entity_project()
         if entity_project:
-            from project.models import Membership
-            return Membership.objects.filter(
-                project=entity_project,
-                user=user
-            ).filter(
-                models.Q(is_administrator=True) | models.Q(is_moderator=True)
-            ).exists()
+            from utils.permissions import get_project_perms
+            membership = get_project_perms(user).membership(entity_project)
+            return bool(membership and (membership.is_administrator or membership.is_moderator))
         
         return False
     
@@ -12,6 +12,7 @@ from django.db.models import Q, Prefetch
 from .models import Intro, IntroRelation, LinkingIssue
 from .forms import IntroForm, IntroLinkForm
 from django.core.paginator import Paginator
+from search.index import search
 
 
 class BaseIntroView(LoginRequiredMixin):
@@ -55,11 +56,9 @@ class IntroListView(LoginRequiredMixin, ListView):
             queryset = queryset.filter(main_project_id=project_id)
         
         # Search functionality
-        search = self.request.GET.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(summary__icontains=search)
-            )
+        query = self.request.GET.get('search', '').strip()
+        if query:
+            queryset = search(queryset, query).order_by('search_rank', '-created_at')
         
         return queryset
     
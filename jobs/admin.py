@@ -0,0 +1,30 @@
+from django.contrib import admin
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Job, JobStatus
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'priority', 'attempts', 'max_attempts', 'run_at', 'created_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'dedup_key', 'last_error')
+    readonly_fields = ('created_at', 'locked_at', 'locked_by', 'last_error')
+    actions = ['retry_jobs']
+
+    @admin.action(description="Retry selected failed jobs")
+    def retry_jobs(self, request, queryset):
+        count = 0
+        for job in queryset.filter(status=JobStatus.FAILED):
+            job.status = JobStatus.PENDING
+            job.attempts = 0
+            job.run_at = timezone.now()
+            try:
+                with transaction.atomic():
+                    job.save()
+            except IntegrityError:
+                # An identical job is already pending
+                continue
+            count += 1
+        self.message_user(request, f"{count} jobs queued again.")
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.worker import run
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs on a thread or process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Jobs run at the same time')
+        parser.add_argument('--pool', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--batch-size', type=int, default=None, help='Jobs claimed per round (default workers x 4)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for jobs until interrupted')
+        parser.add_argument('--interval', type=int, default=5, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            succeeded, failed = run(options['workers'], options['batch_size'], options['pool'])
+            if succeeded or failed or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Successfully ran {succeeded} jobs ({failed} failed)')
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
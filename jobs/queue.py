@@ -0,0 +1,101 @@
+"""
+Deferring work to manage.py run_jobs, with the database as the queue.
+
+Task functions are plain functions decorated with background_task, which
+adds a .defer(*args, **kwargs) method. Arguments must be JSON (ids rather
+than model instances); the task reads the current state when it runs.
+
+    @background_task(priority=5, dedup_key=lambda comment_ids: ...)
+    def refresh_report_groups(comment_ids):
+        ...
+
+    refresh_report_groups.defer([comment.pk])
+
+defer() adds the Job row once the current transaction commits, so a task
+never runs against data that was rolled back or is not visible yet. A
+dedup key drops the job while an identical one is still pending: it will
+read the same data when it runs. With JOBS_RUN_INLINE the function is
+called at that point instead, in the request's process.
+"""
+import hashlib
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from jobs.models import Job
+
+
+def run_inline():
+    return getattr(settings, 'JOBS_RUN_INLINE', False)
+
+
+def _key(dedup_key):
+    if dedup_key and len(dedup_key) > Job._meta.get_field('dedup_key').max_length:
+        return hashlib.sha1(dedup_key.encode()).hexdigest()
+    return dedup_key
+
+
+def enqueue(name, args=(), kwargs=None, priority=0, dedup_key=None, delay=None, max_attempts=3):
+    """Queue a call of the task at dotted path name once the current transaction commits"""
+    kwargs = kwargs or {}
+    if run_inline():
+        transaction.on_commit(lambda: resolve(name)(*args, **kwargs))
+        return
+
+    def insert():
+        Job.objects.bulk_create([Job(
+            name=name,
+            args=list(args),
+            kwargs=kwargs,
+            priority=priority,
+            dedup_key=_key(dedup_key),
+            max_attempts=max_attempts,
+            run_at=timezone.now() + (delay or timedelta(0)),
+        )], ignore_conflicts=True)
+
+    transaction.on_commit(insert)
+
+
+def resolve(name):
+    """The task function at a dotted path; only decorated functions are run"""
+    func = import_string(name)
+    if not getattr(func, 'is_background_task', False):
+        raise ValueError(f"{name} is not a background task")
+    return func
+
+
+def _defer(func, *args, **kwargs):
+    options = func.task_options
+    dedup_key = options['dedup_key']
+    enqueue(
+        func.task_name,
+        args,
+        kwargs,
+        priority=options['priority'],
+        dedup_key=dedup_key(*args, **kwargs) if dedup_key else None,
+        delay=options['delay'],
+        max_attempts=options['max_attempts'],
+    )
+
+
+def background_task(priority=0, dedup_key=None, delay=None, max_attempts=3):
+    """
+    Make a function deferrable with .defer(). dedup_key, if given, is
+    called with the same arguments and returns the job's key (or None).
+    """
+    def decorate(func):
+        func.is_background_task = True
+        func.task_name = f'{func.__module__}.{func.__qualname__}'
+        func.task_options = {
+            'priority': priority,
+            'dedup_key': dedup_key,
+            'delay': delay,
+            'max_attempts': max_attempts,
+        }
+        func.defer = partial(_defer, func)
+        return func
+    return decorate
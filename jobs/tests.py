@@ -0,0 +1,109 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from jobs import worker
+from jobs.models import Job, JobStatus
+from jobs.queue import background_task, resolve
+
+
+CALLS = []
+
+
+@background_task(priority=1, dedup_key=lambda value: f'record:{value}')
+def record(value):
+    CALLS.append(value)
+
+
+@background_task(priority=9)
+def urgent(value):
+    CALLS.append(('urgent', value))
+
+
+@background_task(max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+@override_settings(JOBS_RUN_INLINE=False)
+class QueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_jobs_are_queued_on_commit_once_per_key(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            record.defer(1)
+        self.assertFalse(Job.objects.exists())
+        for callback in callbacks:
+            callback()
+        with self.captureOnCommitCallbacks(execute=True):
+            record.defer(1)
+            record.defer(2)
+        self.assertEqual(sorted(Job.objects.values_list('dedup_key', flat=True)), ['record:1', 'record:2'])
+        self.assertEqual(Job.objects.get(dedup_key='record:1').name, f'{__name__}.record')
+
+    @override_settings(JOBS_RUN_INLINE=True)
+    def test_inline_mode_runs_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record.defer(5)
+        self.assertEqual(CALLS, [5])
+        self.assertFalse(Job.objects.exists())
+
+    def test_only_background_tasks_are_resolved(self):
+        self.assertIs(resolve(f'{__name__}.record'), record)
+        with self.assertRaises(ValueError):
+            resolve('os.getcwd')
+
+
+@override_settings(JOBS_RUN_INLINE=False, JOBS_RETRY_DELAY=0)
+class WorkerTests(TransactionTestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_run_jobs_by_priority_and_retries_failures(self):
+        record.defer(1)
+        urgent.defer(2)
+        explode.defer()
+        Job.objects.create(name='os.getcwd')
+        with self.assertLogs('jobs.worker', 'ERROR'):
+            call_command('run_jobs', workers=1, stdout=StringIO())
+        self.assertEqual(CALLS, [('urgent', 2), 1])
+        failed = Job.objects.get(name__endswith='.explode')
+        self.assertEqual((failed.status, failed.attempts), (JobStatus.FAILED, 2))
+        self.assertIn('RuntimeError', failed.last_error)
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {JobStatus.FAILED})
+
+    def test_stale_locks_are_released(self):
+        for value in range(10):
+            record.defer(value)
+        Job.objects.filter(dedup_key='record:0').update(
+            status=JobStatus.RUNNING, locked_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(worker.run(workers=4), (10, 0))
+        self.assertEqual(sorted(CALLS), list(range(10)))
+        self.assertFalse(Job.objects.exists())
+
+    def test_stale_job_with_a_pending_duplicate_is_dropped(self):
+        record.defer(1)
+        Job.objects.update(status=JobStatus.RUNNING, locked_at=timezone.now() - timedelta(hours=1))
+        record.defer(1)
+        self.assertEqual(worker.run(workers=1), (1, 0))
+        self.assertEqual(CALLS, [1])
+        self.assertEqual(Job.objects.get().status, JobStatus.FAILED)
+
+    def test_only_one_of_several_stale_duplicates_is_requeued(self):
+        record.defer(1)
+        Job.objects.update(status=JobStatus.RUNNING)
+        record.defer(1)
+        record.defer(2)
+        Job.objects.update(status=JobStatus.RUNNING, locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(worker.release_stale(timezone.now()), 2)
+        self.assertEqual(
+            sorted(Job.objects.values_list('dedup_key', 'status')),
+            [('record:1', JobStatus.FAILED), ('record:1', JobStatus.PENDING), ('record:2', JobStatus.PENDING)],
+        )
+        self.assertEqual(worker.run(workers=1), (2, 0))
+        self.assertEqual(sorted(CALLS), [1, 2])
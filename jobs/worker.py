@@ -0,0 +1,160 @@
+"""
+Running queued jobs (manage.py run_jobs).
+
+Each round claims up to batch_size due jobs, highest priority first, by
+marking them RUNNING in one transaction (skipping rows another worker has
+locked, where the database supports it), then runs them on a thread or
+process pool. A job is deleted when it succeeds; when it raises it goes
+back to PENDING after JOBS_RETRY_DELAY * 2 ** (attempts - 1) seconds, or
+stays FAILED after max_attempts. Jobs left RUNNING for longer than
+JOBS_LOCK_TIMEOUT by a worker that died are claimed again, so a task may
+run more than once and should be safe to repeat.
+"""
+import logging
+import os
+import socket
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from jobs.models import Job, JobStatus
+from jobs.queue import resolve
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_retry_delay(attempts):
+    return timedelta(seconds=getattr(settings, 'JOBS_RETRY_DELAY', 30) * 2 ** max(attempts - 1, 0))
+
+
+def get_lock_timeout():
+    return timedelta(seconds=getattr(settings, 'JOBS_LOCK_TIMEOUT', 600))
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def release_stale(now):
+    """Give jobs of dead workers back to the queue; returns how many"""
+    stale = Job.objects.filter(status=JobStatus.RUNNING, locked_at__lt=now - get_lock_timeout())
+    with transaction.atomic():
+        # A pending copy of a stale job already covers its work
+        covered = stale.filter(
+            dedup_key__in=Job.objects.filter(status=JobStatus.PENDING, dedup_key__isnull=False).values('dedup_key')
+        )
+        covered.update(status=JobStatus.FAILED, last_error='Worker lost; superseded by a pending duplicate')
+        # Only one of several stale copies of a job can be pending again
+        first_copies = stale.filter(dedup_key__isnull=False).values('dedup_key').annotate(
+            first=Min('pk')
+        ).values('first').order_by()
+        stale.filter(dedup_key__isnull=False).exclude(pk__in=first_copies).update(
+            status=JobStatus.FAILED, last_error='Worker lost; superseded by a stale duplicate'
+        )
+    try:
+        with transaction.atomic():
+            return stale.update(status=JobStatus.PENDING, locked_at=None, locked_by='')
+    except IntegrityError:
+        # A duplicate was queued meanwhile: requeue the jobs one at a time
+        released = 0
+        for job_id in stale.values_list('pk', flat=True):
+            try:
+                with transaction.atomic():
+                    released += Job.objects.filter(pk=job_id, status=JobStatus.RUNNING).update(
+                        status=JobStatus.PENDING, locked_at=None, locked_by=''
+                    )
+            except IntegrityError:
+                Job.objects.filter(pk=job_id).update(
+                    status=JobStatus.FAILED, last_error='Worker lost; superseded by a pending duplicate'
+                )
+        return released
+
+
+def claim(limit, now=None):
+    """Mark up to limit due jobs RUNNING for this worker; returns their ids in run order"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        job_ids = list(
+            Job.objects.select_for_update(skip_locked=True).filter(
+                status=JobStatus.PENDING, run_at__lte=now
+            ).order_by('-priority', 'run_at', 'pk').values_list('pk', flat=True)[:limit]
+        )
+        Job.objects.filter(pk__in=job_ids).update(
+            status=JobStatus.RUNNING,
+            locked_at=now,
+            locked_by=worker_id(),
+            attempts=F('attempts') + 1,
+        )
+    return job_ids
+
+
+def run_job(job_id):
+    """Run one claimed job and record the outcome; returns True if it succeeded"""
+    try:
+        job = Job.objects.get(pk=job_id)
+        try:
+            resolve(job.name)(*job.args, **job.kwargs)
+        except Exception:
+            logger.exception("Job %s (%s) failed", job.pk, job.name)
+            fail(job, traceback.format_exc())
+            return False
+        job.delete()
+        return True
+    finally:
+        # Pool threads and processes each hold their own connection
+        connections.close_all()
+
+
+def fail(job, error):
+    job.last_error = error
+    job.locked_at = None
+    job.locked_by = ''
+    if job.attempts >= job.max_attempts:
+        job.status = JobStatus.FAILED
+    else:
+        job.status = JobStatus.PENDING
+        job.run_at = timezone.now() + get_retry_delay(job.attempts)
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        # A pending duplicate was queued meanwhile and will redo the work
+        job.status = JobStatus.FAILED
+        job.save()
+
+
+def run(workers=4, batch_size=None, pool='thread'):
+    """
+    Run jobs until none is due. Returns (succeeded, failed).
+    """
+    batch_size = batch_size or workers * 4
+    executor_class = ProcessPoolExecutor if pool == 'process' else ThreadPoolExecutor
+    succeeded = failed = 0
+    # Connections must not be shared with forked processes
+    connections.close_all()
+    with executor_class(max_workers=workers) as executor:
+        while True:
+            now = timezone.now()
+            release_stale(now)
+            job_ids = claim(batch_size, now)
+            if not job_ids:
+                break
+            connections.close_all()
+            for future in [executor.submit(run_job, job_id) for job_id in job_ids]:
+                try:
+                    ok = future.result()
+                except Exception:
+                    # The outcome could not be written; the job is claimed again after the lock timeout
+                    logger.exception("Could not record the outcome of a job")
+                    ok = False
+                if ok:
+                    succeeded += 1
+                else:
+                    failed += 1
+    return succeeded, failed
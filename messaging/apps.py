@@ -7,5 +7,5 @@ class MessagesConfig(AppConfig):
     verbose_name = 'messaging'
     
     def ready(self):
-        # Import signals if you add any in the future
-        pass
+        # Real-time event publishing (see messaging.events)
+        import messaging.signals
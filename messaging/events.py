@@ -0,0 +1,97 @@
+"""
+In-process publish/subscribe for real-time messaging events.
+
+Events are kept per user in a short ring buffer with increasing ids, so a
+client that reconnects (SSE Last-Event-ID or the long-poll `after` parameter)
+picks up whatever it missed. Waiters are woken from whatever thread publishes:
+asyncio waiters through their loop, so the same broker serves the async
+stream view under ASGI and the long-poll fallback under WSGI.
+
+The broker only reaches clients connected to the same process. Set
+MESSAGING_EVENT_BROKER to the dotted path of another class with the same
+interface to back it with something shared.
+"""
+import asyncio
+import itertools
+import threading
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class InProcessBroker:
+    """Per-user event buffers living in this process"""
+
+    def __init__(self, buffer_size=100):
+        self.buffer_size = buffer_size
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._events = defaultdict(lambda: deque(maxlen=self.buffer_size))
+        self._waiters = defaultdict(set)
+
+    def publish(self, user_id, event_type, data):
+        """Append an event to a user's buffer and wake their waiters"""
+        with self._lock:
+            event = {'id': next(self._ids), 'type': event_type, 'data': data}
+            self._events[user_id].append(event)
+            waiters = self._waiters.pop(user_id, set())
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(self._wake, future)
+        return event
+
+    @staticmethod
+    def _wake(future):
+        if not future.done():
+            future.set_result(None)
+
+    def events_since(self, user_id, last_id=0):
+        """Buffered events for a user with an id greater than last_id"""
+        with self._lock:
+            return [event for event in self._events.get(user_id, ()) if event['id'] > last_id]
+
+    def last_id(self, user_id):
+        with self._lock:
+            events = self._events.get(user_id)
+            return events[-1]['id'] if events else 0
+
+    async def wait(self, user_id, last_id=0, timeout=25):
+        """Return events after last_id, waiting up to timeout seconds for one to arrive"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            pending = [event for event in self._events.get(user_id, ()) if event['id'] > last_id]
+            if not pending:
+                self._waiters[user_id].add((loop, future))
+        if pending:
+            return pending
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._waiters[user_id].discard((loop, future))
+            return []
+        return self.events_since(user_id, last_id)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        broker_class = import_string(
+            getattr(settings, 'MESSAGING_EVENT_BROKER', 'messaging.events.InProcessBroker')
+        )
+        _broker = broker_class()
+    return _broker
+
+
+def publish(user_ids, event_type, data):
+    """Publish an event to several users once the current transaction commits"""
+    def send():
+        broker = get_broker()
+        for user_id in user_ids:
+            broker.publish(user_id, event_type, data)
+    transaction.on_commit(send)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from messaging.models import rebuild_unread_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the unread message counter of every conversation participant'
+    
+    def handle(self, *args, **options):
+        participant_count = rebuild_unread_counts()
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully rebuilt unread counts for {participant_count} participants'
+            )
+        )
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:49
+
+from django.db import migrations, models
+
+
+def count_unread(apps, schema_editor):
+    ConversationParticipant = apps.get_model('messaging', 'ConversationParticipant')
+    Message = apps.get_model('messaging', 'Message')
+    for participant in ConversationParticipant.objects.all().iterator():
+        unread = Message.objects.filter(
+            conversation_id=participant.conversation_id
+        ).exclude(sender_id=participant.user_id)
+        if participant.last_read_at:
+            unread = unread.filter(timestamp__gt=participant.last_read_at)
+        participant.unread_count = unread.count()
+        participant.save(update_fields=['unread_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0, help_text='Messages from other participants since last_read_at (maintained by signals)'),
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
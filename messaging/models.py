@@ -1,7 +1,13 @@
+from datetime import datetime
+
 from django.db import models
 from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Q, F, Sum, Count, OuterRef, Subquery, Case, When
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 
 class ConversationManager(models.Manager):
@@ -76,14 +82,126 @@ class ConversationManager(models.Manager):
         return conversation
     
     def get_user_conversations(self, user):
-        """Get all conversations for a user, ordered by last message"""
+        """
+        Get all conversations for a user, ordered by last message.
+        Each conversation is annotated with the user's unread_count.
+        """
         return self.filter(
-            participants=user
+            conversationparticipant__user=user
+        ).select_related(
+            'last_message__sender'
         ).prefetch_related(
-            'participants', 'messages'
+            models.Prefetch(
+                'participants',
+                queryset=get_user_model().objects.select_related('profile')
+            )
         ).annotate(
-            last_message_time=models.Max('messages__timestamp')
-        ).order_by('-last_message_time')
+            unread_count=F('conversationparticipant__unread_count')
+        ).order_by(*INBOX_ORDERINGS['recent'])
+    
+    def get_inbox_page(self, user, sort_by='recent', cursor=None, per_page=20):
+        """
+        Return one page of a user's inbox using keyset pagination.
+        
+        Rows are ordered by (last_message_at, id) -- with unread conversations
+        first for sort_by='unread' -- and the page after `cursor` is read with
+        a range condition on those columns instead of an OFFSET. Returns the
+        conversations and the cursor of the next page (None on the last page).
+        """
+        if sort_by not in INBOX_ORDERINGS:
+            sort_by = 'recent'
+        conversations = self.get_user_conversations(user).annotate(
+            has_unread=Case(When(unread_count__gt=0, then=1), default=0)
+        ).order_by(*INBOX_ORDERINGS[sort_by])
+        
+        key_fields = INBOX_KEYS[sort_by]
+        values = decode_inbox_cursor(cursor, key_fields)
+        if values is not None:
+            conversations = conversations.filter(keyset_after(key_fields, values))
+        
+        page = list(conversations[:per_page + 1])
+        next_cursor = None
+        if len(page) > per_page:
+            page = page[:per_page]
+            next_cursor = encode_inbox_cursor(page[-1], key_fields)
+        return page, next_cursor
+    
+    def get_total_unread_count(self, user):
+        """Total unread messages across all of a user's conversations"""
+        return ConversationParticipant.objects.filter(user=user).aggregate(
+            total=Coalesce(Sum('unread_count'), 0)
+        )['total']
+
+
+# Inbox orderings and the (field, descending) keys they paginate on.
+# Conversations without messages have no last_message_at and sort last.
+INBOX_KEYS = {
+    'recent': [('last_message_at', True), ('id', True)],
+    'oldest': [('last_message_at', False), ('id', False)],
+    'unread': [('has_unread', True), ('last_message_at', True), ('id', True)],
+}
+INBOX_ORDERINGS = {
+    sort_by: [
+        F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_last=True)
+        for field, descending in keys
+    ]
+    for sort_by, keys in INBOX_KEYS.items()
+}
+
+
+def keyset_after(key_fields, values):
+    """
+    Build the condition selecting rows that sort after `values` in the
+    ordering described by key_fields, with NULLs sorting last.
+    """
+    condition = Q(pk__in=[])
+    equal = Q()
+    for (field, descending), value in zip(key_fields, values):
+        if value is None:
+            # Only other NULLs come after a NULL, and they tie with it
+            equal &= Q(**{f'{field}__isnull': True})
+            continue
+        lookup = 'lt' if descending else 'gt'
+        after = Q(**{f'{field}__{lookup}': value})
+        if field == 'last_message_at':
+            after |= Q(**{f'{field}__isnull': True})
+        condition |= equal & after
+        equal &= Q(**{field: value})
+    return condition
+
+
+def encode_inbox_cursor(conversation, key_fields):
+    parts = []
+    for field, descending in key_fields:
+        value = getattr(conversation, field)
+        if value is None:
+            parts.append('')
+        elif field == 'last_message_at':
+            parts.append(value.isoformat())
+        else:
+            parts.append(str(value))
+    return '|'.join(parts)
+
+
+def decode_inbox_cursor(cursor, key_fields):
+    """Parse a cursor made by encode_inbox_cursor; None if it is missing or malformed"""
+    if not cursor:
+        return None
+    parts = cursor.split('|')
+    if len(parts) != len(key_fields):
+        return None
+    values = []
+    try:
+        for (field, descending), part in zip(key_fields, parts):
+            if part == '':
+                values.append(None)
+            elif field == 'last_message_at':
+                values.append(datetime.fromisoformat(part))
+            else:
+                values.append(int(part))
+    except ValueError:
+        return None
+    return values
 
 
 class Conversation(models.Model):
@@ -116,6 +234,16 @@ class Conversation(models.Model):
         help_text='User who initiated this conversation'
     )
     
+    # Denormalized pointer to the newest message, maintained by signals
+    last_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    
     # Link to submission for submission conversations
     submission = models.ForeignKey(
         'submissions.Submission',
@@ -132,6 +260,7 @@ class Conversation(models.Model):
         indexes = [
             models.Index(fields=['conversation_type', '-updated_at']),
             models.Index(fields=['submission', '-updated_at']),
+            models.Index(fields=['-last_message_at', '-id']),
         ]
         constraints = [
             # Ensure only one conversation per submission
@@ -185,20 +314,16 @@ class Conversation(models.Model):
     
     def get_last_message(self):
         """Get the most recent message in this conversation"""
-        return self.messages.order_by('-timestamp').first()
+        if not self.last_message_id:
+            return None
+        return self.last_message
     
     def get_unread_count(self, user):
         """Get count of unread messages for a specific user"""
-        try:
-            participant = self.conversationparticipant_set.get(user=user)
-            if participant.last_read_at:
-                return self.messages.filter(
-                    timestamp__gt=participant.last_read_at
-                ).exclude(sender=user).count()
-            else:
-                return self.messages.exclude(sender=user).count()
-        except ConversationParticipant.DoesNotExist:
-            return 0
+        unread_count = self.conversationparticipant_set.filter(
+            user=user
+        ).values_list('unread_count', flat=True).first()
+        return unread_count or 0
     
     def is_user_participant(self, user):
         """Check if user is a participant in this conversation"""
@@ -211,6 +336,10 @@ class ConversationParticipant(models.Model):
     joined_at = models.DateTimeField(auto_now_add=True)
     last_read_at = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    unread_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Messages from other participants since last_read_at (maintained by signals)'
+    )
     
     class Meta:
         unique_together = ('conversation', 'user')
@@ -224,7 +353,8 @@ class ConversationParticipant(models.Model):
     def mark_as_read(self):
         """Mark conversation as read up to current time"""
         self.last_read_at = timezone.now()
-        self.save(update_fields=['last_read_at'])
+        self.unread_count = 0
+        self.save(update_fields=['last_read_at', 'unread_count'])
 
 
 class Message(models.Model):
@@ -277,4 +407,81 @@ class Message(models.Model):
         if self.is_read_by(other_participant):
             return 'read'
         else:
-            return 'delivered'  # Assume delivered if user exists
\ No newline at end of file
+            return 'delivered'  # Assume delivered if user exists
+
+
+@receiver(post_save, sender=Message)
+def increment_unread_counts(sender, instance, created, **kwargs):
+    """A new message is unread for every participant except its sender"""
+    if not created:
+        return
+    ConversationParticipant.objects.filter(
+        conversation_id=instance.conversation_id
+    ).exclude(
+        user_id=instance.sender_id
+    ).update(unread_count=F('unread_count') + 1)
+
+
+@receiver(post_save, sender=Message)
+def update_last_message(sender, instance, created, **kwargs):
+    """Point the conversation at its newest message"""
+    if not created:
+        return
+    Conversation.objects.filter(pk=instance.conversation_id).filter(
+        Q(last_message_at__isnull=True) | Q(last_message_at__lte=instance.timestamp)
+    ).update(last_message=instance, last_message_at=instance.timestamp)
+
+
+@receiver(post_delete, sender=Message)
+def restore_last_message(sender, instance, **kwargs):
+    """If the newest message was deleted, fall back to the one before it"""
+    rebuild_last_messages(
+        Conversation.objects.filter(pk=instance.conversation_id, last_message__isnull=True)
+    )
+
+
+def rebuild_last_messages(conversations=None):
+    """Recompute last_message/last_message_at from the messages table"""
+    if conversations is None:
+        conversations = Conversation.objects.all()
+    latest = Message.objects.filter(
+        conversation=OuterRef('pk')
+    ).order_by('-timestamp', '-id')
+    return conversations.update(
+        last_message=Subquery(latest.values('pk')[:1]),
+        last_message_at=Subquery(latest.values('timestamp')[:1])
+    )
+
+
+@receiver(post_delete, sender=Message)
+def decrement_unread_counts(sender, instance, **kwargs):
+    """Take a deleted message off the counters of participants who had not read it"""
+    ConversationParticipant.objects.filter(
+        conversation_id=instance.conversation_id,
+        unread_count__gt=0
+    ).exclude(
+        user_id=instance.sender_id
+    ).filter(
+        Q(last_read_at__isnull=True) | Q(last_read_at__lt=instance.timestamp)
+    ).update(unread_count=F('unread_count') - 1)
+
+
+def rebuild_unread_counts():
+    """Recompute every ConversationParticipant.unread_count from the messages"""
+    unread = Message.objects.filter(
+        conversation=OuterRef('conversation')
+    ).exclude(
+        sender=OuterRef('user')
+    )
+    never_read = ConversationParticipant.objects.filter(last_read_at__isnull=True).update(
+        unread_count=Coalesce(Subquery(
+            unread.values('conversation').annotate(count=Count('id')).values('count')
+        ), 0)
+    )
+    read = ConversationParticipant.objects.filter(last_read_at__isnull=False).update(
+        unread_count=Coalesce(Subquery(
+            unread.filter(timestamp__gt=OuterRef('last_read_at'))
+            .values('conversation').annotate(count=Count('id')).values('count')
+        ), 0)
+    )
+    return never_read + read
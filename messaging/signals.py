@@ -0,0 +1,70 @@
+from django.db.models import Sum
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .events import publish
+from .models import ConversationParticipant, Message
+from .tasks import notify_message_recipients
+
+
+def publish_unread_counts(user_ids):
+    """Send each user their current total of unread messages"""
+    totals = dict(
+        ConversationParticipant.objects.filter(
+            user_id__in=user_ids
+        ).values('user_id').annotate(
+            total=Sum('unread_count')
+        ).values_list('user_id', 'total')
+    )
+    for user_id in user_ids:
+        publish([user_id], 'unread', {'unread_count': totals.get(user_id) or 0})
+
+
+@receiver(post_save, sender=Message)
+def publish_new_message(sender, instance, created, **kwargs):
+    """Push a new message to every participant and refresh the recipients' unread counts"""
+    if not created:
+        return
+    participant_ids = list(
+        ConversationParticipant.objects.filter(
+            conversation_id=instance.conversation_id
+        ).values_list('user_id', flat=True)
+    )
+    publish(participant_ids, 'message', {
+        'conversation_id': instance.conversation_id,
+        'message_id': instance.pk,
+        'sender_id': instance.sender_id,
+        'sender': instance.sender.username,
+        'content': instance.content,
+        'timestamp': instance.timestamp.isoformat(),
+    })
+    publish_unread_counts([user_id for user_id in participant_ids if user_id != instance.sender_id])
+
+
+@receiver(post_save, sender=Message)
+def notify_new_message(sender, instance, created, raw=False, **kwargs):
+    """Fan the inbox/email notification out to the other participants in the background"""
+    if created and not raw:
+        notify_message_recipients.defer(instance.pk)
+
+
+@receiver(post_save, sender=ConversationParticipant)
+def publish_read_receipt(sender, instance, created, update_fields=None, **kwargs):
+    """Tell the other participants a conversation was read, and the reader their new count"""
+    if created or not instance.last_read_at:
+        return
+    if update_fields is not None and 'last_read_at' not in update_fields:
+        return
+    other_ids = list(
+        ConversationParticipant.objects.filter(
+            conversation_id=instance.conversation_id
+        ).exclude(
+            user_id=instance.user_id
+        ).values_list('user_id', flat=True)
+    )
+    publish(other_ids, 'read', {
+        'conversation_id': instance.conversation_id,
+        'user_id': instance.user_id,
+        'last_read_at': instance.last_read_at.isoformat(),
+    })
+    publish_unread_counts([instance.user_id])
@@ -0,0 +1,25 @@
+"""Side effects of new messages run by manage.py run_jobs (see jobs.queue)"""
+from django.urls import reverse
+
+from jobs.queue import background_task
+from notifications.outbox import emit_many
+
+from .models import ConversationParticipant, Message
+
+
+@background_task()
+def notify_message_recipients(message_id):
+    """Queue an inbox/email notification of a message for the other participants"""
+    message = Message.objects.select_related('sender').filter(pk=message_id).first()
+    if message is None:
+        return
+    emit_many(
+        ConversationParticipant.objects.filter(
+            conversation_id=message.conversation_id
+        ).values_list('user_id', flat=True),
+        'message',
+        f"New message from {message.sender.username}",
+        group=f'conversation:{message.conversation_id}',
+        url=reverse('messaging:conversation_detail', args=[message.sender.username]),
+        actor=message.sender_id,
+    )
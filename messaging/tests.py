@@ -1,3 +1,129 @@
-from django.test import TestCase
+import time
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from messaging.events import get_broker
+from messaging.models import (
+    Conversation, ConversationParticipant, Message, rebuild_last_messages, rebuild_unread_counts,
+)
+
+
+def direct_conversation(*users):
+    conversation = Conversation.objects.create(conversation_type='direct')
+    conversation.participants.add(*users)
+    return conversation
+
+
+@override_settings(MESSAGING_EVENT_TIMEOUT=3)
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='x')
+        self.client.force_login(self.user)
+
+    def get_stream(self, **headers):
+        started = time.monotonic()
+        response = self.client.get(reverse('messaging:event_stream'), headers=headers)
+        return response, time.monotonic() - started
+
+    def test_fresh_connection_returns_the_unread_count_at_once(self):
+        response, elapsed = self.get_stream()
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, 1)
+        body = response.content.decode()
+        self.assertIn('event: unread', body)
+        self.assertIn(f'id: {get_broker().last_id(self.user.pk)}', body)
+
+    def test_resumed_connection_returns_queued_events_at_once(self):
+        last_id = get_broker().last_id(self.user.pk)
+        get_broker().publish(self.user.pk, 'read', {'conversation_id': 1})
+        response, elapsed = self.get_stream(last_event_id=str(last_id))
+        self.assertLess(elapsed, 1)
+        self.assertIn('event: read', response.content.decode())
+
+    def test_resumed_connection_waits_when_nothing_is_queued(self):
+        response, elapsed = self.get_stream(last_event_id=str(get_broker().last_id(self.user.pk)))
+        self.assertGreaterEqual(elapsed, 2.5)
+        self.assertNotIn('event:', response.content.decode())
+
+
+class UnreadCountTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob, self.carol = [User.objects.create_user(name) for name in ('alice', 'bob', 'carol')]
+        self.with_bob = direct_conversation(self.alice, self.bob)
+        self.with_carol = direct_conversation(self.alice, self.carol)
+        for _ in range(3):
+            Message.objects.create(conversation=self.with_bob, sender=self.bob, content='x')
+        Message.objects.create(conversation=self.with_bob, sender=self.alice, content='x')
+        self.from_carol = Message.objects.create(conversation=self.with_carol, sender=self.carol, content='y')
+
+    def unread_counts(self):
+        return list(ConversationParticipant.objects.order_by('pk').values_list('unread_count', flat=True))
+
+    def test_counters_follow_messages_and_reads(self):
+        self.assertEqual(Conversation.objects.get_total_unread_count(self.alice), 4)
+        self.assertEqual(self.with_bob.get_unread_count(self.bob), 1)
+        self.from_carol.delete()
+        self.assertEqual(Conversation.objects.get_total_unread_count(self.alice), 3)
+        ConversationParticipant.objects.get(conversation=self.with_bob, user=self.alice).mark_as_read()
+        self.assertEqual(Conversation.objects.get_total_unread_count(self.alice), 0)
+
+    def test_rebuild_matches_live_counters(self):
+        live = self.unread_counts()
+        ConversationParticipant.objects.update(unread_count=0)
+        rebuild_unread_counts()
+        self.assertEqual(self.unread_counts(), live)
+
+    def test_inbox_reads_counters_without_extra_queries(self):
+        with self.assertNumQueries(1):
+            rows = {
+                conversation.pk: conversation.unread_count
+                for conversation in Conversation.objects.get_user_conversations(self.alice).prefetch_related(None)
+            }
+        self.assertEqual(rows, {self.with_bob.pk: 3, self.with_carol.pk: 1})
+        self.client.force_login(self.alice)
+        self.assertEqual(self.client.get(reverse('messaging:ajax_unread_count')).json()['unread_count'], 4)
+
+
+class InboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('me')
+        now = timezone.now()
+        for i in range(23):
+            other = User.objects.create_user(f'user{i}')
+            conversation = direct_conversation(self.user, other)
+            for j in range(i % 4):
+                message = Message.objects.create(
+                    conversation=conversation, sender=self.user if j % 2 else other, content='x'
+                )
+                if i % 5 == 0:
+                    Message.objects.filter(pk=message.pk).update(timestamp=now)
+        rebuild_last_messages()
+
+    def test_deleting_the_last_message_falls_back_to_the_previous_one(self):
+        conversation = Conversation.objects.filter(messages__isnull=False).distinct().first()
+        previous = conversation.messages.order_by('-timestamp', '-id')[1:2].first()
+        conversation.last_message.delete()
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message_id, previous.pk if previous else None)
+
+    def test_cursor_pages_cover_the_inbox_once(self):
+        for sort in ('recent', 'oldest', 'unread'):
+            full, _ = Conversation.objects.get_inbox_page(self.user, sort, None, 1000)
+            paged, cursor = [], None
+            while True:
+                page, cursor = Conversation.objects.get_inbox_page(self.user, sort, cursor, 4)
+                paged += page
+                if not cursor:
+                    break
+            self.assertEqual([c.pk for c in paged], [c.pk for c in full], sort)
+            self.assertEqual(len(paged), 23)
+
+    def test_inbox_view_pages_by_cursor(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('messaging:conversation_list'))
+        self.assertEqual(len(response.context['page_obj']), 20)
+        response = self.client.get(reverse('messaging:conversation_list'), {'cursor': response.context['next_cursor']})
+        self.assertEqual(len(response.context['page_obj']), 3)
@@ -13,6 +13,10 @@ urlpatterns = [
     path('ajax/mark-read/<int:conversation_id>/', views.ajax_mark_read, name='ajax_mark_read'),
     path('ajax/unread-count/', views.get_unread_count, name='ajax_unread_count'),
     
+    # Real-time events (SSE stream and long-poll fallback)
+    path('events/stream/', views.event_stream, name='event_stream'),
+    path('events/poll/', views.poll_events, name='poll_events'),
+    
     # Auth required page for anonymous users
     path('auth/<str:username>/', views.auth_required, name='auth_required'),
     
@@ -3,15 +3,21 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model, authenticate, login
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.http import Http404, JsonResponse
+from django.http import Http404, JsonResponse, HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.conf import settings
+from asgiref.sync import sync_to_async
 from django.db.models import Q, Count, Max
 from django.utils import timezone
 from django.urls import reverse
 
 from .models import Conversation, Message, ConversationParticipant
 from .forms import MessageForm, StartConversationForm
+from .events import get_broker
 from user.forms import SignInForm, SignupForm
 
+import json
+
 User = get_user_model()
 
 
@@ -19,44 +25,26 @@ User = get_user_model()
 def conversation_list(request):
     """List all conversations for the current user"""
     sort_by = request.GET.get('sort_by', 'recent')  # recent, oldest, unread
+    if sort_by not in ('recent', 'oldest', 'unread'):
+        sort_by = 'recent'
     
-    conversations = Conversation.objects.get_user_conversations(request.user)
-    
-    # Apply sorting
-    if sort_by == 'oldest':
-        conversations = conversations.order_by('updated_at')
-    elif sort_by == 'unread':
-        # Sort by unread count (conversations with unread messages first)
-        conversations_with_unread = []
-        conversations_without_unread = []
-        
-        for conv in conversations:
-            if conv.get_unread_count(request.user) > 0:
-                conversations_with_unread.append(conv)
-            else:
-                conversations_without_unread.append(conv)
-        
-        conversations = conversations_with_unread + conversations_without_unread
-    # 'recent' is default ordering from the manager
-    
-    # Pagination
-    paginator = Paginator(conversations, 20)  # 20 conversations per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination: `cursor` marks the last conversation of the previous page
+    cursor = request.GET.get('cursor')
+    conversations, next_cursor = Conversation.objects.get_inbox_page(
+        request.user, sort_by=sort_by, cursor=cursor, per_page=20
+    )
     
-    # Add unread counts and last message for each conversation
-    for conversation in page_obj:
-        conversation.unread_count = conversation.get_unread_count(request.user)
+    # Add last message and other participant (both already loaded)
+    for conversation in conversations:
         conversation.last_message = conversation.get_last_message()
         conversation.other_user = conversation.get_other_participant(request.user)
-        
-        # Debug: Print to console (remove this after testing)
-    
     
     context = {
-        'page_obj': page_obj,
+        'page_obj': conversations,
+        'next_cursor': next_cursor,
+        'is_first_page': not cursor,
         'sort_by': sort_by,
-        'total_conversations': paginator.count,
+        'total_conversations': ConversationParticipant.objects.filter(user=request.user).count(),
     }
     
     return render(request, 'messaging/conversation_list.html', context)
@@ -358,10 +346,105 @@ def ajax_mark_read(request, conversation_id):
 @login_required 
 def get_unread_count(request):
     """AJAX endpoint to get total unread message count for navbar"""
-    total_unread = 0
-    conversations = Conversation.objects.get_user_conversations(request.user)
+    total_unread = Conversation.objects.get_total_unread_count(request.user)
     
-    for conversation in conversations:
-        total_unread += conversation.get_unread_count(request.user)
+    return JsonResponse({'unread_count': total_unread})
+
+def _parse_event_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _format_sse(event):
+    """Serialize a broker event as a server-sent event"""
+    lines = []
+    if 'id' in event:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event['data'])}")
+    return '\n'.join(lines) + '\n\n'
+
+
+async def event_stream(request):
+    """
+    Server-sent event stream of new messages, read receipts and unread counts.
     
-    return JsonResponse({'unread_count': total_unread})
\ No newline at end of file
+    Under ASGI the stream stays open and events are pushed as they are
+    published. Under WSGI a response cannot stay open without tying up a
+    worker, so each response carries one batch of events and ends; the
+    browser's EventSource reconnects with Last-Event-ID and resumes. It
+    only waits for events when it has nothing to send yet.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    
+    broker = get_broker()
+    timeout = getattr(settings, 'MESSAGING_EVENT_TIMEOUT', 25)
+    last_id = _parse_event_id(request.headers.get('Last-Event-ID'))
+    keep_open = isinstance(request, ASGIRequest)
+    
+    async def stream():
+        nonlocal last_id
+        yield 'retry: 3000\n\n'
+        sent = False
+        if last_id is None:
+            # Fresh connection: start from now and send the current count
+            last_id = broker.last_id(user.pk)
+            unread_count = await sync_to_async(Conversation.objects.get_total_unread_count)(user)
+            # Carrying the id makes the reconnect resume from here and wait
+            yield _format_sse({'id': last_id, 'type': 'unread', 'data': {'unread_count': unread_count}})
+            sent = True
+        while True:
+            if keep_open or not sent:
+                events = await broker.wait(user.pk, last_id, timeout=timeout)
+            else:
+                events = broker.events_since(user.pk, last_id)
+            for event in events:
+                last_id = event['id']
+                yield _format_sse(event)
+            if not keep_open:
+                break
+            if not events:
+                yield ': keepalive\n\n'
+    
+    if keep_open:
+        response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    else:
+        response = HttpResponse(
+            ''.join([chunk async for chunk in stream()]),
+            content_type='text/event-stream'
+        )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def poll_events(request):
+    """
+    Long-poll fallback for clients without EventSource.
+    
+    Without `after` it returns immediately with the current unread count and
+    the id to poll from; with `after` it waits until an event newer than that
+    id is published or the timeout passes.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    broker = get_broker()
+    after = _parse_event_id(request.GET.get('after'))
+    if after is None:
+        unread_count = await sync_to_async(Conversation.objects.get_total_unread_count)(user)
+        return JsonResponse({
+            'events': [{'type': 'unread', 'data': {'unread_count': unread_count}}],
+            'last_id': broker.last_id(user.pk),
+        })
+    
+    events = await broker.wait(user.pk, after, timeout=getattr(settings, 'MESSAGING_EVENT_TIMEOUT', 25))
+    return JsonResponse({
+        'events': events,
+        'last_id': events[-1]['id'] if events else after,
+    })
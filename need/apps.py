@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class NeedConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'need'
+
+    def ready(self):
+        import need.signals
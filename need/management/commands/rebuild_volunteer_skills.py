@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from need import matching
+
+
+class Command(BaseCommand):
+    help = 'Recompute the user x skill weights used to match volunteers to needs'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = matching.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {count} volunteer skill weights'))
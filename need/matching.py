@@ -0,0 +1,277 @@
+"""
+Volunteer matching for needs.
+
+A user's demonstrated skills come from finished work:
+
+* accepted submissions: their relevant_skills
+* completed tasks: the task skills, credited to the accepted applicants
+* fulfilled needs: the required skills, credited to completed_by
+* problem assignments: the problem skills (full weight once solved)
+
+The weights form a sparse user x skill matrix. It is stored as
+VolunteerSkill rows and held in memory column by column (per skill, an
+array of user ids and an array of weights), so scoring a need only walks
+the columns of its required skills. Signals recompute the rows of the
+affected users after commit; `manage.py rebuild_volunteer_skills` recomputes
+everything.
+"""
+import heapq
+import math
+import threading
+import time
+from array import array
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Sum, Case, When, Value, FloatField
+
+
+SUBMISSION_WEIGHT = 1.0
+TASK_WEIGHT = 1.0
+NEED_WEIGHT = 1.0
+SOLVED_PROBLEM_WEIGHT = 1.0
+ASSIGNED_PROBLEM_WEIGHT = 0.5
+
+
+def collect_weights(user_ids=None):
+    """
+    {(user_id, skill_id): weight} from the evidence tables, optionally only
+    for some users. Four grouped queries.
+    """
+    Submission = apps.get_model('submissions', 'Submission')
+    Task = apps.get_model('task', 'Task')
+    Need = apps.get_model('need', 'Need')
+    Problem = apps.get_model('problems', 'Problem')
+
+    solved = Case(
+        When(problem__status='solved', then=Value(SOLVED_PROBLEM_WEIGHT / ASSIGNED_PROBLEM_WEIGHT)),
+        default=Value(1.0),
+        output_field=FloatField(),
+    )
+    # (rows, filters, user path, aggregate, factor). The user filter joins
+    # multi-valued relations, so it must go in the same filter() call as
+    # the rest to reuse their joins.
+    sources = [
+        (
+            Submission.relevant_skills.through.objects,
+            {'submission__status': 'ACCEPTED'},
+            'submission__applicant_id',
+            Count('pk'),
+            SUBMISSION_WEIGHT,
+        ),
+        (
+            Task.skills.through.objects,
+            {'task__status': 'completed', 'task__submission__status': 'ACCEPTED'},
+            'task__submission__applicant_id',
+            Count('task_id', distinct=True),
+            TASK_WEIGHT,
+        ),
+        (
+            Need.required_skills.through.objects,
+            {'need__status': 'fulfilled', 'need__completed_by__isnull': False},
+            'need__completed_by_id',
+            Count('pk'),
+            NEED_WEIGHT,
+        ),
+        (
+            Problem.skills.through.objects,
+            {'problem__assigned_to__isnull': False},
+            'problem__assigned_to',
+            Sum(solved),
+            ASSIGNED_PROBLEM_WEIGHT,
+        ),
+    ]
+
+    weights = defaultdict(float)
+    for rows, filters, user_path, aggregate, factor in sources:
+        if user_ids is not None:
+            filters = {**filters, f'{user_path}__in': user_ids}
+        for user_id, skill_id, value in (
+            rows.filter(**filters)
+            .values(user_path, 'skill_id')
+            .annotate(weight=aggregate)
+            .values_list(user_path, 'skill_id', 'weight')
+            .order_by()
+        ):
+            weights[(user_id, skill_id)] += float(value) * factor
+    return weights
+
+
+class SkillMatrix:
+    """
+    Sparse user x skill weights, compressed by column: for each skill an
+    array of user ids and a parallel array of weights.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._columns = {}
+        self._rows = defaultdict(dict)
+
+    def load(self, cells):
+        """Fill from (user_id, skill_id, weight) triples"""
+        columns = defaultdict(lambda: (array('q'), array('d')))
+        rows = defaultdict(dict)
+        for user_id, skill_id, weight in cells:
+            users, weights = columns[skill_id]
+            users.append(user_id)
+            weights.append(weight)
+            rows[user_id][skill_id] = weight
+        with self._lock:
+            self._columns = dict(columns)
+            self._rows = rows
+
+    def replace_users(self, cells_by_user):
+        """Swap in new rows ({user_id: {skill_id: weight}}) for some users"""
+        with self._lock:
+            touched = set()
+            for user_id, cells in cells_by_user.items():
+                touched.update(self._rows.pop(user_id, {}))
+                touched.update(cells)
+                if cells:
+                    self._rows[user_id] = dict(cells)
+            users_changed = set(cells_by_user)
+            for skill_id in touched:
+                users, weights = self._columns.get(skill_id, (array('q'), array('d')))
+                new_users, new_weights = array('q'), array('d')
+                for user_id, weight in zip(users, weights):
+                    if user_id not in users_changed:
+                        new_users.append(user_id)
+                        new_weights.append(weight)
+                for user_id in users_changed:
+                    weight = self._rows.get(user_id, {}).get(skill_id)
+                    if weight:
+                        new_users.append(user_id)
+                        new_weights.append(weight)
+                if new_users:
+                    self._columns[skill_id] = (new_users, new_weights)
+                else:
+                    self._columns.pop(skill_id, None)
+
+    def scores(self, skill_ids):
+        """
+        {user_id: (matched_skill_count, score)} for the users with any of
+        the skills, score being the sum of log(1 + weight).
+        """
+        scores = defaultdict(float)
+        matched = defaultdict(int)
+        with self._lock:
+            for skill_id in set(skill_ids):
+                users, weights = self._columns.get(skill_id, ((), ()))
+                for user_id, weight in zip(users, weights):
+                    scores[user_id] += math.log1p(weight)
+                    matched[user_id] += 1
+        return {user_id: (matched[user_id], score) for user_id, score in scores.items()}
+
+    def top(self, skill_ids, k=10, exclude=()):
+        """
+        Best k (user_id, matched_skill_count, score) for a set of skills.
+
+        Users are ranked by how many of the skills they have shown, then by
+        the sum of log(1 + weight), so breadth beats depth in one skill.
+        """
+        scores = self.scores(skill_ids)
+        for user_id in exclude:
+            scores.pop(user_id, None)
+        best = heapq.nlargest(
+            k, scores, key=lambda user_id: (*scores[user_id], -user_id)
+        )
+        return [(user_id, *scores[user_id]) for user_id in best]
+
+
+_matrix = None
+_loaded_at = 0
+_load_lock = threading.Lock()
+
+
+def _ttl():
+    return getattr(settings, 'VOLUNTEER_MATRIX_TTL', 600)
+
+
+def get_matrix():
+    """The process-wide matrix, loaded from VolunteerSkill on first use"""
+    global _matrix, _loaded_at
+    if _matrix is None or time.monotonic() - _loaded_at > _ttl():
+        with _load_lock:
+            if _matrix is None or time.monotonic() - _loaded_at > _ttl():
+                from need.models import VolunteerSkill
+                matrix = SkillMatrix()
+                matrix.load(VolunteerSkill.objects.values_list('user_id', 'skill_id', 'weight'))
+                _matrix = matrix
+                _loaded_at = time.monotonic()
+    return _matrix
+
+
+def reset_matrix():
+    global _matrix
+    _matrix = None
+
+
+def refresh_users(user_ids):
+    """Recompute the stored and in-memory rows of some users"""
+    from need.models import VolunteerSkill
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if not user_ids:
+        return
+    weights = collect_weights(user_ids)
+    cells_by_user = {user_id: {} for user_id in user_ids}
+    for (user_id, skill_id), weight in weights.items():
+        cells_by_user[user_id][skill_id] = weight
+
+    with transaction.atomic():
+        VolunteerSkill.objects.filter(user_id__in=user_ids).delete()
+        VolunteerSkill.objects.bulk_create([
+            VolunteerSkill(user_id=user_id, skill_id=skill_id, weight=weight)
+            for (user_id, skill_id), weight in weights.items()
+        ])
+    if _matrix is not None:
+        _matrix.replace_users(cells_by_user)
+
+
+def rebuild():
+    """Recompute every VolunteerSkill row; returns the number of cells"""
+    from need.models import VolunteerSkill
+    weights = collect_weights()
+    VolunteerSkill.objects.all().delete()
+    VolunteerSkill.objects.bulk_create([
+        VolunteerSkill(user_id=user_id, skill_id=skill_id, weight=weight)
+        for (user_id, skill_id), weight in weights.items()
+    ], batch_size=500)
+    reset_matrix()
+    return len(weights)
+
+
+def schedule_refresh(user_ids):
+    """Refresh some users once the current transaction commits"""
+    user_ids = set(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: refresh_users(user_ids))
+
+
+def top_volunteers(need, k=10):
+    """
+    Users best matching a need's required skills, best first, each with
+    `matched_skills` and `match_score` set. The need's creator and users
+    already assigned to it are left out.
+    """
+    skill_ids = list(need.required_skills.values_list('pk', flat=True))
+    if not skill_ids:
+        return []
+    exclude = set(need.assignments.filter(status='active').values_list('user_id', flat=True))
+    if need.created_by_id:
+        exclude.add(need.created_by_id)
+    ranked = get_matrix().top(skill_ids, k * 2, exclude)
+
+    users = get_user_model().objects.filter(is_active=True).in_bulk([user_id for user_id, _, _ in ranked])
+    matches = []
+    for user_id, matched_skills, score in ranked:
+        user = users.get(user_id)
+        if user is None:
+            continue
+        user.matched_skills = matched_skills
+        user.match_score = round(score, 3)
+        matches.append(user)
+    return matches[:k]
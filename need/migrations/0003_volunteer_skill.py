@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, FloatField, Sum, Value, When
+
+
+def backfill_volunteer_skills(apps, schema_editor):
+    """The user x skill weights as need.matching computed them when this migration was written"""
+    Submission = apps.get_model('submissions', 'Submission')
+    Task = apps.get_model('task', 'Task')
+    Need = apps.get_model('need', 'Need')
+    Problem = apps.get_model('problems', 'Problem')
+    VolunteerSkill = apps.get_model('need', 'VolunteerSkill')
+
+    solved = Case(
+        When(problem__status='solved', then=Value(2.0)),
+        default=Value(1.0),
+        output_field=FloatField(),
+    )
+    sources = [
+        (
+            Submission.relevant_skills.through.objects.filter(submission__status='ACCEPTED'),
+            'submission__applicant_id', Count('pk'), 1.0,
+        ),
+        (
+            Task.skills.through.objects.filter(task__status='completed', task__submission__status='ACCEPTED'),
+            'task__submission__applicant_id', Count('task_id', distinct=True), 1.0,
+        ),
+        (
+            Need.required_skills.through.objects.filter(need__status='fulfilled', need__completed_by__isnull=False),
+            'need__completed_by_id', Count('pk'), 1.0,
+        ),
+        (
+            Problem.skills.through.objects.filter(problem__assigned_to__isnull=False),
+            'problem__assigned_to', Sum(solved), 0.5,
+        ),
+    ]
+    weights = {}
+    for rows, user_path, aggregate, factor in sources:
+        for user_id, skill_id, value in (
+            rows.values(user_path, 'skill_id').annotate(weight=aggregate)
+            .values_list(user_path, 'skill_id', 'weight').order_by()
+        ):
+            weights[(user_id, skill_id)] = weights.get((user_id, skill_id), 0.0) + float(value) * factor
+
+    VolunteerSkill.objects.bulk_create([
+        VolunteerSkill(user_id=user_id, skill_id=skill_id, weight=weight)
+        for (user_id, skill_id), weight in weights.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('need', '0002_need_main_project'),
+        ('problems', '0001_initial'),
+        ('skills', '0002_skillstats'),
+        ('submissions', '0001_initial'),
+        ('task', '0003_alter_task_options_task_actual_hours_task_due_date_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VolunteerSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('skill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='volunteer_weights', to='skills.skill')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='volunteer_skills', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['skill', '-weight'], name='need_volunt_skill_i_d930bd_idx')],
+                'unique_together': {('user', 'skill')},
+            },
+        ),
+        migrations.RunPython(backfill_volunteer_skills, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from utils.permissions import user_has_project_permission
+from project.models import Project, Membership
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
@@ -21,6 +22,27 @@ VISIBILITY_CHOICES = [
 ]
 
 
+class NeedQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Needs the user can view; same rules as Need.user_can_view"""
+        if not user or not user.is_authenticated:
+            return self.filter(visibility='public')
+        if user.is_staff or user.is_superuser:
+            moderated = models.Q(visibility='admins', to_project__isnull=False)
+        else:
+            moderated = models.Q(
+                visibility='admins',
+                to_project__in=Membership.objects.filter(
+                    user=user, is_moderator=True
+                ).values('project_id'),
+            )
+        return self.filter(
+            models.Q(visibility='public') |
+            models.Q(visibility='members', to_project__in=Project.objects.visible_to(user).values('pk')) |
+            moderated
+        )
+
+
 class Need(models.Model):
     name = models.CharField(max_length=50)
     desc = models.TextField("description")
@@ -79,9 +101,19 @@ class Need(models.Model):
     
     required_skills = models.ManyToManyField('skills.Skill', blank=True,
                                        help_text="Skills required to fulfill this need")
+
+    objects = NeedQuerySet.as_manager()
     skill_level = models.CharField(max_length=20, blank=True, null=True,
                              choices=[('beginner', 'Beginner'), ('intermediate', 'Intermediate'),
                                       ('advanced', 'Advanced'), ('expert', 'Expert')])
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored project so moving the need refreshes both projects' stats
+        instance._loaded_to_project_id = instance.__dict__.get('to_project_id')
+        return instance
+
     def get_parent(self):
         """Return the parent object (project or task)"""
         return self.to_project or self.to_task
@@ -127,19 +159,11 @@ class Need(models.Model):
     def check_dependencies_met(self):
         """Check if all dependent needs are fulfilled"""
         return not self.depends_on.filter(status__in=['pending', 'in_progress']).exists()
-    def match_volunteers_by_skills(self):
-        """Find users with matching skills for this need"""
-        if not self.required_skills.exists():
-            return User.objects.none()
-
-        # For now, return active users since User-Skills relationship doesn't exist yet
-        # TODO: Implement User-Skills relationship and update this method
-        return User.objects.filter(is_active=True).order_by('username')
-        
-        # Future implementation when User has skills relationship:
-        # return User.objects.filter(
-        #     user_skills__skill__in=self.required_skills.all()
-        # ).distinct().order_by('-created_date')
+    def match_volunteers_by_skills(self, limit=10):
+        """Active users whose finished work best covers the required skills"""
+        from need.matching import top_volunteers
+        return top_volunteers(self, limit)
+
     def user_can_view(self, user):
         """Check if user can view this need"""
         if self.visibility == 'public':
@@ -149,7 +173,7 @@ class Need(models.Model):
         if self.visibility == 'members':
             return self.to_project and self.to_project.user_can_view(user)
         if self.visibility == 'admins':
-            return self.to_project and self.to_project.user_can_moderate(user)
+            return self.to_project and self.to_project.user_can_moderate_comments(user)
         return False
 
     def user_can_assign(self, user):
@@ -200,4 +224,22 @@ class NeedAssignment(models.Model):
 
     assigned_at = models.DateTimeField(auto_now_add=True)
     role = models.CharField(max_length=50, blank=True, null=True)
-    status = models.CharField(max_length=20, default='active')
\ No newline at end of file
+    status = models.CharField(max_length=20, default='active')
+
+class VolunteerSkill(models.Model):
+    """
+    One non-zero cell of the user x skill matrix used to match volunteers to
+    needs; weight sums the user's demonstrated work with the skill. Rows are
+    derived data, maintained by need.matching.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='volunteer_skills')
+    skill = models.ForeignKey('skills.Skill', on_delete=models.CASCADE, related_name='volunteer_weights')
+    weight = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'skill')
+        indexes = [models.Index(fields=['skill', '-weight'])]
+
+    def __str__(self):
+        return f"{self.user_id} x {self.skill_id}: {self.weight}"
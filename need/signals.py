@@ -0,0 +1,112 @@
+"""
+Refresh need.matching rows of the users whose demonstrated skills a change
+affects. Recomputing is per user and runs after commit.
+"""
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from need.matching import schedule_refresh
+from need.models import Need
+from problems.models import Problem
+from submissions.models import Submission
+from task.models import Task
+
+
+def _task_applicants(task_ids):
+    return Submission.objects.filter(
+        to_task_id__in=task_ids, status='ACCEPTED'
+    ).values_list('applicant_id', flat=True)
+
+
+def _problem_assignees(problem_ids):
+    return Problem.assigned_to.through.objects.filter(
+        problem_id__in=problem_ids
+    ).values_list('user_id', flat=True)
+
+
+@receiver([post_save, post_delete], sender=Submission)
+def refresh_applicant(sender, instance, **kwargs):
+    schedule_refresh([instance.applicant_id])
+
+
+@receiver(m2m_changed, sender=Submission.relevant_skills.through)
+def refresh_submission_skills(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        schedule_refresh([instance.applicant_id])
+    elif pk_set:
+        schedule_refresh(
+            Submission.objects.filter(pk__in=pk_set).values_list('applicant_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Task)
+def refresh_task_applicants(sender, instance, created, **kwargs):
+    if not created:
+        schedule_refresh(_task_applicants([instance.pk]))
+
+
+@receiver(m2m_changed, sender=Task.skills.through)
+def refresh_task_skills(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        schedule_refresh(_task_applicants([instance.pk]))
+    elif pk_set:
+        schedule_refresh(_task_applicants(pk_set))
+
+
+@receiver(pre_save, sender=Need)
+def remember_need_completer(sender, instance, **kwargs):
+    instance._previous_completed_by_id = (
+        Need.objects.filter(pk=instance.pk).values_list('completed_by_id', flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver([post_save, post_delete], sender=Need)
+def refresh_need_completer(sender, instance, **kwargs):
+    schedule_refresh([
+        instance.completed_by_id, getattr(instance, '_previous_completed_by_id', None)
+    ])
+
+
+@receiver(m2m_changed, sender=Need.required_skills.through)
+def refresh_need_skills(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        schedule_refresh([instance.completed_by_id])
+    elif pk_set:
+        schedule_refresh(
+            Need.objects.filter(pk__in=pk_set).values_list('completed_by_id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Problem)
+def refresh_problem_assignees(sender, instance, created, **kwargs):
+    if not created:
+        schedule_refresh(_problem_assignees([instance.pk]))
+
+
+@receiver(m2m_changed, sender=Problem.assigned_to.through)
+def refresh_assignment(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('pre_clear',):
+        instance._cleared_assignees = (
+            {instance.pk} if reverse else set(_problem_assignees([instance.pk]))
+        )
+    elif action in ('post_add', 'post_remove'):
+        schedule_refresh({instance.pk} if reverse else pk_set)
+    elif action == 'post_clear':
+        schedule_refresh(getattr(instance, '_cleared_assignees', ()))
+
+
+@receiver(m2m_changed, sender=Problem.skills.through)
+def refresh_problem_skills(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        schedule_refresh(_problem_assignees([instance.pk]))
+    elif pk_set:
+        schedule_refresh(_problem_assignees(pk_set))
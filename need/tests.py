@@ -1,3 +1,88 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from need import matching
+from need.models import Need, NeedAssignment, VolunteerSkill
+from problems.models import Problem
+from project.models import Project
+from search.autocomplete import skill_index
+from skills.models import Skill
+from task.models import Task
+
+
+class SkillsAutocompleteTests(TestCase):
+    def setUp(self):
+        skill_index.reset()
+        self.user = User.objects.create_user('alice')
+        self.skills = Skill.objects.bulk_create([Skill(name=f'Skill {i:02}') for i in range(30)])
+        task = Task.objects.create(name='t', desc='d', created_by=self.user)
+        task.skills.add(self.skills[-1])
+
+    def tearDown(self):
+        skill_index.reset()
+
+    def autocomplete(self, query):
+        response = self.client.get(reverse('need:skills_autocomplete_api'), {'q': query})
+        self.assertTrue(response.json()['success'])
+        return [skill['name'] for skill in response.json()['skills']]
+
+    def test_empty_query_returns_every_skill(self):
+        self.assertEqual(self.autocomplete(''), [f'Skill {i:02}' for i in range(30)])
+
+    def test_query_matches_skill_names(self):
+        self.assertEqual(self.autocomplete('skill 0'), [f'Skill 0{i}' for i in range(10)])
+
+
+class VolunteerMatchingTests(TestCase):
+    def setUp(self):
+        matching.reset_matrix()
+        self.owner, self.ann, self.bob, self.cid = [
+            User.objects.create_user(name) for name in ('owner', 'ann', 'bob', 'cid')
+        ]
+        self.python, self.django = Skill.objects.create(name='Python'), Skill.objects.create(name='Django')
+        project = Project.objects.create(name='p', created_by=self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(2):
+                need = Need.objects.create(name='n', desc='d', status='fulfilled', completed_by=self.ann)
+                need.required_skills.add(self.python)
+            solved = Problem.objects.create(name='x', desc='d', status='solved', to_project=project)
+            solved.skills.add(self.python)
+            solved.assigned_to.add(self.bob)
+            self.open_problem = Problem.objects.create(name='y', desc='d', to_project=project)
+            self.open_problem.skills.add(self.python, self.django)
+            self.open_problem.assigned_to.add(self.cid)
+        self.need = Need.objects.create(name='wanted', desc='d', created_by=self.owner)
+        self.need.required_skills.add(self.python, self.django)
+
+    def tearDown(self):
+        matching.reset_matrix()
+
+    def stored(self):
+        return {
+            (user_id, skill_id): weight
+            for user_id, skill_id, weight in VolunteerSkill.objects.values_list('user_id', 'skill_id', 'weight')
+        }
+
+    def test_breadth_ranks_before_depth(self):
+        self.assertEqual(self.stored(), dict(matching.collect_weights()))
+        volunteers = matching.top_volunteers(self.need)
+        self.assertEqual(volunteers, [self.cid, self.ann, self.bob])
+        self.assertEqual(volunteers[0].matched_skills, 2)
+        NeedAssignment.objects.create(need=self.need, user=self.cid)
+        self.assertEqual(matching.top_volunteers(self.need, k=1), [self.ann])
+
+    def test_rows_follow_changes_after_commit(self):
+        matching.get_matrix()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.open_problem.assigned_to.remove(self.cid)
+        self.assertEqual(matching.top_volunteers(self.need), [self.ann, self.bob])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.open_problem.status = 'solved'
+            self.open_problem.save()
+            self.open_problem.assigned_to.add(self.bob)
+        live = self.stored()
+        self.assertEqual(live[(self.bob.pk, self.python.pk)], 2.0)
+        self.assertEqual(matching.top_volunteers(self.need)[0], self.bob)
+        matching.rebuild()
+        self.assertEqual(self.stored(), live)
@@ -23,6 +23,9 @@ from utils.permissions import (
 )
 from skills.models import Skill
 from user.models import User
+from search.index import search, highlight
+from search.autocomplete import search_skills, all_skills
+from feed.recommend import recommended
 
 from .forms import NeedForm, NeedEditForm
 
@@ -33,13 +36,14 @@ def skills_autocomplete_api(request):
         query = request.GET.get('q', '').strip()
         
         if query:
-            # Filter skills by name containing the query (case insensitive)
-            skills = Skill.objects.filter(name__icontains=query).order_by('name')[:20]
+            # Skills whose name starts with or contains the query
+            skills = search_skills(query, 20)
         else:
-            # Return all skills if no query
-            skills = Skill.objects.all().order_by('name')[:100]
+            # Return all skills if no query; the need and problem forms
+            # fetch this once as their complete local suggestion list
+            skills = all_skills()
         
-        skills_data = [{'name': skill.name, 'id': skill.id} for skill in skills]
+        skills_data = [{'name': skill['name'], 'id': skill['id']} for skill in skills]
         
         return JsonResponse({
             'success': True,
@@ -111,6 +115,7 @@ def need_list(request):
         'total_needs': needs.count(),
         'projects': projects,
         'all_skills': Skill.objects.all().order_by('name'),
+        'recommended': recommended(request.user, 'need'),
     }
     
     return render(request, 'need/need_list.html', context)
@@ -300,19 +305,14 @@ def need(request, need_id):
     ).select_related(
         'user', 
         'user__profile'
-    ).prefetch_related(
-        Prefetch(
-            'replies', 
-            queryset=Comment.objects.select_related('user', 'user__profile')
-        ),
-        'votes'
+    ).with_user_vote(request.user).with_changelog().with_reply_tree(
+        Comment.objects.select_related('user', 'user__profile').with_user_vote(request.user).with_changelog()
     )
     
     # Get potential volunteers based on skills
     potential_volunteers = None
-    # Commenting out until User-Skills relationship is established
-    # if request.user.is_authenticated and need.required_skills.exists():
-    #     potential_volunteers = need.match_volunteers_by_skills()[:5]
+    if request.user.is_authenticated:
+        potential_volunteers = need.match_volunteers_by_skills(5)
     
     context = {
         'need': need,
@@ -523,9 +523,10 @@ def assign_need(request, need_id):
         return redirect('need:need', need_id=need.id)
     
     # Get potential assignees (users with matching skills)
-    # Commenting out until User-Skills relationship is established
-    # potential_assignees = need.match_volunteers_by_skills()
-    potential_assignees = User.objects.filter(is_active=True).order_by('username')[:10]
+    potential_assignees = (
+        need.match_volunteers_by_skills(10) or
+        User.objects.filter(is_active=True).order_by('username')[:10]
+    )
     
     context = {
         'need': need,
@@ -646,23 +647,6 @@ def update_need_status(request, need_id, status):
 
 # API ENDPOINTS FOR AJAX FUNCTIONALITY
 
-def skills_autocomplete_api(request):
-    """API endpoint for skills autocomplete"""
-    try:
-        skills = Skill.objects.all().order_by('name')
-        skills_data = [{'id': skill.id, 'name': skill.name} for skill in skills]
-        
-        return JsonResponse({
-            'success': True,
-            'skills': skills_data
-        })
-    except Exception as e:
-        return JsonResponse({
-            'success': False,
-            'error': str(e)
-        }, status=500)
-
-
 def need_search_api(request):
     """API endpoint for searching and filtering needs"""
     try:
@@ -699,11 +683,7 @@ def need_search_api(request):
         
         # Apply search
         if search_query:
-            needs = needs.filter(
-                Q(name__icontains=search_query) |
-                Q(desc__icontains=search_query) |
-                Q(required_skills__name__icontains=search_query)
-            ).distinct()
+            needs = search(needs, search_query)
         
         # Apply status filters
         if statuses:
@@ -783,7 +763,9 @@ def need_search_api(request):
             'name', '-name', 'created_date', '-created_date',
             'priority', '-priority', 'deadline', '-deadline', 'status'
         ]
-        if sort_by in valid_sorts:
+        if sort_by == 'relevance' and search_query:
+            needs = needs.order_by('search_rank', '-created_date')
+        elif sort_by in valid_sorts:
             needs = needs.order_by(sort_by)
         
         # Pagination
@@ -842,6 +824,7 @@ def need_search_api(request):
                 'is_stationary': need.is_stationary,
                 'can_edit': need.user_can_edit(request.user),
                 'url': reverse('need:need', args=[need.id]),
+                'snippet': highlight(getattr(need, 'search_snippet', '')),
             })
         
         return JsonResponse({
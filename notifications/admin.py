@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from .models import Notification, OutboxEvent
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'recipient', 'kind', 'text', 'count', 'updated_at', 'read_at', 'emailed_at')
+    list_filter = ('kind', 'updated_at')
+    search_fields = ('recipient__username', 'text')
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'recipient', 'kind', 'group', 'text', 'created_at')
+    list_filter = ('kind',)
+    search_fields = ('recipient__username', 'text')
@@ -0,0 +1,157 @@
+"""
+Delivery of queued notifications (manage.py send_notifications).
+
+A user's events wait until the oldest of them is NOTIFICATION_DIGEST_DELAY
+seconds old, so a burst of replies or messages becomes one delivery. The
+events of a batch of such users are then, in one transaction:
+
+* combined per kind and group into Notification rows, folding into the
+  user's unread entry for the same group when there is one,
+* deleted from the outbox.
+
+After the commit every user with an email address gets one digest of the
+entries that changed, all sent over a single connection to
+NOTIFICATION_EMAIL_BACKEND. A failed email is logged and not retried; the
+inbox entries are already there.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from notifications.models import Notification, OutboxEvent
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_delay():
+    return timedelta(seconds=getattr(settings, 'NOTIFICATION_DIGEST_DELAY', 60))
+
+
+def ready_recipients(cutoff, limit):
+    """Users whose oldest pending event was queued before cutoff, longest waiting first"""
+    return list(
+        OutboxEvent.objects.values('recipient_id').annotate(
+            oldest=Min('created_at')
+        ).filter(oldest__lte=cutoff).order_by('oldest').values_list('recipient_id', flat=True)[:limit]
+    )
+
+
+def deliver(recipient_ids, now=None):
+    """
+    Turn the pending events of some users into inbox entries and remove
+    them from the outbox. Returns {recipient_id: [Notification, ...]}
+    with the entries created or updated.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True).filter(
+                recipient_id__in=recipient_ids
+            ).order_by('created_at', 'pk')
+        )
+        if not events:
+            return {}
+        grouped = {}
+        for event in events:
+            grouped.setdefault((event.recipient_id, event.kind, event.group), []).append(event)
+
+        unread = {
+            (notification.recipient_id, notification.kind, notification.group): notification
+            for notification in Notification.objects.filter(
+                recipient_id__in={recipient_id for recipient_id, _, _ in grouped},
+                group__in={group for _, _, group in grouped},
+                read_at__isnull=True,
+            ).order_by('updated_at')
+        }
+        created, updated = [], []
+        for key, group_events in grouped.items():
+            latest = group_events[-1]
+            notification = unread.get(key)
+            if notification is None:
+                notification = Notification(
+                    recipient_id=latest.recipient_id, kind=latest.kind, group=latest.group, count=0,
+                )
+                created.append(notification)
+            else:
+                updated.append(notification)
+            notification.count += len(group_events)
+            notification.text = latest.text
+            notification.url = latest.url
+            notification.actor_id = latest.actor_id
+            notification.updated_at = now
+            notification.emailed_at = None
+
+        Notification.objects.bulk_create(created, batch_size=500)
+        Notification.objects.bulk_update(
+            updated, ['count', 'text', 'url', 'actor', 'updated_at', 'emailed_at'], batch_size=500
+        )
+        OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+
+    delivered = {}
+    for notification in created + updated:
+        delivered.setdefault(notification.recipient_id, []).append(notification)
+    return delivered
+
+
+def digest_message(user, notifications):
+    site = getattr(settings, 'NOTIFICATION_SITE_URL', '')
+    lines = [f"Hi {user.username},", "", "Here is what happened since your last update:", ""]
+    for notification in notifications:
+        lines.append(f"- {notification.summary}")
+        if notification.url:
+            lines.append(f"  {site}{notification.url}")
+    return EmailMessage(
+        subject=f"{len(notifications)} new notification{'s' if len(notifications) != 1 else ''}",
+        body='\n'.join(lines),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user.email],
+    )
+
+
+def send_digests(delivered):
+    """Email each user one digest of their delivered entries; returns the number sent"""
+    from django.contrib.auth import get_user_model
+
+    users = get_user_model().objects.filter(pk__in=delivered, is_active=True).exclude(email='')
+    messages = {user.pk: digest_message(user, delivered[user.pk]) for user in users}
+    if not messages:
+        return 0
+    connection = get_connection(
+        getattr(settings, 'NOTIFICATION_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+    )
+    try:
+        sent = connection.send_messages(list(messages.values())) or 0
+    except Exception:
+        logger.exception("Could not send %d notification digests", len(messages))
+        return 0
+    Notification.objects.filter(
+        pk__in=[notification.pk for user_id in messages for notification in delivered[user_id]]
+    ).update(emailed_at=timezone.now())
+    return sent
+
+
+def drain(batch_size=100, delay=None):
+    """
+    Deliver everything that is due, batch_size users at a time.
+    Returns (inbox entries written, digests emailed).
+    """
+    delay = get_delay() if delay is None else delay
+    notification_count = email_count = 0
+    while True:
+        now = timezone.now()
+        recipient_ids = ready_recipients(now - delay, batch_size)
+        if not recipient_ids:
+            break
+        delivered = deliver(recipient_ids, now)
+        if not delivered:
+            # Every ready user's events are being delivered by another worker
+            break
+        notification_count += sum(len(notifications) for notifications in delivered.values())
+        email_count += send_digests(delivered)
+    return notification_count, email_count
@@ -0,0 +1,32 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from notifications.dispatch import drain
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued notifications to the in-app inbox and as email digests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Users delivered per transaction')
+        parser.add_argument(
+            '--delay', type=int, default=None,
+            help='Seconds a user\'s oldest event waits before delivery (default NOTIFICATION_DIGEST_DELAY)'
+        )
+        parser.add_argument('--loop', action='store_true', help='Keep draining the outbox until interrupted')
+        parser.add_argument('--interval', type=int, default=30, help='Seconds between drains with --loop')
+
+    def handle(self, *args, **options):
+        delay = timedelta(seconds=options['delay']) if options['delay'] is not None else None
+        while True:
+            notification_count, email_count = drain(options['batch_size'], delay)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Successfully delivered {notification_count} notifications and {email_count} email digests'
+                )
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
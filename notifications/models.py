@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.db import models
+
+
+KIND_CHOICES = [
+    ('reply', 'Reply'),
+    ('moderation', 'Moderation'),
+    ('report', 'Report resolved'),
+    ('submission', 'Submission status'),
+    ('message', 'Message'),
+]
+
+
+class OutboxEvent(models.Model):
+    """
+    A notification waiting to be delivered.
+
+    Rows are written by notifications.outbox.emit in the same transaction as
+    the change they report, so they exist exactly when the change does, and
+    cost the request one INSERT. manage.py send_notifications turns them
+    into Notification rows and digest emails and deletes them.
+    """
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='outbox_events'
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Events of the same kind and group for a user end up in one notification
+    group = models.CharField(max_length=100)
+    text = models.CharField(max_length=255)
+    url = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for {self.recipient_id}: {self.text}"
+
+
+class Notification(models.Model):
+    """
+    An entry of a user's in-app inbox, combining every event of one kind
+    and group that arrived while it was unread
+    """
+    # Text of an entry combining several events, by kind
+    PLURAL_TEXT = {
+        'reply': '{count} new replies to your comment',
+        'moderation': 'Your comment was moderated {count} times',
+        'report': '{count} of your reports were resolved',
+        'submission': 'Your application changed status {count} times',
+        'message': '{count} new messages from {actor}',
+    }
+
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='notifications'
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    group = models.CharField(max_length=100)
+    text = models.CharField(max_length=255, help_text="Text of the latest event")
+    url = models.CharField(max_length=255, blank=True)
+    count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField()
+    read_at = models.DateTimeField(null=True, blank=True)
+    emailed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['recipient', '-updated_at']),
+            models.Index(fields=['recipient', 'read_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.summary} ({self.recipient})"
+
+    @property
+    def summary(self):
+        if self.count == 1 or self.kind not in self.PLURAL_TEXT:
+            return self.text
+        return self.PLURAL_TEXT[self.kind].format(
+            count=self.count,
+            actor=self.actor.username if self.actor else 'someone',
+        )
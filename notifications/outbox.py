@@ -0,0 +1,36 @@
+"""
+Writing notifications without delivering them.
+
+emit() and emit_many() add OutboxEvent rows through the caller's database
+connection, so they commit or roll back with the change being reported;
+manage.py send_notifications (notifications.dispatch) delivers them later.
+Nobody is notified of their own actions.
+"""
+from notifications.models import OutboxEvent
+
+
+def _pk(user):
+    return getattr(user, 'pk', user)
+
+
+def emit_many(recipients, kind, text, group, url='', actor=None):
+    """Queue the same notification for several users; returns the number queued"""
+    actor_id = _pk(actor)
+    recipient_ids = {_pk(recipient) for recipient in recipients} - {None, actor_id}
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(
+            recipient_id=recipient_id,
+            actor_id=actor_id,
+            kind=kind,
+            group=group,
+            text=text[:255],
+            url=url,
+        )
+        for recipient_id in recipient_ids
+    ])
+    return len(recipient_ids)
+
+
+def emit(recipient, kind, text, group, url='', actor=None):
+    """Queue a notification for one user"""
+    return emit_many([recipient], kind, text, group, url=url, actor=actor)
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from notifications.dispatch import drain
+from notifications.models import Notification, OutboxEvent
+from notifications.outbox import emit, emit_many
+
+
+@override_settings(NOTIFICATION_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.olga = User.objects.create_user('olga', email='olga@example.com')
+        self.ivan = User.objects.create_user('ivan')
+        self.petr = User.objects.create_user('petr')
+
+    def reply(self, actor, group='comment:1'):
+        emit(self.olga, 'reply', f'{actor.username} replied', group=group, url='/c/1/', actor=actor)
+
+    def test_events_commit_with_the_change(self):
+        queued = emit_many([self.olga, self.ivan, self.petr.pk], 'message', 'hi', 'conversation:1', actor=self.petr)
+        self.assertEqual(queued, 2)
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.reply(self.ivan)
+            raise ValueError
+        self.assertEqual(OutboxEvent.objects.count(), 2)
+
+    def test_events_wait_for_the_digest_delay(self):
+        self.reply(self.ivan)
+        self.assertEqual(drain(), (0, 0))
+        self.assertEqual(drain(delay=timedelta(0)), (1, 1))
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_events_fold_into_unread_entries(self):
+        self.reply(self.ivan)
+        self.reply(self.petr)
+        self.reply(self.ivan, group='comment:2')
+        self.assertEqual(drain(delay=timedelta(0)), (2, 1))
+        entry = Notification.objects.get(group='comment:1')
+        self.assertEqual((entry.count, entry.actor, entry.summary), (2, self.petr, '2 new replies to your comment'))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('2 new replies to your comment', mail.outbox[0].body)
+        self.assertIsNotNone(entry.emailed_at)
+
+        self.reply(self.ivan)
+        drain(delay=timedelta(0))
+        self.assertEqual(Notification.objects.get(group='comment:1').count, 3)
+
+        self.client.force_login(self.olga)
+        response = self.client.get(reverse('notifications:open', args=[entry.pk]))
+        self.assertRedirects(response, '/c/1/', fetch_redirect_response=False)
+        self.reply(self.ivan)
+        drain(delay=timedelta(0))
+        self.assertEqual(
+            sorted(Notification.objects.filter(group='comment:1').values_list('count', flat=True)), [1, 3]
+        )
+        self.assertEqual(self.client.get(reverse('notifications:ajax_unread_count')).json(), {'unread_count': 2})
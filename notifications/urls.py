@@ -0,0 +1,11 @@
+from django.urls import path
+from . import views
+
+app_name = 'notifications'
+
+urlpatterns = [
+    path('', views.inbox, name='inbox'),
+    path('<int:notification_id>/', views.open_notification, name='open'),
+    path('read-all/', views.mark_all_read, name='mark_all_read'),
+    path('ajax/unread-count/', views.unread_count, name='ajax_unread_count'),
+]
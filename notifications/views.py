@@ -0,0 +1,44 @@
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+
+from .models import Notification
+
+
+@login_required
+def inbox(request):
+    """The user's notifications, newest first"""
+    notifications = Notification.objects.filter(recipient=request.user).select_related('actor')
+    paginator = Paginator(notifications, 30)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(request, 'notifications/inbox.html', {
+        'page_obj': page_obj,
+        'unread_count': notifications.filter(read_at__isnull=True).count(),
+    })
+
+
+@login_required
+def open_notification(request, notification_id):
+    """Mark a notification read and follow its link"""
+    notification = get_object_or_404(Notification, pk=notification_id, recipient=request.user)
+    if notification.read_at is None:
+        notification.read_at = timezone.now()
+        notification.save(update_fields=['read_at'])
+    return redirect(notification.url or 'notifications:inbox')
+
+
+@login_required
+@require_POST
+def mark_all_read(request):
+    Notification.objects.filter(recipient=request.user, read_at__isnull=True).update(read_at=timezone.now())
+    return redirect('notifications:inbox')
+
+
+@login_required
+def unread_count(request):
+    """AJAX endpoint for the number of unread notifications"""
+    count = Notification.objects.filter(recipient=request.user, read_at__isnull=True).count()
+    return JsonResponse({'unread_count': count})
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Plan, Step, PlanSuggestion
+from project.stats import plan_suggestion_project, schedule_refresh
 
 
 class StepInline(admin.TabularInline):
@@ -83,17 +84,23 @@ class PlanSuggestionAdmin(admin.ModelAdmin):
     actions = ['approve_suggestions', 'reject_suggestions']
     
     def approve_suggestions(self, request, queryset):
-        updated = queryset.filter(status='pending').update(
+        pending = queryset.filter(status='pending')
+        project_ids = {plan_suggestion_project(suggestion) for suggestion in pending}
+        updated = pending.update(
             status='approved',
             reviewed_by=request.user
         )
+        schedule_refresh(project_ids, 'plans')
         self.message_user(request, f'{updated} suggestions approved.')
     approve_suggestions.short_description = 'Approve selected suggestions'
     
     def reject_suggestions(self, request, queryset):
-        updated = queryset.filter(status='pending').update(
+        pending = queryset.filter(status='pending')
+        project_ids = {plan_suggestion_project(suggestion) for suggestion in pending}
+        updated = pending.update(
             status='rejected',
             reviewed_by=request.user
         )
+        schedule_refresh(project_ids, 'plans')
         self.message_user(request, f'{updated} suggestions rejected.')
     reject_suggestions.short_description = 'Reject selected suggestions'
\ No newline at end of file
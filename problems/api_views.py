@@ -3,6 +3,7 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import PageNumberPagination
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from django.http import JsonResponse
@@ -13,10 +14,11 @@ from django.utils.decorators import method_decorator
 
 from .models import Problem, ProblemActivity
 from .serializers import ProblemSerializer, ProblemDetailSerializer
-from project.models import Project
+from project.models import Project, Membership
 from task.models import Task
 from need.models import Need
 from skills.models import Skill
+from search.autocomplete import search_users
 
 User = get_user_model()
 
@@ -66,12 +68,19 @@ class IsOwnerOrCanEdit(permissions.BasePermission):
         return obj.can_be_edited_by(request.user)
 
 
+class ProblemPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
 class ProblemViewSet(viewsets.ModelViewSet):
     """
     API endpoint for problems CRUD operations
     """
     queryset = Problem.objects.all()
     serializer_class = ProblemSerializer
+    pagination_class = ProblemPagination
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrCanEdit]
     
     def get_serializer_class(self):
@@ -81,7 +90,7 @@ class ProblemViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Filter problems based on user permissions and query parameters"""
-        queryset = Problem.objects.select_related(
+        queryset = Problem.objects.visible_to(self.request.user).select_related(
             'created_by', 'to_project', 'to_task', 'to_need'
         ).prefetch_related('assigned_to', 'skills')
         
@@ -91,11 +100,7 @@ class ProblemViewSet(viewsets.ModelViewSet):
         need_id = self.request.query_params.get('need')
         
         if project_id:
-            queryset = queryset.filter(
-                Q(to_project=project_id) |
-                Q(to_task__to_project=project_id) |
-                Q(to_need__to_project=project_id)
-            )
+            queryset = queryset.for_project(project_id)
         elif task_id:
             queryset = queryset.filter(to_task=task_id)
         elif need_id:
@@ -118,19 +123,7 @@ class ProblemViewSet(viewsets.ModelViewSet):
         elif assigned_filter == 'unassigned':
             queryset = queryset.filter(assigned_to__isnull=True)
         
-        # Apply permission filtering
-        if self.request.user.is_authenticated:
-            # This is a simplified approach - in production you might want to optimize this
-            filtered_ids = []
-            for problem in queryset:
-                if problem.can_be_viewed_by(self.request.user):
-                    filtered_ids.append(problem.id)
-            queryset = queryset.filter(id__in=filtered_ids)
-        else:
-            # Anonymous users can only see public problems
-            queryset = queryset.filter(visibility='public')
-        
-        return queryset.distinct()
+        return queryset
     
     def perform_create(self, serializer):
         """Set the creator when creating a problem"""
@@ -336,13 +329,9 @@ def filtered_problems_api(request):
             return Response({'error': 'Project not found'}, status=404)
         
         # Build queryset
-        problems = Problem.objects.filter(
-            Q(to_project=project) |
-            Q(to_task__to_project=project) |
-            Q(to_need__to_project=project)
-        ).select_related(
+        problems = Problem.objects.for_project(project).visible_to(request.user).select_related(
             'created_by', 'to_project', 'to_task', 'to_need'
-        ).prefetch_related('assigned_to', 'skills').distinct()
+        ).prefetch_related('assigned_to', 'skills')
         
         # Apply filters
         if statuses:
@@ -356,11 +345,7 @@ def filtered_problems_api(request):
         elif assigned_filter == 'unassigned':
             problems = problems.filter(assigned_to__isnull=True)
         
-        # Apply permission filtering
-        filtered_problems = []
-        for problem in problems:
-            if problem.can_be_viewed_by(request.user):
-                filtered_problems.append(problem)
+        filtered_problems = list(problems)
         
         # Render problems HTML
         context = {
@@ -412,25 +397,23 @@ def search_users_for_assignment(request):
             return JsonResponse({'results': []})
         
         # Search ONLY among project members
-        users = User.objects.filter(
-            membership__project=project
-        ).filter(
-            Q(username__icontains=query) | 
-            Q(first_name__icontains=query) | 
-            Q(last_name__icontains=query)
-        ).select_related('profile')[:10]
+        member_ids = Membership.objects.filter(project=project).values_list('user_id', flat=True)
+        matches = search_users(query, 10, user_ids=member_ids)
         
     except Project.DoesNotExist:
         return JsonResponse({'results': []})
     
+    users = User.objects.select_related('profile').in_bulk([match['id'] for match in matches])
     results = []
-    for user in users:
-        avatar_url = get_user_avatar_url(user, 'small')
+    for match in matches:
+        user = users.get(match['id'])
+        if user is None:
+            continue
         results.append({
-            'id': user.id,
-            'username': user.username,
-            'full_name': f"{user.first_name} {user.last_name}".strip() or user.username,
-            'avatar_url': avatar_url
+            'id': match['id'],
+            'username': match['username'],
+            'full_name': match['full_name'],
+            'avatar_url': get_user_avatar_url(user, 'small')
         })
     
     return JsonResponse({'results': results})
\ No newline at end of file
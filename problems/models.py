@@ -1,5 +1,6 @@
 from django.db import models
-from project.models import Project
+from django.db.models import Q
+from project.models import Project, Membership
 from task.models import Task
 from need.models import Need
 from skills.models import Skill
@@ -10,6 +11,46 @@ from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.urls import reverse
 
+PROJECT_PATHS = ('to_project', 'to_task__to_project', 'to_need__to_project')
+
+
+class ProblemQuerySet(models.QuerySet):
+    def for_project(self, project):
+        """Problems attached to a project directly or through one of its tasks/needs"""
+        query = Q()
+        for path in PROJECT_PATHS:
+            query |= Q(**{path: project})
+        return self.filter(query)
+
+    def visible_to(self, user):
+        """
+        SQL version of Problem.can_be_viewed_by.
+
+        Public problems are visible to everyone and 'logged_in' ones to any
+        authenticated user. Restricted problems are visible to staff, the
+        creator and assignees; otherwise they follow the object they are
+        attached to (see get_related_object): the project's visibility, the
+        need's visibility, or nobody else for a task. Membership and
+        assignment are checked with subqueries so the result has no
+        duplicate rows and can be paginated directly.
+        """
+        if not user.is_authenticated:
+            return self.filter(visibility='public')
+        if user.is_staff:
+            return self
+
+        query = Q(visibility__in=['public', 'logged_in']) | Q(created_by=user)
+        query |= Q(pk__in=Problem.assigned_to.through.objects.filter(
+            user=user
+        ).values('problem_id'))
+        query |= Q(to_project__in=Project.objects.visible_to(user).values('pk'))
+        query |= Q(
+            to_project__isnull=True,
+            to_task__isnull=True,
+            to_need__in=Need.objects.visible_to(user).values('pk'),
+        )
+        return self.filter(query)
+
 class Problem(models.Model):
     name = models.CharField(max_length=200)
     summary = models.TextField(max_length=500, blank=True, null=True)
@@ -101,6 +142,8 @@ class Problem(models.Model):
         help_text="Skills related to this problem"
     )
     
+    objects = ProblemQuerySet.as_manager()
+    
     def clean(self):
         """Ensure at least one relationship is set"""
         if not any([self.to_project, self.to_task, self.to_need]):
@@ -114,6 +157,16 @@ class Problem(models.Model):
             self.resolved_at = None
         
         super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored parents so re-attaching the problem refreshes
+        # the stats of the projects it leaves as well as the ones it joins
+        instance._loaded_parent_ids = tuple(
+            instance.__dict__.get(field) for field in ('to_project_id', 'to_task_id', 'to_need_id')
+        )
+        return instance
     
     def get_absolute_url(self):
         return reverse('problems:detail', kwargs={'pk': self.pk})
@@ -128,6 +181,16 @@ class Problem(models.Model):
             return self.to_need
         return None
     
+    def get_project(self):
+        """Return the project this problem belongs to, directly or through its task/need"""
+        if self.to_project:
+            return self.to_project
+        elif self.to_task:
+            return self.to_task.to_project
+        elif self.to_need:
+            return self.to_need.to_project
+        return None
+    
     def get_related_object_type(self):
         """Return the type of the related object"""
         if self.to_project:
@@ -144,21 +207,6 @@ class Problem(models.Model):
             return timezone.now() > self.due_date
         return False
     
-    def can_be_viewed_by(self, user):
-        """Check if user can view this problem based on visibility settings"""
-        if self.visibility == 'public':
-            return True
-        elif self.visibility == 'logged_in':
-            return user.is_authenticated
-        elif self.visibility == 'restricted':
-            # You can customize this logic based on your needs
-            return user.is_authenticated and (
-                user == self.created_by or 
-                user in self.assigned_to.all() or 
-                user.is_staff
-            )
-        return False
-    
     def get_assigned_users_display(self):
         """Get comma-separated list of assigned usernames"""
         return ", ".join([user.username for user in self.assigned_to.all()])
@@ -235,6 +283,7 @@ class Problem(models.Model):
                 return True
                 
         # Inherit permissions from parent object
+        # (keep in sync with ProblemQuerySet.visible_to)
         parent = self.get_related_object()
         if parent:
             if hasattr(parent, 'user_can_view'):
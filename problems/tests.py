@@ -1,3 +1,77 @@
+import itertools
+
+from django.contrib.auth.models import AnonymousUser, User
 from django.test import TestCase
 
-# Create your tests here.
+from need.models import Need
+from problems.models import Problem
+from project.models import Membership, Project
+from task.models import Task
+
+
+class ProblemVisibilityTests(TestCase):
+    def setUp(self):
+        self.owner, self.member, self.moderator, self.assignee, self.staff = [
+            User.objects.create_user(name) for name in ('owner', 'member', 'moderator', 'assignee', 'staff')
+        ]
+        self.staff.is_staff = True
+        self.staff.save()
+        projects = []
+        for i, visibility in enumerate(['public', 'logged_in', 'restricted', 'private']):
+            project = Project.objects.create(name=f'p{i}', visibility=visibility, created_by=self.owner)
+            if i % 2 == 0:
+                Membership.objects.create(user=self.member, project=project)
+            project.add_member(self.moderator, 'MODERATOR')
+            projects.append(project)
+
+        count = 0
+        for project, visibility in itertools.product(projects, ['public', 'logged_in', 'restricted']):
+            task = Task.objects.create(name='t', to_project=project)
+            targets = [{'to_project': project}, {'to_task': task}]
+            for need_visibility in ('public', 'members', 'admins'):
+                need = Need.objects.create(name='n', to_project=project, visibility=need_visibility)
+                targets.append({'to_need': need})
+            for target in targets:
+                problem = Problem.objects.create(
+                    name=f'x{count}', desc='d', visibility=visibility,
+                    created_by=self.assignee if count % 5 == 0 else None, **target
+                )
+                if count % 7 == 0:
+                    problem.assigned_to.add(self.assignee)
+                count += 1
+
+    def users(self):
+        return [User.objects.get(pk=user.pk) for user in
+                (self.owner, self.member, self.moderator, self.assignee, self.staff)] + [AnonymousUser()]
+
+    def test_visible_to_matches_can_be_viewed_by(self):
+        for user in self.users():
+            expected = {problem.pk for problem in Problem.objects.all() if problem.can_be_viewed_by(user)}
+            visible = Problem.objects.visible_to(user)
+            self.assertEqual(set(visible.values_list('pk', flat=True)), expected, user)
+            self.assertEqual(visible.count(), len(expected))
+
+    def test_restricted_problems_follow_their_parent(self):
+        project = Project.objects.create(name='open', visibility='public', created_by=self.owner)
+        project.add_member(self.moderator, 'MODERATOR')
+        admins_need = Need.objects.create(name='n', to_project=project, visibility='admins')
+        members_need = Need.objects.create(name='n', to_project=project, visibility='members')
+        task = Task.objects.create(name='t', to_project=project)
+        on_admins_need, on_members_need, on_task = [
+            Problem.objects.create(name='r', desc='d', visibility='restricted', **target)
+            for target in ({'to_need': admins_need}, {'to_need': members_need}, {'to_task': task})
+        ]
+        moderator, member = (User.objects.get(pk=user.pk) for user in (self.moderator, self.member))
+
+        self.assertFalse(on_admins_need.can_be_viewed_by(member))
+        self.assertTrue(on_admins_need.can_be_viewed_by(moderator))
+        self.assertTrue(on_members_need.can_be_viewed_by(member))
+        self.assertFalse(on_task.can_be_viewed_by(moderator))
+        self.assertTrue(on_task.can_be_viewed_by(self.staff))
+        self.assertEqual(
+            set(Problem.objects.visible_to(member).filter(pk__in=[on_admins_need.pk, on_task.pk])), set()
+        )
+        self.assertEqual(
+            set(Problem.objects.visible_to(moderator).filter(pk__in=[on_admins_need.pk, on_task.pk])),
+            {on_admins_need},
+        )
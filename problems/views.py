@@ -4,6 +4,7 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse, Http404
 from django.db.models import Q, Prefetch
+from django.db.models.functions import Lower
 from django.core.paginator import Paginator
 from django.utils import timezone
 from django.contrib.auth import get_user_model
@@ -15,6 +16,7 @@ from task.models import Task
 from need.models import Need
 from skills.models import Skill
 from comment.models import Comment, CommentStatus
+from feed.recommend import recommended
 
 
 User = get_user_model()
@@ -35,63 +37,60 @@ def problem_list_for_project(request, project_id):
         return redirect('project:index')
     
     # Get all problems related to this project (directly and through tasks/needs)
-    problems = Problem.objects.filter(
-        Q(to_project=project) |
-        Q(to_task__to_project=project) |
-        Q(to_need__to_project=project)
-    ).select_related(
+    problems = Problem.objects.for_project(project).visible_to(request.user).select_related(
         'created_by', 'to_project', 'to_task', 'to_need'
     ).prefetch_related(
         'assigned_to', 'skills', 'activities'
-    ).distinct()
-    
-    # Apply filtering based on user permissions
-    filtered_problems = []
-    for problem in problems:
-        if problem.can_be_viewed_by(request.user):
-            # Add permission check as attribute for template use
-            problem.user_can_edit = problem.can_be_edited_by(request.user)
-            filtered_problems.append(problem)
+    )
     
     # Apply URL-based filtering
     status_filter = request.GET.get('status')
     if status_filter and status_filter != 'all':
-        filtered_problems = [p for p in filtered_problems if p.status == status_filter]
+        problems = problems.filter(status=status_filter)
     
     priority_filter = request.GET.get('priority')
     if priority_filter and priority_filter != 'all':
-        filtered_problems = [p for p in filtered_problems if p.priority == int(priority_filter)]
+        problems = problems.filter(priority=priority_filter)
     
     assigned_filter = request.GET.get('assigned')
     if assigned_filter == 'me' and request.user.is_authenticated:
-        filtered_problems = [p for p in filtered_problems if request.user in p.assigned_to.all()]
+        problems = problems.filter(assigned_to=request.user)
     elif assigned_filter == 'unassigned':
-        filtered_problems = [p for p in filtered_problems if not p.assigned_to.exists()]
+        problems = problems.filter(assigned_to__isnull=True)
     
     # Sorting
     sort_by = request.GET.get('sort', '-priority')
-    if sort_by == 'priority':
-        filtered_problems.sort(key=lambda x: x.priority, reverse=True)
-    elif sort_by == '-priority':
-        filtered_problems.sort(key=lambda x: x.priority, reverse=False)
-    elif sort_by == 'created_at':
-        filtered_problems.sort(key=lambda x: x.created_at)
-    elif sort_by == '-created_at':
-        filtered_problems.sort(key=lambda x: x.created_at, reverse=True)
-    elif sort_by == 'name':
-        filtered_problems.sort(key=lambda x: x.name.lower())
-    elif sort_by == '-name':
-        filtered_problems.sort(key=lambda x: x.name.lower(), reverse=True)
+    sort_options = {
+        'priority': ['-priority', '-created_at'],
+        '-priority': ['priority', '-created_at'],
+        'created_at': ['created_at'],
+        '-created_at': ['-created_at'],
+        'name': [Lower('name')],
+        '-name': [Lower('name').desc()],
+    }
+    if sort_by in sort_options:
+        problems = problems.order_by(*sort_options[sort_by], 'id')
+    
+    paginator = Paginator(problems, 20)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    # Add permission check as attribute for template use
+    for problem in page_obj:
+        problem.user_can_edit = problem.can_be_edited_by(request.user)
     
     # Check if user can create problems
     can_create = request.user.is_authenticated and project.user_can_contribute(request.user)
     
     context = {
         'project': project,
-        'problems': filtered_problems,
+        'problems': page_obj,
+        'page_obj': page_obj,
         'can_create': can_create,
         'status_choices': Problem.STATUS_CHOICES,
         'priority_choices': Problem.PRIORITY_CHOICES,
+        'recommended': recommended(
+            request.user, 'problem', queryset=Problem.objects.for_project(project)
+        ),
         'current_filters': {
             'status': status_filter,
             'priority': priority_filter,
@@ -135,13 +134,10 @@ def problem_detail(request, problem_id):
     
     comments = Comment.objects.filter(comment_filter).select_related(
         'user', 'user__profile'
-    ).prefetch_related(
-        Prefetch(
-            'replies',
-            queryset=Comment.objects.filter(
-                Q(status=CommentStatus.APPROVED))
-        ),
-        'votes'
+    ).with_user_vote(request.user).with_changelog().with_reply_tree(
+        Comment.objects.filter(
+            Q(status=CommentStatus.APPROVED)
+        ).select_related('user', 'user__profile').with_user_vote(request.user).with_changelog()
     )
     
     # Get recent activities
@@ -0,0 +1,165 @@
+"""
+Maintenance of ProjectClosure and queries on top of it.
+
+The hierarchy is small next to everything else in a project, so changes
+recompute the closure of the affected projects from the full parent map
+(one query per edge source) instead of patching rows: adding or removing
+a parent re-derives the ancestors of the child and of everything below it.
+That stays correct when a project has several parents, where patching
+rows after a removal would need path counts. Signals schedule the refresh
+for after commit.
+"""
+from collections import defaultdict, deque
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import Coalesce
+
+
+def parent_map():
+    """{project_id: {parent_id, ...}} from main_project and approved child connections"""
+    from project.models import Connection, Project
+    parents = defaultdict(set)
+    for project_id, parent_id in Project.objects.filter(
+        main_project__isnull=False
+    ).values_list('pk', 'main_project_id'):
+        parents[project_id].add(parent_id)
+    for parent_id, project_id in Connection.objects.filter(
+        type='child', status='approved'
+    ).values_list('from_project_id', 'to_project_id'):
+        parents[project_id].add(parent_id)
+    return parents
+
+
+def ancestors(project_id, parents):
+    """{ancestor_id: depth} including the project itself at depth 0"""
+    depths = {project_id: 0}
+    queue = deque([project_id])
+    while queue:
+        current = queue.popleft()
+        for parent_id in parents.get(current, ()):
+            if parent_id not in depths:
+                depths[parent_id] = depths[current] + 1
+                queue.append(parent_id)
+    return depths
+
+
+def _write(ProjectClosure, project_ids, parents):
+    ProjectClosure.objects.filter(descendant_id__in=project_ids).delete()
+    ProjectClosure.objects.bulk_create([
+        ProjectClosure(ancestor_id=ancestor_id, descendant_id=project_id, depth=depth)
+        for project_id in project_ids
+        for ancestor_id, depth in ancestors(project_id, parents).items()
+    ], batch_size=1000)
+
+
+def refresh(project_ids):
+    """
+    Recompute the ancestor rows of some projects and of all their
+    descendants. Call after changing their parents.
+    """
+    from project.models import Project, ProjectClosure
+    project_ids = set(Project.objects.filter(pk__in=project_ids).values_list('pk', flat=True))
+    if not project_ids:
+        return
+    affected = project_ids | set(
+        ProjectClosure.objects.filter(ancestor_id__in=project_ids).values_list('descendant_id', flat=True)
+    )
+    parents = parent_map()
+    # New parents also pull in the current children of the projects
+    children = defaultdict(set)
+    for project_id, parent_ids in parents.items():
+        for parent_id in parent_ids:
+            children[parent_id].add(project_id)
+    queue = deque(affected)
+    while queue:
+        for child_id in children.get(queue.popleft(), ()):
+            if child_id not in affected:
+                affected.add(child_id)
+                queue.append(child_id)
+    with transaction.atomic():
+        _write(ProjectClosure, affected, parents)
+
+
+def schedule_refresh(project_ids):
+    """
+    refresh() once the current transaction commits, when cascades have
+    finished removing any projects that are being deleted
+    """
+    project_ids = {project_id for project_id in project_ids if project_id}
+    if project_ids:
+        transaction.on_commit(lambda: refresh(project_ids))
+
+
+def rebuild():
+    """Recompute the whole table; returns the number of rows"""
+    from project.models import Project, ProjectClosure
+    project_ids = list(Project.objects.values_list('pk', flat=True))
+    ProjectClosure.objects.all().delete()
+    _write(ProjectClosure, project_ids, parent_map())
+    return ProjectClosure.objects.count()
+
+
+def would_create_cycle(parent, child):
+    """True if making child a subproject of parent would put a project above itself"""
+    from project.models import ProjectClosure
+    return parent.pk == child.pk or ProjectClosure.objects.filter(
+        ancestor=child, descendant=parent
+    ).exists()
+
+
+def subtree_counts(project_ids):
+    """
+    {project_id: {'projects', 'tasks', 'needs', 'problems', 'members'}}
+    rolled up over each project's whole subtree, itself included.
+
+    Every count is one query grouped by descendant project, summed onto the
+    ancestors in Python; problems and members are counted once per subtree
+    even when they reach it through several projects.
+    """
+    from need.models import Need
+    from problems.models import Problem, PROJECT_PATHS
+    from project.models import Membership, ProjectClosure
+    from task.models import Task
+
+    project_ids = list(project_ids)
+    above = defaultdict(set)
+    counts = {project_id: dict.fromkeys(['projects', 'tasks', 'needs', 'problems', 'members'], 0)
+              for project_id in project_ids}
+    for ancestor_id, descendant_id in ProjectClosure.objects.filter(
+        ancestor_id__in=project_ids
+    ).values_list('ancestor_id', 'descendant_id'):
+        above[descendant_id].add(ancestor_id)
+        counts[ancestor_id]['projects'] += 1
+    subtree = list(above)
+
+    for key, model in (('tasks', Task), ('needs', Need)):
+        for project_id, total in (
+            model.objects.annotate(project_id=Coalesce('to_project_id', 'main_project_id'))
+            .filter(project_id__in=subtree)
+            .values('project_id').annotate(total=Count('pk'))
+            .values_list('project_id', 'total').order_by()
+        ):
+            for ancestor_id in above[project_id]:
+                counts[ancestor_id][key] += total
+
+    problem_ancestors = defaultdict(set)
+    problem_paths = [f'{path}_id' if path == 'to_project' else path for path in PROJECT_PATHS]
+    for path in problem_paths:
+        for problem_id, project_id in Problem.objects.filter(
+            **{f'{path}__in': subtree}
+        ).values_list('pk', path):
+            problem_ancestors[problem_id] |= above[project_id]
+    for ancestor_ids in problem_ancestors.values():
+        for ancestor_id in ancestor_ids:
+            counts[ancestor_id]['problems'] += 1
+
+    member_ancestors = defaultdict(set)
+    for user_id, project_id in Membership.objects.filter(
+        project_id__in=subtree
+    ).values_list('user_id', 'project_id'):
+        member_ancestors[user_id] |= above[project_id]
+    for ancestor_ids in member_ancestors.values():
+        for ancestor_id in ancestor_ids:
+            counts[ancestor_id]['members'] += 1
+    return counts
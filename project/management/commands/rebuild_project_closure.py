@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from project import hierarchy
+
+
+class Command(BaseCommand):
+    help = 'Recompute the project ancestry closure table from main_project and approved child connections'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = hierarchy.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {count} project closure rows'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from project import stats
+from project.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Recompute the ProjectStats rollup row of every project'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        project_ids = list(Project.objects.values_list('pk', flat=True).order_by('pk'))
+        batch_size = options['batch_size']
+        count = 0
+        for start in range(0, len(project_ids), batch_size):
+            count += stats.refresh(project_ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f'Successfully refreshed stats for {count} projects'))
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:19
+
+from collections import defaultdict, deque
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_closure(apps, schema_editor):
+    """Every project's ancestors (itself at depth 0) through main_project and approved child connections"""
+    Project = apps.get_model('project', 'Project')
+    Connection = apps.get_model('project', 'Connection')
+    ProjectClosure = apps.get_model('project', 'ProjectClosure')
+
+    parents = defaultdict(set)
+    for project_id, parent_id in Project.objects.filter(
+        main_project__isnull=False
+    ).values_list('pk', 'main_project_id'):
+        parents[project_id].add(parent_id)
+    for parent_id, project_id in Connection.objects.filter(
+        type='child', status='approved'
+    ).values_list('from_project_id', 'to_project_id'):
+        parents[project_id].add(parent_id)
+
+    rows = []
+    for project_id in Project.objects.values_list('pk', flat=True):
+        depths = {project_id: 0}
+        queue = deque([project_id])
+        while queue:
+            current = queue.popleft()
+            for parent_id in parents.get(current, ()):
+                if parent_id not in depths:
+                    depths[parent_id] = depths[current] + 1
+                    queue.append(parent_id)
+        rows.extend(
+            ProjectClosure(ancestor_id=ancestor_id, descendant_id=project_id, depth=depth)
+            for ancestor_id, depth in depths.items()
+        )
+    ProjectClosure.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0005_alter_membership_is_member'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='project.project')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='project.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='project_pro_descend_faf8f7_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
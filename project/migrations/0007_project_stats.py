@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0006_project_closure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='project.project')),
+                ('task_counts', models.JSONField(default=dict)),
+                ('need_counts', models.JSONField(default=dict)),
+                ('problem_counts', models.JSONField(default=dict)),
+                ('comment_counts', models.JSONField(default=dict)),
+                ('open_reports', models.PositiveIntegerField(default=0)),
+                ('members', models.PositiveIntegerField(default=0)),
+                ('subprojects', models.PositiveIntegerField(default=0)),
+                ('pending_connections', models.PositiveIntegerField(default=0)),
+                ('pending_submissions', models.PositiveIntegerField(default=0)),
+                ('locations', models.PositiveIntegerField(default=0)),
+                ('plan_suggestions', models.PositiveIntegerField(default=0)),
+                ('pending_plan_suggestions', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:40
+
+import project.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0007_project_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='permissions_version',
+            field=models.CharField(default=project.models.new_permissions_version, editable=False, max_length=32),
+        ),
+    ]
@@ -2,6 +2,8 @@
 # requirements 
 # introductions
 
+import uuid
+
 from django.db import models
 from django.conf import settings
 from skills.models import Skill
@@ -22,6 +24,47 @@ class ProjectPermissionGroup(models.TextChoices):
     STAKEHOLDER = 'STAKEHOLDER', 'Stakeholder'
 
 
+def new_permissions_version():
+    """A fresh value for Project.permissions_version"""
+    return uuid.uuid4().hex
+
+
+class ProjectQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Projects the user can view; same rules as Project.user_can_view"""
+        if not user or not user.is_authenticated:
+            return self.filter(visibility='public')
+        return self.filter(
+            models.Q(visibility__in=['public', 'logged_in']) |
+            models.Q(created_by=user) |
+            models.Q(pk__in=Membership.objects.filter(user=user).values('project_id'))
+        )
+
+    def descendants_of(self, project, include_self=False, max_depth=None):
+        """Every project below project in the hierarchy (see ProjectClosure)"""
+        links = ProjectClosure.objects.filter(ancestor=project, depth__gte=0 if include_self else 1)
+        if max_depth is not None:
+            links = links.filter(depth__lte=max_depth)
+        return self.filter(pk__in=links.values('descendant_id'))
+
+    def ancestors_of(self, project, include_self=False, max_depth=None):
+        """Every project above project in the hierarchy (see ProjectClosure)"""
+        links = ProjectClosure.objects.filter(descendant=project, depth__gte=0 if include_self else 1)
+        if max_depth is not None:
+            links = links.filter(depth__lte=max_depth)
+        return self.filter(pk__in=links.values('ancestor_id'))
+
+    def children_of(self, project):
+        return self.descendants_of(project, max_depth=1)
+
+    def parents_of(self, project):
+        return self.ancestors_of(project, max_depth=1)
+
+    def roots(self):
+        """Projects that are nobody's subproject"""
+        return self.exclude(pk__in=ProjectClosure.objects.filter(depth__gte=1).values('descendant_id'))
+
+
 class Project(models.Model):
     name = models.CharField(max_length=50)
     summary = models.TextField("summary", blank=True)
@@ -54,13 +97,27 @@ class Project(models.Model):
     published = models.BooleanField(default=False)
     skills = models.ManyToManyField('skills.Skill', blank=True)
     main_project = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='sub_projects')
+
+    objects = ProjectQuerySet.as_manager()
     
     # New fields for permission management
     allow_anonymous_comments = models.BooleanField(default=True, 
         help_text="Allow non-logged-in users to comment")
     require_comment_approval = models.BooleanField(default=False, 
         help_text="Require comments to be approved by moderators before being visible")
+    # Part of the key of every cached permission entry (utils.permission_cache);
+    # replaced whenever a membership or the visibility of the project changes
+    permissions_version = models.CharField(max_length=32, default=new_permissions_version, editable=False)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored visibility so cached permissions can be
+        # invalidated when it changes
+        instance._loaded_visibility = instance.__dict__.get('visibility')
+        instance._loaded_main_project_id = instance.__dict__.get('main_project_id')
+        return instance
+
     def add_skill(self, skill_name):
         """
         Add a skill to the project, creating it if it doesn't exist
@@ -102,10 +159,8 @@ class Project(models.Model):
         elif self.visibility == 'logged_in' and user.is_authenticated:
             return True
         elif self.visibility in ['restricted', 'private'] and user.is_authenticated:
-            if user == self.created_by:
-                return True
-            if Membership.objects.filter(project=self, user=user).exists():
-                return True
+            from utils.permissions import get_project_perms
+            return get_project_perms(user).can_view(self)
         return False
     def get_comment_statistics(self, user=None):
         """
@@ -117,7 +172,7 @@ class Project(models.Model):
         Returns:
             dict: Statistics including total_comments, total_replies, total_discussions
         """
-        from comment.models import Comment, CommentStatus
+        from comment.models import CommentStatus
         
         # Determine which statuses the user can see
         if user and user.is_authenticated and self.user_can_moderate_comments(user):
@@ -135,17 +190,7 @@ class Project(models.Model):
             # Regular users only see approved
             include_statuses = [CommentStatus.APPROVED]
         
-        # Get all comments for this project (including nested ones)
-        all_project_comments = Comment.objects.filter(
-            to_project=self,
-            status__in=include_statuses
-        )
-        
-        # Count top-level comments (parent is null)
-        total_comments = all_project_comments.filter(parent__isnull=True).count()
-        
-        # Count all replies (parent is not null)  
-        total_replies = all_project_comments.filter(parent__isnull=False).count()
+        total_comments, total_replies = ProjectStats.for_project(self).comment_totals(include_statuses)
         
         # Total discussions = comments + all nested replies
         total_discussions = total_comments + total_replies
@@ -197,11 +242,8 @@ class Project(models.Model):
             return True
             
         # Project-specific admin or moderator
-        return Membership.objects.filter(
-            project=self,
-            user=user,
-            is_moderator=True
-        ).exists()
+        from utils.permissions import get_project_perms
+        return get_project_perms(user).can_moderate_comments(self)
     
     def user_can_comment(self, user):
         """Determine if a user can comment on this project"""
@@ -218,20 +260,15 @@ class Project(models.Model):
             return True
             
         # For restricted and private, check membership
-        return Membership.objects.filter(project=self, user=user).exists()
+        from utils.permissions import get_project_perms
+        return get_project_perms(user).is_member(self)
     def user_can_contribute(self, user):
         if not user.is_authenticated:
             return False
         
     # Project owners and admins can contribute
-        if user == self.created_by:
-            return True
-            # Check membership
-        membership = Membership.objects.filter(project=self, user=user).first()
-        if membership and (membership.is_administrator or membership.is_contributor or membership.is_moderator):
-            return True
-        
-        return False
+        from utils.permissions import get_project_perms
+        return get_project_perms(user).can_contribute(self)
     def __str__(self):
         return self.name
 
@@ -326,6 +363,106 @@ class Membership(models.Model):
         return f"{self.user.username} - {self.project.name} ({self.get_role_display()})"
 
 
+class ProjectClosure(models.Model):
+    """
+    Transitive closure of the project hierarchy: one row per (ancestor,
+    descendant) pair, plus a depth 0 row for every project.
+
+    A project's parents are its main_project and the from_project of its
+    approved 'child' Connections, so a project can sit under several
+    parents; depth is the length of the shortest path. Rows are kept up to
+    date by project.hierarchy and its signals.
+    """
+    ancestor = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant')
+        indexes = [
+            models.Index(fields=['descendant', 'depth']),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+
+class ProjectStats(models.Model):
+    """
+    Headline numbers of one project, so its pages render them from one row.
+
+    Per-status counts are {status: count} dicts; comment_counts maps a
+    status to [top_level, replies]. Only items attached directly to the
+    project are counted (hierarchy.subtree_counts covers subtrees). Rows are
+    refreshed per section by project.stats after each change commits.
+    """
+    CLOSED_PROBLEM_STATUSES = ('solved', 'unsolvable', 'closed', 'duplicate', 'invalid')
+
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    task_counts = models.JSONField(default=dict)
+    need_counts = models.JSONField(default=dict)
+    problem_counts = models.JSONField(default=dict)
+    comment_counts = models.JSONField(default=dict)
+    open_reports = models.PositiveIntegerField(default=0)
+    members = models.PositiveIntegerField(default=0)
+    subprojects = models.PositiveIntegerField(default=0)
+    pending_connections = models.PositiveIntegerField(default=0)
+    pending_submissions = models.PositiveIntegerField(default=0)
+    locations = models.PositiveIntegerField(default=0)
+    plan_suggestions = models.PositiveIntegerField(default=0)
+    pending_plan_suggestions = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for {self.project_id}"
+
+    @classmethod
+    def for_project(cls, project):
+        """The project's row, computed on the spot if it is missing"""
+        stats = cls.objects.filter(project=project).first()
+        if stats is None:
+            from project.stats import refresh
+            refresh([project.pk])
+            stats = cls.objects.get(project=project)
+        return stats
+
+    @property
+    def total_tasks(self):
+        return sum(self.task_counts.values())
+
+    @property
+    def total_needs(self):
+        return sum(self.need_counts.values())
+
+    @property
+    def total_problems(self):
+        return sum(self.problem_counts.values())
+
+    @property
+    def open_problems(self):
+        return sum(
+            count for status, count in self.problem_counts.items()
+            if status not in self.CLOSED_PROBLEM_STATUSES
+        )
+
+    def comment_totals(self, statuses=None):
+        """(top_level, replies) over some statuses, or all of them"""
+        top_level = replies = 0
+        for status, (status_top_level, status_replies) in self.comment_counts.items():
+            if statuses is None or status in statuses:
+                top_level += status_top_level
+                replies += status_replies
+        return top_level, replies
+
+    @property
+    def total_comments(self):
+        return sum(self.comment_totals())
+
+    @property
+    def pending_comments(self):
+        return sum(self.comment_totals(['PENDING']))
+
+
 def create_default_project_groups():
     """Create default permission groups for projects"""
     # Define the content types we need permissions for
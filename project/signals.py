@@ -0,0 +1,138 @@
+"""
+Keep ProjectClosure in step with main_project and approved child
+connections, and ProjectStats in step with what it counts.
+"""
+from django.db.models.signals import pre_delete, post_delete, post_save
+from django.dispatch import receiver
+
+from comment.models import Comment, CommentReport
+from need.models import Need
+from plans.models import PlanSuggestion
+from problems.models import Problem
+from project import hierarchy, stats
+from project.models import Connection, Localization, Membership, Project, ProjectClosure
+from submissions.models import Submission
+from task.models import Task
+
+
+@receiver(post_save, sender=Project)
+def update_closure_for_project(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created or instance.main_project_id != getattr(instance, '_loaded_main_project_id', None):
+        hierarchy.schedule_refresh([instance.pk])
+    instance._loaded_main_project_id = instance.main_project_id
+
+
+@receiver(pre_delete, sender=Project)
+def remember_descendants(sender, instance, **kwargs):
+    instance._closure_descendant_ids = set(
+        ProjectClosure.objects.filter(ancestor=instance, depth__gte=1).values_list('descendant_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Project)
+def update_closure_for_deleted_project(sender, instance, **kwargs):
+    hierarchy.schedule_refresh(getattr(instance, '_closure_descendant_ids', ()))
+
+
+@receiver([post_save, post_delete], sender=Connection)
+def update_closure_for_connection(sender, instance, raw=False, created=False, **kwargs):
+    if raw or instance.type != 'child':
+        return
+    if created and instance.status != 'approved':
+        return
+    hierarchy.schedule_refresh([instance.to_project_id])
+
+
+# ProjectStats
+
+def _moved_from(instance):
+    """The project the instance was loaded with, if saving moved it away from it"""
+    loaded = getattr(instance, '_loaded_to_project_id', None)
+    instance._loaded_to_project_id = instance.to_project_id
+    return loaded if loaded != instance.to_project_id else None
+
+
+def _problem_projects(to_project_id, to_task_id, to_need_id):
+    project_ids = {to_project_id}
+    if to_task_id:
+        project_ids.add(Task.objects.filter(pk=to_task_id).values_list('to_project_id', flat=True).first())
+    if to_need_id:
+        project_ids.add(Need.objects.filter(pk=to_need_id).values_list('to_project_id', flat=True).first())
+    return project_ids
+
+
+def _refresh_parent_stats(instance, section):
+    project_ids = [instance.to_project_id, _moved_from(instance)]
+    stats.schedule_refresh(project_ids, section)
+    if project_ids[1] is not None:
+        # Problems and plan suggestions attached to a task/need move with it
+        stats.schedule_refresh(project_ids, 'problems')
+        stats.schedule_refresh(project_ids, 'plans')
+
+
+@receiver([post_save, post_delete], sender=Task)
+def refresh_task_stats(sender, instance, **kwargs):
+    _refresh_parent_stats(instance, 'tasks')
+
+
+@receiver([post_save, post_delete], sender=Need)
+def refresh_need_stats(sender, instance, **kwargs):
+    _refresh_parent_stats(instance, 'needs')
+
+
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Need)
+def refresh_orphaned_plan_stats(sender, instance, **kwargs):
+    # Plan suggestions are linked generically and outlive their task/need
+    stats.schedule_refresh([instance.to_project_id], 'plans')
+
+
+@receiver([post_save, post_delete], sender=Problem)
+def refresh_problem_stats(sender, instance, **kwargs):
+    parent_ids = (instance.to_project_id, instance.to_task_id, instance.to_need_id)
+    project_ids = _problem_projects(*parent_ids)
+    loaded = getattr(instance, '_loaded_parent_ids', parent_ids)
+    if loaded != parent_ids:
+        project_ids |= _problem_projects(*loaded)
+    instance._loaded_parent_ids = parent_ids
+    stats.schedule_refresh(project_ids, 'problems')
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def refresh_comment_stats(sender, instance, **kwargs):
+    stats.schedule_refresh([instance.to_project_id, _moved_from(instance)], 'comments')
+
+
+@receiver([post_save, post_delete], sender=CommentReport)
+def refresh_report_stats(sender, instance, **kwargs):
+    stats.schedule_refresh(
+        Comment.objects.filter(pk=instance.comment_id).values_list('to_project_id', flat=True),
+        'comments'
+    )
+
+
+@receiver([post_save, post_delete], sender=Membership)
+def refresh_member_stats(sender, instance, **kwargs):
+    stats.schedule_refresh([instance.project_id], 'members')
+
+
+@receiver([post_save, post_delete], sender=Connection)
+def refresh_connection_stats(sender, instance, **kwargs):
+    stats.schedule_refresh([instance.from_project_id, instance.to_project_id], 'connections')
+
+
+@receiver([post_save, post_delete], sender=Submission)
+def refresh_submission_stats(sender, instance, **kwargs):
+    stats.schedule_refresh([instance.to_project_id], 'submissions')
+
+
+@receiver([post_save, post_delete], sender=Localization)
+def refresh_location_stats(sender, instance, **kwargs):
+    stats.schedule_refresh([instance.project_id], 'locations')
+
+
+@receiver([post_save, post_delete], sender=PlanSuggestion)
+def refresh_plan_stats(sender, instance, **kwargs):
+    stats.schedule_refresh([stats.plan_suggestion_project(instance)], 'plans')
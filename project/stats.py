@@ -0,0 +1,225 @@
+"""
+Computation of ProjectStats rows.
+
+Counts are grouped into sections that are recomputed together; signals
+refresh only the section a change touches, for the projects it touches,
+once the transaction commits. Every section is one or two GROUP BY queries
+for any number of projects, so `manage.py refresh_project_stats` refreshes
+everything in a handful of queries per batch.
+"""
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, Q
+
+
+def _status_counts(rows):
+    counts = defaultdict(dict)
+    for project_id, status, total in rows:
+        counts[project_id][status] = total
+    return counts
+
+
+def _totals(rows):
+    return {project_id: total for project_id, total in rows}
+
+
+def _grouped(queryset, project_field, *fields):
+    return queryset.values(project_field, *fields).annotate(total=Count('pk')).values_list(
+        project_field, *fields, 'total'
+    ).order_by()
+
+
+def count_tasks(project_ids):
+    from task.models import Task
+    counts = _status_counts(_grouped(Task.objects.filter(to_project__in=project_ids), 'to_project', 'status'))
+    return {project_id: {'task_counts': counts.get(project_id, {})} for project_id in project_ids}
+
+
+def count_needs(project_ids):
+    from need.models import Need
+    counts = _status_counts(_grouped(Need.objects.filter(to_project__in=project_ids), 'to_project', 'status'))
+    return {project_id: {'need_counts': counts.get(project_id, {})} for project_id in project_ids}
+
+
+def count_problems(project_ids):
+    """Problems attached directly or through a task/need, as Problem.objects.for_project"""
+    from problems.models import Problem, PROJECT_PATHS
+    query = Q()
+    for path in PROJECT_PATHS:
+        query |= Q(**{f'{path}__in': project_ids})
+    wanted = set(project_ids)
+    counts = defaultdict(lambda: defaultdict(int))
+    for pk, status, *paths in Problem.objects.filter(query).values_list('pk', 'status', *PROJECT_PATHS):
+        for project_id in set(paths) & wanted:
+            counts[project_id][status] += 1
+    return {project_id: {'problem_counts': dict(counts.get(project_id, {}))} for project_id in project_ids}
+
+
+def count_comments(project_ids):
+    from comment.models import Comment, CommentReport, ReportStatus
+    counts = defaultdict(dict)
+    for project_id, status, top_level, replies in Comment.objects.filter(
+        to_project__in=project_ids
+    ).values('to_project', 'status').annotate(
+        top_level=Count('pk', filter=Q(parent__isnull=True)),
+        replies=Count('pk', filter=Q(parent__isnull=False)),
+    ).values_list('to_project', 'status', 'top_level', 'replies').order_by():
+        counts[project_id][status] = [top_level, replies]
+    reports = _totals(_grouped(CommentReport.objects.filter(
+        comment__to_project__in=project_ids,
+        status__in=[ReportStatus.PENDING, ReportStatus.REVIEWED],
+    ), 'comment__to_project'))
+    return {
+        project_id: {
+            'comment_counts': counts.get(project_id, {}),
+            'open_reports': reports.get(project_id, 0),
+        }
+        for project_id in project_ids
+    }
+
+
+def count_members(project_ids):
+    from project.models import Membership
+    members = _totals(_grouped(Membership.objects.filter(project__in=project_ids), 'project'))
+    return {project_id: {'members': members.get(project_id, 0)} for project_id in project_ids}
+
+
+def count_connections(project_ids):
+    from project.models import Connection
+    children = _totals(_grouped(Connection.objects.filter(
+        from_project__in=project_ids, type='child', status='approved'
+    ), 'from_project'))
+    pending = _totals(_grouped(Connection.objects.filter(
+        to_project__in=project_ids, type='child', status='pending'
+    ), 'to_project'))
+    return {
+        project_id: {
+            'subprojects': children.get(project_id, 0),
+            'pending_connections': pending.get(project_id, 0),
+        }
+        for project_id in project_ids
+    }
+
+
+def count_submissions(project_ids):
+    from submissions.models import Submission
+    pending = _totals(_grouped(Submission.objects.filter(
+        to_project__in=project_ids, status='PENDING'
+    ), 'to_project'))
+    return {project_id: {'pending_submissions': pending.get(project_id, 0)} for project_id in project_ids}
+
+
+def count_locations(project_ids):
+    from project.models import Localization
+    locations = _totals(_grouped(Localization.objects.filter(project__in=project_ids), 'project'))
+    return {project_id: {'locations': locations.get(project_id, 0)} for project_id in project_ids}
+
+
+def plan_targets(project_ids):
+    """{(content_type_id, object_id): project_id} for the projects and their tasks and needs"""
+    from need.models import Need
+    from project.models import Project
+    from task.models import Task
+    targets = {}
+    for model, rows in (
+        (Project, ((pk, pk) for pk in project_ids)),
+        (Task, Task.objects.filter(to_project__in=project_ids).values_list('pk', 'to_project_id')),
+        (Need, Need.objects.filter(to_project__in=project_ids).values_list('pk', 'to_project_id')),
+    ):
+        content_type_id = ContentType.objects.get_for_model(model).pk
+        targets.update({(content_type_id, pk): project_id for pk, project_id in rows})
+    return targets
+
+
+def plan_suggestion_project(suggestion):
+    """The project a PlanSuggestion counts towards, if any"""
+    from need.models import Need
+    from project.models import Project
+    from task.models import Task
+    model = ContentType.objects.get_for_id(suggestion.content_type_id).model_class()
+    if model is Project:
+        return suggestion.object_id
+    if model in (Task, Need):
+        return model.objects.filter(pk=suggestion.object_id).values_list('to_project_id', flat=True).first()
+    return None
+
+
+def count_plans(project_ids):
+    from plans.models import PlanSuggestion, PlanSuggestionStatus
+    targets = plan_targets(project_ids)
+    query = Q(pk__in=[])
+    by_type = defaultdict(list)
+    for content_type_id, object_id in targets:
+        by_type[content_type_id].append(object_id)
+    for content_type_id, object_ids in by_type.items():
+        query |= Q(content_type_id=content_type_id, object_id__in=object_ids)
+
+    totals = defaultdict(int)
+    pending = defaultdict(int)
+    for content_type_id, object_id, status, total in _grouped(
+        PlanSuggestion.objects.filter(query), 'content_type', 'object_id', 'status'
+    ):
+        project_id = targets[(content_type_id, object_id)]
+        totals[project_id] += total
+        if status == PlanSuggestionStatus.PENDING:
+            pending[project_id] += total
+    return {
+        project_id: {
+            'plan_suggestions': totals.get(project_id, 0),
+            'pending_plan_suggestions': pending.get(project_id, 0),
+        }
+        for project_id in project_ids
+    }
+
+
+SECTIONS = {
+    'tasks': count_tasks,
+    'needs': count_needs,
+    'problems': count_problems,
+    'comments': count_comments,
+    'members': count_members,
+    'connections': count_connections,
+    'submissions': count_submissions,
+    'locations': count_locations,
+    'plans': count_plans,
+}
+
+
+def refresh(project_ids, sections=None):
+    """Recompute some sections (all by default) of some projects' rows"""
+    from project.models import Project, ProjectStats
+    project_ids = list(Project.objects.filter(pk__in=project_ids).values_list('pk', flat=True))
+    if not project_ids:
+        return 0
+    if sections is not None:
+        # A new row needs every section, not just the one that changed
+        missing = set(project_ids) - set(
+            ProjectStats.objects.filter(project__in=project_ids).values_list('project_id', flat=True)
+        )
+        if missing:
+            refresh(missing)
+            project_ids = [project_id for project_id in project_ids if project_id not in missing]
+            if not project_ids:
+                return len(missing)
+    values = defaultdict(dict)
+    for section in sections or SECTIONS:
+        for project_id, fields in SECTIONS[section](project_ids).items():
+            values[project_id].update(fields)
+    update_fields = sorted({field for fields in values.values() for field in fields})
+    ProjectStats.objects.bulk_create(
+        [ProjectStats(project_id=project_id, **fields) for project_id, fields in values.items()],
+        update_conflicts=True,
+        unique_fields=['project'],
+        update_fields=[*update_fields, 'updated_at'],
+        batch_size=500,
+    )
+    return len(project_ids)
+
+
+def schedule_refresh(project_ids, section):
+    """Refresh one section of some projects in the background once the current transaction commits"""
+    from project.tasks import refresh_stats
+    project_ids = sorted({project_id for project_id in project_ids if project_id})
+    if project_ids:
+        refresh_stats.defer(project_ids, [section])
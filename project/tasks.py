@@ -0,0 +1,13 @@
+"""Side effects of project changes run by manage.py run_jobs (see jobs.queue)"""
+from jobs.queue import background_task
+
+from project import stats
+
+
+def _stats_key(project_ids, sections=None):
+    return f"project-stats:{','.join(sections or ['all'])}:{','.join(map(str, project_ids))}"
+
+
+@background_task(dedup_key=_stats_key)
+def refresh_stats(project_ids, sections=None):
+    stats.refresh(project_ids, sections)
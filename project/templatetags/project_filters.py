@@ -1,6 +1,6 @@
 # project/templatetags/project_filters.py
 from django import template
-from project.models import Connection
+from project.models import Connection, Project
 
 register = template.Library()
 
@@ -25,19 +25,9 @@ def has_pending_connection_requests(project):
 @register.filter
 def get_child_projects(project):
     """Get approved child projects for a project"""
-    child_connections = Connection.objects.filter(
-        from_project=project, 
-        type='child', 
-        status='approved'
-    ).select_related('to_project')
-    return [conn.to_project for conn in child_connections]
+    return list(Project.objects.children_of(project))
 
 @register.filter
 def get_parent_projects(project):
     """Get approved parent projects for a project"""
-    parent_connections = Connection.objects.filter(
-        to_project=project, 
-        type='child', 
-        status='approved'
-    ).select_related('from_project')
-    return [conn.from_project for conn in parent_connections]
\ No newline at end of file
+    return list(Project.objects.parents_of(project))
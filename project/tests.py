@@ -0,0 +1,296 @@
+import random
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from need.models import Need
+from problems.models import Problem
+from project import hierarchy, stats
+from project.models import Connection, Membership, Project, ProjectClosure, ProjectStats
+from task.models import Task
+from utils.permission_cache import permission_cache_stats, reset_permission_cache_stats
+from utils.permissions import can, get_project_perms, user_has_project_permission
+
+
+class PermissionTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner')
+        self.user = User.objects.create_user('user')
+        self.projects = [
+            Project.objects.create(name=f'p{i}', visibility=visibility, created_by=self.owner)
+            for i, visibility in enumerate(['public', 'logged_in', 'restricted', 'private'])
+        ]
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_role_checks(self):
+        public, logged_in, restricted, private = self.projects
+        self.assertFalse(restricted.user_can_view(self.user))
+        restricted.add_member(self.user, 'MODERATOR')
+        user = self.fresh_user()
+        self.assertTrue(restricted.user_can_view(user))
+        self.assertTrue(restricted.user_can_moderate_comments(user))
+        self.assertFalse(private.user_can_comment(user))
+        self.assertTrue(private.user_can_contribute(self.owner))
+        self.assertTrue(user_has_project_permission(user, restricted.pk, 'can_moderate'))
+        self.assertFalse(user_has_project_permission(user, private, 'can_view'))
+
+    def test_checks_in_a_request_share_one_membership_load(self):
+        self.projects[2].add_member(self.user, 'VIEWER')
+        user = self.fresh_user()
+        with self.assertNumQueries(2):
+            allowed = can(user, 'view', self.projects)
+        self.assertEqual(allowed, dict(zip([p.pk for p in self.projects], [True, True, True, False])))
+        with self.assertNumQueries(0):
+            for project in self.projects:
+                project.user_can_view(user)
+
+    def test_membership_changes_apply_to_new_requests(self):
+        restricted = self.projects[2]
+        self.assertFalse(restricted.user_can_view(self.fresh_user()))
+        membership = restricted.add_member(self.user, 'VIEWER')
+        self.assertTrue(restricted.user_can_view(self.fresh_user()))
+        membership.delete()
+        self.assertFalse(restricted.user_can_view(self.fresh_user()))
+
+    def test_hits_and_misses_are_counted(self):
+        restricted = self.projects[2]
+        restricted.add_member(self.user, 'VIEWER')
+        reset_permission_cache_stats()
+        self.assertTrue(restricted.user_can_view(self.fresh_user()))
+        self.assertTrue(restricted.user_can_view(self.fresh_user()))
+        stats = permission_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'worker1': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker1'},
+    'worker2': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker2'},
+})
+class LocalPermissionCacheTests(TestCase):
+    """Each worker process has its own local-memory cache"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner')
+        self.user = User.objects.create_user('user')
+        self.project = Project.objects.create(name='p', visibility='restricted', created_by=self.owner)
+        self.project.add_member(self.user, 'MODERATOR')
+
+    def tearDown(self):
+        caches['worker1'].clear()
+        caches['worker2'].clear()
+
+    def can_moderate(self, worker):
+        with self.settings(PERMISSION_CACHE_ALIAS=worker):
+            user = User.objects.get(pk=self.user.pk)
+            return Project.objects.get(pk=self.project.pk).user_can_moderate_comments(user)
+
+    def test_changes_made_by_another_worker_apply(self):
+        self.assertTrue(self.can_moderate('worker1'))
+        with self.settings(PERMISSION_CACHE_ALIAS='worker2'):
+            Membership.objects.filter(user=self.user, project=self.project).delete()
+        self.assertFalse(self.can_moderate('worker1'))
+        with self.settings(PERMISSION_CACHE_ALIAS='worker2'):
+            self.project.add_member(self.user, 'MODERATOR')
+        self.assertTrue(self.can_moderate('worker1'))
+
+    def test_visibility_change_made_by_another_worker_applies(self):
+        outsider = User.objects.create_user('outsider')
+        with self.settings(PERMISSION_CACHE_ALIAS='worker1'):
+            self.assertFalse(get_project_perms(outsider).has_permission(self.project.pk, 'can_view'))
+        with self.settings(PERMISSION_CACHE_ALIAS='worker2'):
+            project = Project.objects.get(pk=self.project.pk)
+            project.visibility = 'logged_in'
+            project.save()
+        with self.settings(PERMISSION_CACHE_ALIAS='worker1'):
+            outsider = User.objects.get(pk=outsider.pk)
+            self.assertTrue(get_project_perms(outsider).has_permission(self.project.pk, 'can_view'))
+
+
+class SharedPermissionCacheTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            CACHES={'perms': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': self.cache_dir,
+            }},
+            PERMISSION_CACHE_ALIAS='perms',
+        )
+        self.settings_override.enable()
+        self.owner = User.objects.create_user('owner')
+        self.user = User.objects.create_user('user')
+        self.project = Project.objects.create(name='p', visibility='restricted', created_by=self.owner)
+        self.project.add_member(self.user, 'MODERATOR')
+
+    def tearDown(self):
+        caches['perms'].clear()
+        self.settings_override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def perms(self):
+        return get_project_perms(User.objects.get(pk=self.user.pk))
+
+    def test_entries_are_reused_across_requests(self):
+        self.assertTrue(self.perms().can_moderate_comments(self.project))
+        perms = self.perms()
+        with self.assertNumQueries(0):
+            self.assertTrue(perms.can_moderate_comments(self.project))
+
+    def test_membership_change_invalidates_entry(self):
+        self.assertTrue(self.perms().can_moderate_comments(self.project))
+        Membership.objects.filter(user=self.user, project=self.project).delete()
+        self.assertFalse(self.perms().can_moderate_comments(self.project))
+        self.assertFalse(self.perms().can_view(self.project))
+
+    def test_visibility_change_invalidates_project(self):
+        outsider = User.objects.create_user('outsider')
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertFalse(get_project_perms(outsider).has_permission(project.pk, 'can_view'))
+        project.visibility = 'logged_in'
+        project.save()
+        outsider = User.objects.get(pk=outsider.pk)
+        self.assertTrue(get_project_perms(outsider).has_permission(project.pk, 'can_view'))
+
+
+class ClosureTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='x')
+
+    def rows(self):
+        return set(ProjectClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def assertMatchesRebuild(self):
+        live = self.rows()
+        hierarchy.rebuild()
+        self.assertEqual(self.rows(), live)
+        return live
+
+    def test_random_changes_keep_closure_in_sync(self):
+        rnd = random.Random(7)
+        with self.captureOnCommitCallbacks(execute=True):
+            projects = [Project.objects.create(name=f'p{i}', created_by=self.user) for i in range(8)]
+        deepest = 0
+        for _ in range(150):
+            parent, child = rnd.sample(projects, 2)
+            with self.captureOnCommitCallbacks(execute=True):
+                op = rnd.randrange(5)
+                if op == 0 and not hierarchy.would_create_cycle(parent, child):
+                    child.main_project = parent
+                    child.save()
+                elif op == 1:
+                    child.main_project = None
+                    child.save()
+                elif op == 2 and not hierarchy.would_create_cycle(parent, child):
+                    Connection.objects.get_or_create(
+                        from_project=parent, to_project=child, type='child',
+                        defaults={'status': rnd.choice(['approved', 'pending'])},
+                    )
+                elif op == 3:
+                    connection = Connection.objects.order_by('?').first()
+                    if connection and connection.status == 'pending' and not hierarchy.would_create_cycle(
+                        connection.from_project, connection.to_project
+                    ):
+                        connection.status = 'approved'
+                        connection.save()
+                    elif connection:
+                        connection.delete()
+                elif op == 4 and rnd.random() < 0.2 and len(projects) > 3:
+                    parent.delete()
+                    projects = list(Project.objects.order_by('pk'))
+                    projects.append(Project.objects.create(name='new', created_by=self.user))
+            live = self.assertMatchesRebuild()
+            deepest = max([deepest] + [depth for _, _, depth in live])
+            self.assertFalse(any(a == d and depth for a, d, depth in live))
+        self.assertGreaterEqual(deepest, 2)
+
+    def build_tree(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            root = Project.objects.create(name='root', created_by=self.user)
+            mid = Project.objects.create(name='mid', created_by=self.user, main_project=root)
+            leaf = Project.objects.create(name='leaf', created_by=self.user)
+            Connection.objects.create(from_project=mid, to_project=leaf, type='child', status='approved')
+            Connection.objects.create(from_project=root, to_project=leaf, type='child', status='approved')
+        return root, mid, leaf
+
+    def test_queries_and_counts_over_the_subtree(self):
+        root, mid, leaf = self.build_tree()
+        task = Task.objects.create(name='t', desc='d', to_project=leaf)
+        Task.objects.create(name='t2', desc='d', to_task=task, main_project=mid)
+        Need.objects.create(name='n', desc='d', to_project=root)
+        Problem.objects.create(name='p', desc='d', to_project=mid, to_task=task)
+        Problem.objects.create(name='p2', desc='d', to_project=leaf)
+        Membership.objects.create(user=self.user, project=leaf)
+        Membership.objects.create(user=self.user, project=mid)
+
+        counts = hierarchy.subtree_counts([root.pk, mid.pk, leaf.pk])
+        self.assertEqual(counts[root.pk], {'projects': 3, 'tasks': 2, 'needs': 1, 'problems': 2, 'members': 1})
+        self.assertEqual(counts[mid.pk], {'projects': 2, 'tasks': 2, 'needs': 0, 'problems': 2, 'members': 1})
+        self.assertEqual(counts[leaf.pk]['problems'], 2)
+        self.assertEqual(set(Project.objects.descendants_of(root)), {mid, leaf})
+        self.assertEqual(set(Project.objects.children_of(root)), {mid, leaf})
+        self.assertEqual(set(Project.objects.ancestors_of(leaf)), {mid, root})
+        self.assertEqual(list(Project.objects.roots()), [root])
+
+    def test_cycles_are_refused(self):
+        root, mid, leaf = self.build_tree()
+        self.assertTrue(hierarchy.would_create_cycle(leaf, root))
+        self.assertTrue(hierarchy.would_create_cycle(mid, mid))
+        self.assertFalse(hierarchy.would_create_cycle(root, leaf))
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.client.post(reverse('project:connect_existing_project', args=[leaf.pk]), {'project_id': root.pk})
+        self.assertFalse(Connection.objects.filter(from_project=leaf, to_project=root).exists())
+        self.assertMatchesRebuild()
+
+
+@override_settings(JOBS_RUN_INLINE=True)
+class ProjectStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.old, self.new = [Project.objects.create(name=name, created_by=self.user) for name in ('old', 'new')]
+            self.task = Task.objects.create(name='t', desc='d', to_project=self.old)
+            self.need = Need.objects.create(name='n', desc='d', to_project=self.old)
+            self.problem = Problem.objects.create(name='x', desc='d', to_task=self.task)
+        stats.refresh([self.new.pk])
+
+    def rows(self):
+        return {
+            row.project_id: (row.task_counts, row.need_counts, row.problem_counts)
+            for row in ProjectStats.objects.all()
+        }
+
+    def assertMatchesRefresh(self):
+        live = self.rows()
+        stats.refresh([self.old.pk, self.new.pk])
+        self.assertEqual(self.rows(), live)
+        return live
+
+    def test_moving_items_refreshes_both_projects(self):
+        self.assertEqual(self.assertMatchesRefresh()[self.old.pk], ({'todo': 1}, {'pending': 1}, {'open': 1}))
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.get(pk=self.task.pk)
+            task.to_project = self.new
+            task.save()
+            need = Need.objects.get(pk=self.need.pk)
+            need.to_project = self.new
+            need.save()
+        rows = self.assertMatchesRefresh()
+        self.assertEqual(rows[self.old.pk], ({}, {}, {}))
+        self.assertEqual(rows[self.new.pk], ({'todo': 1}, {'pending': 1}, {'open': 1}))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            problem = Problem.objects.get(pk=self.problem.pk)
+            problem.to_task = None
+            problem.to_project = self.old
+            problem.save()
+        self.assertEqual(self.assertMatchesRefresh()[self.new.pk][2], {})
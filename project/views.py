@@ -5,9 +5,9 @@ from django.shortcuts import render
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required,  user_passes_test
 from django.db import models
-from project.models import Project, Connection, Membership, ProjectPermissionGroup, Localization
+from project.models import Project, Connection, Membership, ProjectPermissionGroup, Localization, ProjectStats
 from comment.models import (
-    Comment, CommentReport, CommentStatus, ModerationAction, 
+    Comment, CommentReport, CommentReportGroup, CommentStatus, ModerationAction, 
     ModerationDecision, DecisionScope, ReportType, ReportStatus
 )
 from plans.models import Plan, PlanSuggestion, PlanSuggestionStatus
@@ -25,6 +25,10 @@ import json
 from problems.models import Problem 
 from skills.models import Skill
 from intros.models import Intro
+from utils.permissions import get_project_perms
+from search.index import search
+from feed.recommend import recommended
+from project import hierarchy, stats as stats_rollup
 from django.contrib.auth import get_user_model
 User = get_user_model()
 import logging
@@ -39,28 +43,13 @@ def index(request):
     """
     Display a list of the latest projects.
     """
-    # Filter projects based on visibility
-    if request.user.is_authenticated:
-        # For logged-in users, show public projects and projects visible to logged-in users
-        # FIXED: Only exclude projects that are APPROVED children (not pending/rejected)
-        latest_projects_list = Project.objects.exclude(
-            incoming_connections__type='child',
-            incoming_connections__status='approved'  # Only exclude approved child connections
-        ).filter(
-                    models.Q(visibility='public') | 
-                    models.Q(visibility='logged_in') |
-                    models.Q(membership__user=request.user) |
-                    models.Q(created_by=request.user)
-                ).distinct().order_by('-id')
-    else:
-        # For anonymous users, only show public projects
-        # FIXED: Only exclude projects that are APPROVED children (not pending/rejected)
-        latest_projects_list = Project.objects.exclude(
-            incoming_connections__type='child',
-            incoming_connections__status='approved'  # Only exclude approved child connections
-        ).filter(visibility='public').order_by('-id')
+    # Top-level projects the user can see; subprojects are reached from their parents
+    latest_projects_list = Project.objects.visible_to(request.user).roots().order_by('-id')
 
-    context = {"latest_projects_list": latest_projects_list,}
+    context = {
+        "latest_projects_list": latest_projects_list,
+        "recommended": recommended(request.user, limit=6),
+    }
     return render(request, "index.html", context=context)
 @login_required
 def create_project(request):
@@ -240,7 +229,7 @@ def project(request, project_id):
         can_view = True
     elif content.visibility == 'restricted' and request.user.is_authenticated:
         # Check if user is a member or the creator
-        if request.user == content.created_by or Membership.objects.filter(project=content, user=request.user).exists():
+        if request.user == content.created_by or request.project_perms.is_member(content):
             can_view = True
     elif content.visibility == 'private' and request.user.is_authenticated:
         # Only the creator can view
@@ -274,32 +263,17 @@ def project(request, project_id):
     comments = Comment.objects.filter(comment_filter).select_related(
         'user', 
         'user__profile'  # Load comment author profiles
-    ).prefetch_related(
-        Prefetch(
-            'replies', 
-            queryset=Comment.objects.filter(
-                # Also filter replies based on user permissions
-                Q(status=CommentStatus.APPROVED) if not can_moderate_project(request.user, content) else Q()
-            ).select_related('user', 'user__profile')
-        ),
-        'votes'
+    ).with_user_vote(request.user).with_changelog().with_reply_tree(
+        # Load the whole reply tree in one query, filtered by user permissions
+        Comment.objects.filter(
+            Q(status=CommentStatus.APPROVED) if not can_moderate_project(request.user, content) else Q()
+        ).select_related('user', 'user__profile').with_user_vote(request.user).with_changelog()
     )
 
-    # Get all child projects
-    child_connections = Connection.objects.filter(
-        from_project=content, 
-        type='child', 
-        status='approved'
-    ).select_related('to_project')
-    child_projects = [connection.to_project for connection in child_connections]
-    
-    # Get parent projects
-    parent_connections = Connection.objects.filter(
-        to_project=content, 
-        type='child', 
-        status='approved'
-    ).select_related('from_project')
-    parent_projects = [connection.from_project for connection in parent_connections]
+    # Direct children and parents, and counts rolled up over the whole subtree
+    child_projects = list(Project.objects.children_of(content).order_by('name'))
+    parent_projects = list(Project.objects.parents_of(content).order_by('name'))
+    subtree_counts = hierarchy.subtree_counts([content.pk])[content.pk]
     
     # Get project members with profiles for avatars
     memberships = Membership.objects.filter(project=content).select_related(
@@ -312,7 +286,6 @@ def project(request, project_id):
     moderator_users = []
     contributor_users = []
     member_users = []
-    total_members = memberships.count()
     for membership in memberships:
             user = membership.user
             # Add membership data to the user object
@@ -334,24 +307,23 @@ def project(request, project_id):
     can_moderate = can_moderate_project(request.user, content)
     
     if request.user.is_authenticated:
-        is_member = Membership.objects.filter(project=content, user=request.user).exists()
+        is_member = request.project_perms.is_member(content)
         
         # Check if user can manage members
         if request.user == content.created_by:
             can_manage_members = True
         else:
-            user_membership = Membership.objects.filter(project=content, user=request.user).first()
+            user_membership = request.project_perms.membership(content)
             if user_membership and (user_membership.is_administrator or user_membership.is_moderator):
                 can_manage_members = True
 
+    # Headline numbers come from the ProjectStats rollup row
+    project_stats = ProjectStats.for_project(content)
+
     # NEW: Get count of pending connection requests for notification
     pending_connection_requests_count = 0
     if can_moderate:
-        pending_connection_requests_count = Connection.objects.filter(
-            to_project=content,
-            type='child',
-            status='pending'
-        ).count()
+        pending_connection_requests_count = project_stats.pending_connections
     project_ct = ContentType.objects.get_for_model(Project)
     task_ct = ContentType.objects.get_for_model(Task)
     need_ct = ContentType.objects.get_for_model(Need)
@@ -361,40 +333,28 @@ def project(request, project_id):
     status=PlanSuggestionStatus.APPROVED
     ).select_related('plan', 'suggested_by', 'plan__created_by').prefetch_related('plan__steps')
     pending_plan_suggestions = []
-    problems = Problem.objects.filter(
-        Q(to_project=project_id) |
-        Q(to_task__to_project=project_id) |
-        Q(to_need__to_project=project_id)
-    ).select_related(
+    problems = Problem.objects.for_project(content).visible_to(request.user).select_related(
         'created_by', 'to_task', 'to_need'
     ).prefetch_related(
         'assigned_to', 'skills'
-    ).distinct()
-
-    # Filter problems based on user permissions and add edit permissions
-    filtered_problems = []
-    for problem in problems:
-        if problem.can_be_viewed_by(request.user):
-            # Add permission check as attribute for template use
-            problem.user_can_edit = problem.can_be_edited_by(request.user)
-            filtered_problems.append(problem)
-
-    # Sort by priority and creation date
-    filtered_problems.sort(key=lambda x: (-x.priority, -x.created_at.timestamp()))
+    ).order_by('-priority', '-created_at')
 
     # Limit to recent problems for the component (show all in dedicated page)
-    recent_problems = filtered_problems[:10]  # Show only 10 most recent/important
+    recent_problems = list(problems[:10])  # Show only 10 most recent/important
+    for problem in recent_problems:
+        # Add permission check as attribute for template use
+        problem.user_can_edit = problem.can_be_edited_by(request.user)
 
     # Check if user can contribute to this project
     can_contribute = request.user.is_authenticated and content.user_can_contribute(request.user)
-    if can_moderate:
+    if can_moderate and project_stats.pending_plan_suggestions:
         pending_plan_suggestions = PlanSuggestion.objects.filter(
             Q(content_type=project_ct, object_id=content.id) |
             Q(content_type=task_ct, object_id__in=content.task_set.values_list('id', flat=True)) |
             Q(content_type=need_ct, object_id__in=content.need_set.values_list('id', flat=True)),
             status=PlanSuggestionStatus.PENDING
         ).select_related('plan', 'suggested_by')[:5]  # Limit to 5 for the preview
-    total_members = memberships.count()
+    total_members = project_stats.members
     comment_stats = content.get_comment_statistics(request.user)
     
     total_comments = comment_stats['total_comments']
@@ -404,6 +364,8 @@ def project(request, project_id):
         "content": content,
         "child_projects": child_projects,
         "parent_projects": parent_projects,
+        "subtree_counts": subtree_counts,
+        "project_stats": project_stats,
         "comments": comments,
         "tasks": tasks,
         "needs": needs,
@@ -425,7 +387,7 @@ def project(request, project_id):
         "total_discussions": total_discussions,
         "pending_plan_suggestions": pending_plan_suggestions,
         "problems": recent_problems,  # For the component
-        "total_problems_count": len(filtered_problems),  # For display
+        "total_problems_count": problems.count(),  # For display
         "can_contribute": can_contribute,  # For template permissions
     }
     return render(request, "details.html", context=context)
@@ -840,7 +802,7 @@ def can_moderate_project(user, project):
     if user == project.created_by:
         return True
     
-    membership = Membership.objects.filter(project=project, user=user).first()
+    membership = get_project_perms(user).membership(project)
     if membership and (membership.is_administrator or membership.is_moderator):
         return True
     
@@ -855,33 +817,23 @@ def project_moderation_dashboard(request, project_id):
         messages.error(request, "You don't have permission to moderate this project.")
         return redirect('project:project', project_id=project.id)
     
-    # Get statistics
+    # Get statistics from the ProjectStats rollup row
+    project_stats = ProjectStats.for_project(project)
     stats = {
-        'total_comments': Comment.objects.filter(to_project=project).count(),
-        'pending_comments': Comment.objects.filter(to_project=project, status=CommentStatus.PENDING).count(),
-        'reported_comments': CommentReport.objects.filter(
-            comment__to_project=project, 
-            status__in=[ReportStatus.PENDING, ReportStatus.REVIEWED]
-        ).count(),
-        'total_tasks': Task.objects.filter(to_project=project).count(),
-        'total_needs': Need.objects.filter(to_project=project).count(),
-        'total_members': Membership.objects.filter(project=project).count(),
-        'total_locations': project.localizations.count(),
-        'total_subprojects': Connection.objects.filter(
-            from_project=project, type='child', status='approved'
-        ).count(),        
-        'total_plan_suggestions': PlanSuggestion.objects.filter(
-            Q(content_type=ContentType.objects.get_for_model(Project), object_id=project.id) |
-            Q(content_type=ContentType.objects.get_for_model(Task), object_id__in=project.task_set.values_list('id', flat=True)) |
-            Q(content_type=ContentType.objects.get_for_model(Need), object_id__in=project.need_set.values_list('id', flat=True))
-        ).count(),
-        'pending_plan_suggestions': PlanSuggestion.objects.filter(
-            Q(content_type=ContentType.objects.get_for_model(Project), object_id=project.id) |
-            Q(content_type=ContentType.objects.get_for_model(Task), object_id__in=project.task_set.values_list('id', flat=True)) |
-            Q(content_type=ContentType.objects.get_for_model(Need), object_id__in=project.need_set.values_list('id', flat=True)),
-            status=PlanSuggestionStatus.PENDING
-        ).count(),
-
+        'total_comments': project_stats.total_comments,
+        'pending_comments': project_stats.pending_comments,
+        'reported_comments': project_stats.open_reports,
+        'total_tasks': project_stats.total_tasks,
+        'total_needs': project_stats.total_needs,
+        'total_problems': project_stats.total_problems,
+        'open_problems': project_stats.open_problems,
+        'total_members': project_stats.members,
+        'total_locations': project_stats.locations,
+        'total_subprojects': project_stats.subprojects,
+        'pending_connections': project_stats.pending_connections,
+        'pending_submissions': project_stats.pending_submissions,
+        'total_plan_suggestions': project_stats.plan_suggestions,
+        'pending_plan_suggestions': project_stats.pending_plan_suggestions,
     }
     
     context = {
@@ -988,6 +940,8 @@ def moderate_comment_action(request, project_id, comment_id):
                 reviewed_by=request.user,
                 moderator_notes=f"Resolved via project moderation: {reason}"
             )
+            CommentReportGroup.refresh([comment.pk])
+            stats_rollup.schedule_refresh([comment.to_project_id], 'comments')
             
             messages.success(request, success_msg)
             
@@ -1258,6 +1212,10 @@ def connect_existing_project(request, project_id):
                 messages.error(request, "A connection to this project already exists.")
                 return redirect('project:connect_existing_project', project_id=parent_project.id)
             
+            if hierarchy.would_create_cycle(parent_project, target_project):
+                messages.error(request, "That project already contains this one, so it can't become its subproject.")
+                return redirect('project:connect_existing_project', project_id=parent_project.id)
+            
             # Create connection request
             connection = Connection.objects.create(
                 from_project=parent_project,
@@ -1311,6 +1269,10 @@ def approve_connection(request, connection_id):
         messages.error(request, "You don't have permission to approve this connection.")
         return redirect('project:project', project_id=connection.to_project.id)
     
+    if hierarchy.would_create_cycle(connection.from_project, connection.to_project):
+        messages.error(request, "This connection would make a project a subproject of itself.")
+        return redirect('project:subprojects_management', project_id=connection.to_project.id)
+    
     connection.status = 'approved'
     connection.moderated_by = request.user
     connection.moderated_date = timezone.now()
@@ -1349,20 +1311,12 @@ def api_search_projects(request):
         return JsonResponse({'results': []})
     
     # Search for projects the user can view
-    if request.user.is_authenticated:
-        projects = Project.objects.filter(
-            models.Q(name__icontains=query) | models.Q(summary__icontains=query)
-        ).filter(
-            models.Q(visibility='public') | 
-            models.Q(visibility='logged_in') |
-            models.Q(membership__user=request.user) |
-            models.Q(created_by=request.user)
-        ).distinct().select_related('created_by')[:10]
-    else:
-        projects = Project.objects.filter(
-            models.Q(name__icontains=query) | models.Q(summary__icontains=query),
-            visibility='public'
-        ).select_related('created_by')[:10]
+    member_projects = Membership.objects.filter(user=request.user).values('project_id')
+    projects = search(Project.objects.all(), query).filter(
+        models.Q(visibility__in=['public', 'logged_in']) |
+        models.Q(pk__in=member_projects) |
+        models.Q(created_by=request.user)
+    ).select_related('created_by').order_by('search_rank')[:10]
     
     results = []
     for project in projects:
@@ -0,0 +1,348 @@
+"""
+In-memory autocomplete for skills and usernames.
+
+Each process keeps a PrefixIndex per kind: a sorted list of lower-cased
+terms for prefix lookups (bisect) and a map of 2- and 3-grams for
+substring lookups, plus a popularity score (SkillStats.task_count for
+skills). Lookups never touch the database.
+
+Indexes are loaded on first use and reloaded after AUTOCOMPLETE_INDEX_TTL
+seconds, which bounds how stale a process gets when another process made
+the change. Changes made in this process are applied by signals once their
+transaction commits.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from skills.models import Skill, SkillStats
+from task.models import Task
+
+
+User = get_user_model()
+
+
+def _grams(text):
+    grams = set()
+    for size in (2, 3):
+        grams.update(text[i:i + size] for i in range(len(text) - size + 1))
+    return grams
+
+
+class PrefixIndex:
+    """
+    Prefix and substring lookup over a few short terms per entry.
+
+    Entries are (id, label, terms, popularity, data); search() returns the
+    data dicts of matching entries, prefix matches first, each group by
+    popularity then label.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._terms = []
+        self._grams = defaultdict(set)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, entry_id, label, terms, popularity=0, data=None):
+        with self._lock:
+            self._remove(entry_id)
+            terms = {term.lower() for term in terms if term}
+            self._entries[entry_id] = (label, terms, popularity, data or {})
+            for term in terms:
+                insort(self._terms, (term, entry_id))
+                for gram in _grams(term):
+                    self._grams[gram].add(entry_id)
+
+    def extend(self, entries):
+        """Bulk add (id, label, terms, popularity, data) tuples to an empty index"""
+        with self._lock:
+            for entry_id, label, terms, popularity, data in entries:
+                terms = {term.lower() for term in terms if term}
+                self._entries[entry_id] = (label, terms, popularity, data)
+                for term in terms:
+                    self._terms.append((term, entry_id))
+                    for gram in _grams(term):
+                        self._grams[gram].add(entry_id)
+            self._terms.sort()
+
+    def remove(self, entry_id):
+        with self._lock:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for term in entry[1]:
+            position = bisect_left(self._terms, (term, entry_id))
+            if position < len(self._terms) and self._terms[position] == (term, entry_id):
+                del self._terms[position]
+            for gram in _grams(term):
+                self._grams[gram].discard(entry_id)
+                if not self._grams[gram]:
+                    del self._grams[gram]
+
+    def set_popularity(self, entry_id, popularity):
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is not None:
+                self._entries[entry_id] = (entry[0], entry[1], popularity, entry[3])
+
+    def get(self, entry_id):
+        entry = self._entries.get(entry_id)
+        return entry[3] if entry else None
+
+    def _sort_key(self, entry_id):
+        label, _, popularity, _ = self._entries[entry_id]
+        return (-popularity, label.lower())
+
+    def search(self, query, limit=20, ids=None):
+        """Entries with a term starting with or containing query"""
+        query = query.strip().lower()
+        if not query:
+            return []
+        with self._lock:
+            prefixed = set()
+            position = bisect_left(self._terms, (query,))
+            while position < len(self._terms) and self._terms[position][0].startswith(query):
+                prefixed.add(self._terms[position][1])
+                position += 1
+
+            if len(query) < 2:
+                contained = set()
+            else:
+                grams = _grams(query[:3]) if len(query) < 3 else {
+                    query[i:i + 3] for i in range(len(query) - 2)
+                }
+                candidate_sets = sorted((self._grams.get(gram, set()) for gram in grams), key=len)
+                contained = set(candidate_sets[0]).intersection(*candidate_sets[1:])
+                contained = {
+                    entry_id for entry_id in contained - prefixed
+                    if any(query in term for term in self._entries[entry_id][1])
+                }
+
+            if ids is not None:
+                prefixed &= ids
+                contained &= ids
+            ranked = (
+                sorted(prefixed, key=self._sort_key) +
+                sorted(contained, key=self._sort_key)
+            )
+            return [self._entries[entry_id][3] for entry_id in ranked[:limit]]
+
+    def top(self, limit=None, by_popularity=True):
+        """Every entry (or the first limit) by popularity, or alphabetically"""
+        with self._lock:
+            key = self._sort_key if by_popularity else (lambda entry_id: self._entries[entry_id][0].lower())
+            ranked = sorted(self._entries, key=key)
+            if limit is not None:
+                ranked = ranked[:limit]
+            return [self._entries[entry_id][3] for entry_id in ranked]
+
+
+def _ttl():
+    return getattr(settings, 'AUTOCOMPLETE_INDEX_TTL', 300)
+
+
+class LazyIndex:
+    """Builds its PrefixIndex on first use and again once the TTL expires"""
+
+    def __init__(self, loader):
+        self.loader = loader
+        self._index = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._index is None or time.monotonic() - self._loaded_at > _ttl():
+            with self._lock:
+                if self._index is None or time.monotonic() - self._loaded_at > _ttl():
+                    index = PrefixIndex()
+                    self.loader(index)
+                    self._index = index
+                    self._loaded_at = time.monotonic()
+        return self._index
+
+    def loaded(self):
+        """The index if it is in memory, without loading it"""
+        return self._index
+
+    def reset(self):
+        self._index = None
+
+
+def _skill_data(skill_id, name, task_count):
+    return {'id': skill_id, 'name': name, 'task_count': task_count}
+
+
+def load_skills(index):
+    index.extend(
+        (skill_id, name, [name], task_count, _skill_data(skill_id, name, task_count))
+        for skill_id, name, task_count in Skill.objects.annotate(
+            task_count=Coalesce('stats__task_count', 0)
+        ).values_list('id', 'name', 'task_count').order_by()
+    )
+
+
+def _user_terms(username, first_name, last_name):
+    full_name = f'{first_name} {last_name}'.strip()
+    return [username, first_name, last_name, full_name]
+
+
+def _user_data(user_id, username, first_name, last_name):
+    return {
+        'id': user_id,
+        'username': username,
+        'full_name': f'{first_name} {last_name}'.strip() or username,
+    }
+
+
+def load_users(index):
+    index.extend(
+        (
+            user_id, username, _user_terms(username, first_name, last_name), 0,
+            _user_data(user_id, username, first_name, last_name),
+        )
+        for user_id, username, first_name, last_name in User.objects.values_list(
+            'id', 'username', 'first_name', 'last_name'
+        ).order_by()
+    )
+
+
+skill_index = LazyIndex(load_skills)
+user_index = LazyIndex(load_users)
+
+
+def search_skills(query, limit=20):
+    """Skill dicts (id, name, task_count) matching query, most used first"""
+    return skill_index.get().search(query, limit)
+
+
+def popular_skills(limit=None):
+    return skill_index.get().top(limit)
+
+
+def all_skills():
+    """Every skill dict, alphabetically"""
+    return skill_index.get().top(by_popularity=False)
+
+
+def search_users(query, limit=10, user_ids=None):
+    """User dicts (id, username, full_name) matching query, optionally within user_ids"""
+    return user_index.get().search(
+        query, limit, ids=set(user_ids) if user_ids is not None else None
+    )
+
+
+# Signals
+
+def _refresh_task_counts(skill_ids):
+    index = skill_index.loaded()
+    if index is None or not skill_ids:
+        return
+    counts = dict(
+        SkillStats.objects.filter(skill_id__in=skill_ids).values_list('skill_id', 'task_count')
+    )
+    for skill_id, task_count in counts.items():
+        data = index.get(skill_id)
+        if data is not None:
+            data['task_count'] = task_count
+            index.set_popularity(skill_id, task_count)
+
+
+@receiver(post_save, sender=Skill)
+def index_skill(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    skill_id, name = instance.pk, instance.name
+
+    def apply():
+        index = skill_index.loaded()
+        if index is not None:
+            data = index.get(skill_id)
+            task_count = data['task_count'] if data else 0
+            index.add(skill_id, name, [name], task_count, _skill_data(skill_id, name, task_count))
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=Skill)
+def unindex_skill(sender, instance, **kwargs):
+    skill_id = instance.pk
+
+    def apply():
+        index = skill_index.loaded()
+        if index is not None:
+            index.remove(skill_id)
+    transaction.on_commit(apply)
+
+
+@receiver(m2m_changed, sender=Task.skills.through)
+def count_task_skills(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        instance._cleared_skill_ids = (
+            {instance.pk} if reverse else set(instance.skills.values_list('pk', flat=True))
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear':
+        skill_ids = getattr(instance, '_cleared_skill_ids', set())
+    else:
+        skill_ids = {instance.pk} if reverse else set(pk_set or ())
+    transaction.on_commit(lambda: _refresh_task_counts(skill_ids))
+
+
+@receiver(pre_delete, sender=Task)
+def remember_task_skills(sender, instance, **kwargs):
+    instance._deleted_skill_ids = set(instance.skills.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Task)
+def count_deleted_task_skills(sender, instance, **kwargs):
+    skill_ids = getattr(instance, '_deleted_skill_ids', set())
+    transaction.on_commit(lambda: _refresh_task_counts(skill_ids))
+
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not {
+        'username', 'first_name', 'last_name'
+    }.intersection(update_fields):
+        return
+    user_id, username = instance.pk, instance.username
+    first_name, last_name = instance.first_name, instance.last_name
+
+    def apply():
+        index = user_index.loaded()
+        if index is None:
+            return
+        index.add(
+            user_id, username, _user_terms(username, first_name, last_name), 0,
+            _user_data(user_id, username, first_name, last_name),
+        )
+    transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=User)
+def unindex_user(sender, instance, **kwargs):
+    user_id = instance.pk
+
+    def apply():
+        index = user_index.loaded()
+        if index is not None:
+            index.remove(user_id)
+    transaction.on_commit(apply)
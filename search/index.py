@@ -0,0 +1,502 @@
+"""
+Full-text search on SQLite FTS5.
+
+Each registered SearchIndex owns one FTS5 virtual table whose rowid is the
+primary key of the indexed model. A column of the virtual table is filled
+from one or more ORM paths (`skills__name`, `created_by__username`, ...),
+so the same description drives the indexing, the signal wiring and the
+icontains fallback used on databases without FTS5.
+
+Next to the text, every indexed object gets SearchFacet rows (its type,
+status, project, skills) so facet counts of a result set come from one
+grouped query instead of a COUNT per model.
+
+Rows are kept in sync by signals: saves and deletes of the model, m2m
+changes on indexed relations and saves of objects anywhere along an indexed
+path (a renamed skill or user, a task moved to another project) all
+re-index the affected rows inside the same transaction.
+"""
+import re
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import connection
+from django.db.models import CharField, Count, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from search.models import SearchFacet
+
+
+# Markers used by snippet(); swapped for <mark> after escaping the text
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_fts5_available = None
+
+
+def fts5_available():
+    """Whether the default database can run FTS5 queries"""
+    global _fts5_available
+    if connection.vendor != 'sqlite':
+        return False
+    if _fts5_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            options = {row[0] for row in cursor.fetchall()}
+        _fts5_available = 'ENABLE_FTS5' in options
+    return _fts5_available
+
+
+def build_match_query(query):
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term and terms are AND-ed, so
+    `djan rest` matches documents containing words starting with both.
+    Returns '' when the text has no searchable words.
+    """
+    tokens = TOKEN_RE.findall(query.lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def highlight(snippet):
+    """Escape a snippet and wrap the matched terms in <mark>"""
+    if not snippet:
+        return ''
+    return mark_safe(
+        escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_END, '</mark>')
+    )
+
+
+class SearchIndex:
+    """
+    FTS5 table and facet rows for one model.
+
+    columns maps each FTS column to the ORM paths whose values are joined
+    into it; weights gives the bm25 weight of each column (default 1).
+    facets maps a facet name to the ORM path of its value, or to several
+    paths whose values are all collected. visibility names
+    the manager method returning what a user may see; indexes without one
+    are left out of search_all(). detail_url is the URL name of an object's
+    page, reversed with its pk.
+    """
+
+    def __init__(self, name, model, columns, weights=None, snippet_column=None,
+                 facets=None, visibility=None, detail_url=None):
+        self.name = name
+        self.model_label = model
+        self.columns = {column: tuple(paths) for column, paths in columns.items()}
+        self.weights = weights or {}
+        self.snippet_column = snippet_column
+        self.facets = {
+            facet: (paths,) if isinstance(paths, str) else tuple(paths)
+            for facet, paths in (facets or {}).items()
+        }
+        self.visibility = visibility
+        self.detail_url = detail_url
+        self.table = f'search_{name}'
+
+    def __repr__(self):
+        return f'<SearchIndex {self.name}>'
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def text_paths(self):
+        return [path for paths in self.columns.values() for path in paths]
+
+    @property
+    def paths(self):
+        facet_paths = [path for paths in self.facets.values() for path in paths]
+        return list(dict.fromkeys([*self.text_paths, *facet_paths]))
+
+    def _uses_relations(self, model):
+        return any(
+            model._meta.get_field(path.split('__')[0]).many_to_many
+            for path in self.text_paths
+        )
+
+    def visible_to(self, user):
+        return getattr(self.model._default_manager, self.visibility)(user)
+
+    def get_url(self, pk):
+        return reverse(self.detail_url, args=[pk]) if self.detail_url else None
+
+    # Schema
+
+    def create_table(self, schema_editor):
+        columns = ', '.join(self.columns)
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS "{self.table}" USING fts5('
+            f"{columns}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+
+    def drop_table(self, schema_editor):
+        schema_editor.execute(f'DROP TABLE IF EXISTS "{self.table}"')
+
+    # Indexing
+
+    def collect(self, pks=None, model=None):
+        """
+        Build ({pk: [column values]}, {pk: {(facet, value)}}) for the given
+        primary keys (all rows when pks is None) with one query.
+        """
+        model = model or self.model
+        queryset = model._default_manager.all()
+        if pks is not None:
+            queryset = queryset.filter(pk__in=pks)
+
+        texts = defaultdict(lambda: defaultdict(list))
+        facets = defaultdict(set)
+        for row in queryset.values('pk', *self.paths).order_by():
+            pk = row['pk']
+            document = texts[pk]
+            for column, paths in self.columns.items():
+                for path in paths:
+                    value = row[path]
+                    if value not in (None, '') and str(value) not in document[column]:
+                        document[column].append(str(value))
+            facets[pk].add(('type', self.name))
+            for facet, paths in self.facets.items():
+                for path in paths:
+                    if row[path] not in (None, ''):
+                        facets[pk].add((facet, str(row[path])))
+
+        documents = {
+            pk: [' '.join(document[column]) for column in self.columns]
+            for pk, document in texts.items()
+        }
+        return documents, facets
+
+    def _write(self, cursor, documents):
+        placeholders = ', '.join(['%s'] * (len(self.columns) + 1))
+        cursor.executemany(
+            f'INSERT INTO "{self.table}" (rowid, {", ".join(self.columns)}) '
+            f'VALUES ({placeholders})',
+            [[pk, *values] for pk, values in documents.items()],
+        )
+
+    def _delete(self, cursor, pks):
+        cursor.execute(
+            f'DELETE FROM "{self.table}" WHERE rowid IN ({", ".join(["%s"] * len(pks))})',
+            pks,
+        )
+
+    def _write_facets(self, facets, pks=None, facet_model=SearchFacet):
+        existing = facet_model.objects.filter(index=self.name)
+        if pks is not None:
+            existing = existing.filter(object_id__in=pks)
+        existing.delete()
+        facet_model.objects.bulk_create([
+            facet_model(index=self.name, object_id=pk, facet=facet, value=value[:100])
+            for pk, values in facets.items()
+            for facet, value in values
+        ], batch_size=500)
+
+    def update(self, pks):
+        """Re-index the given rows, dropping ones that no longer exist"""
+        pks = list(pks)
+        if not pks:
+            return
+        documents, facets = self.collect(pks)
+        if fts5_available():
+            with connection.cursor() as cursor:
+                self._delete(cursor, pks)
+                self._write(cursor, documents)
+        self._write_facets(facets, pks)
+
+    def delete(self, pks):
+        pks = list(pks)
+        if not pks:
+            return
+        if fts5_available():
+            with connection.cursor() as cursor:
+                self._delete(cursor, pks)
+        SearchFacet.objects.filter(index=self.name, object_id__in=pks).delete()
+
+    def rebuild(self, model=None, facet_model=SearchFacet):
+        """Re-create every row of the index; returns the number indexed"""
+        documents, facets = self.collect(model=model)
+        if fts5_available():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM "{self.table}"')
+                self._write(cursor, documents)
+                cursor.execute(f'INSERT INTO "{self.table}" ("{self.table}") VALUES (\'optimize\')')
+        self._write_facets(facets, facet_model=facet_model)
+        return len(documents)
+
+    # Querying
+
+    def _rank_sql(self):
+        weights = ', '.join(str(float(self.weights.get(column, 1))) for column in self.columns)
+        return f'bm25("{self.table}", {weights})'
+
+    def _snippet_sql(self, tokens=12):
+        column = (
+            list(self.columns).index(self.snippet_column)
+            if self.snippet_column else -1
+        )
+        return (
+            f'snippet("{self.table}", {column}, '
+            f"'{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '…', {tokens})"
+        )
+
+    def filter(self, queryset, query):
+        """
+        Restrict queryset to rows matching query without annotating them.
+
+        The condition is a plain `pk IN (SELECT rowid ...)`, so the result is
+        safe to nest in other querysets.
+        """
+        match = build_match_query(query)
+        if not match:
+            return queryset
+        if not fts5_available():
+            condition = Q()
+            for path in self.text_paths:
+                condition |= Q(**{f'{path}__icontains': query.strip()})
+            queryset = queryset.filter(condition)
+            if self._uses_relations(queryset.model):
+                queryset = queryset.distinct()
+            return queryset
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM "{self.table}" WHERE "{self.table}" MATCH %s', [match]
+        ))
+
+    def search(self, queryset, query):
+        """
+        Restrict queryset to rows matching query.
+
+        The rows gain `search_rank` (bm25, lower is better) and
+        `search_snippet` (pass it through highlight() for display); order
+        by `search_rank` for relevance. Without FTS5 the filter degrades to
+        icontains with a constant rank and no snippet; a query without any
+        words leaves the rows unfiltered, with the same constant columns.
+        """
+        match = build_match_query(query)
+        if not match or not fts5_available():
+            queryset = self.filter(queryset, query)
+            return queryset.annotate(
+                search_rank=Value(0.0, output_field=FloatField()),
+                search_snippet=Value('', output_field=CharField()),
+            )
+        queryset = self.filter(queryset, query)
+
+        row = (
+            f'FROM "{self.table}" WHERE "{self.table}" MATCH %s AND "{self.table}".rowid = '
+            f'{connection.ops.quote_name(queryset.model._meta.db_table)}.'
+            f'{connection.ops.quote_name(queryset.model._meta.pk.column)}'
+        )
+        return queryset.extra(
+            select={
+                'search_rank': f'SELECT {self._rank_sql()} {row}',
+                'search_snippet': f'SELECT {self._snippet_sql()} {row}',
+            },
+            select_params=[match, match],
+        )
+
+    def hits_sql(self, visible):
+        """
+        SELECT of (type, pk, title, rank, snippet) over the rows of the
+        visible queryset; takes the MATCH expression as first parameter.
+        """
+        visible_sql, visible_params = visible.values('pk').order_by().query.sql_with_params()
+        title = next(iter(self.columns))
+        return (
+            f"SELECT '{self.name}' AS type, rowid AS pk, \"{title}\" AS title, "
+            f'{self._rank_sql()} AS rank, {self._snippet_sql()} AS snippet '
+            f'FROM "{self.table}" WHERE "{self.table}" MATCH %s AND rowid IN ({visible_sql})'
+        ), list(visible_params)
+
+    # Signals
+
+    def connect(self):
+        model = self.model
+        post_save.connect(self._on_save, sender=model, weak=False)
+        post_delete.connect(self._on_delete, sender=model, weak=False)
+
+        # (related model, lookup from this model, reverse relation) -> fields read from it
+        related = defaultdict(set)
+        for path in self.paths:
+            parts = path.split('__')
+            current = model
+            for depth, name in enumerate(parts[:-1]):
+                field = current._meta.get_field(name)
+                if field.many_to_many and depth == 0:
+                    m2m_changed.connect(
+                        self._on_m2m_changed, sender=field.remote_field.through, weak=False
+                    )
+                current = field.related_model
+                relation = '__'.join(parts[:depth + 1])
+                related[(current, relation, field.one_to_many)].add(
+                    current._meta.get_field(parts[depth + 1]).name
+                )
+
+        for (related_model, relation, reverse), field_names in related.items():
+            post_save.connect(
+                self._related_receiver(relation, field_names, reverse),
+                sender=related_model,
+                weak=False,
+            )
+            if reverse and '__' not in relation:
+                post_delete.connect(
+                    self._reverse_delete_receiver(relation),
+                    sender=related_model,
+                    weak=False,
+                )
+
+    def _on_save(self, sender, instance, raw=False, **kwargs):
+        if not raw:
+            self.update([instance.pk])
+
+    def _on_delete(self, sender, instance, **kwargs):
+        self.delete([instance.pk])
+
+    def _on_m2m_changed(self, sender, instance, action, reverse, pk_set, **kwargs):
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        if not reverse:
+            self.update([instance.pk])
+        elif pk_set:
+            self.update(pk_set)
+
+    def _related_receiver(self, relation, field_names, reverse):
+        def reindex_related(sender, instance, created, raw=False, update_fields=None, **kwargs):
+            # A new object can only be referenced already through a reverse relation
+            if raw or (created and not reverse):
+                return
+            if update_fields is not None and not field_names.intersection(update_fields):
+                return
+            pks = self.model._default_manager.filter(
+                **{relation: instance}
+            ).values_list('pk', flat=True)
+            self.update(pks)
+        return reindex_related
+
+    def _reverse_delete_receiver(self, relation):
+        attname = self.model._meta.get_field(relation).field.attname
+
+        def reindex_owner(sender, instance, **kwargs):
+            self.update([getattr(instance, attname)])
+        return reindex_owner
+
+
+class SearchRegistry:
+    def __init__(self):
+        self._indexes = {}
+
+    def register(self, index):
+        self._indexes[index.name] = index
+        return index
+
+    def __getitem__(self, name):
+        return self._indexes[name]
+
+    def __iter__(self):
+        return iter(self._indexes.values())
+
+    def get_for_model(self, model):
+        for index in self:
+            if index.model_label == model._meta.label:
+                return index
+        raise KeyError(model._meta.label)
+
+
+registry = SearchRegistry()
+
+
+def search(queryset, query):
+    """Full-text filter a queryset of any indexed model"""
+    return registry.get_for_model(queryset.model).search(queryset, query)
+
+
+def search_all(query, user, types=None, filters=None, offset=0, limit=20):
+    """
+    Ranked hits across every index with a visibility rule, plus facet counts.
+
+    Each index contributes the rows of `visible_to(user)` that match the
+    query and carry every requested facet value (filters maps a facet name
+    to accepted values). Hits for the page come from a single UNION ALL
+    ordered by bm25; the facet counts for the whole result set come from one
+    GROUP BY over SearchFacet.
+
+    Returns {'results': [...], 'total': int, 'facets': {facet: {value: count}}}.
+    """
+    match = build_match_query(query)
+    indexes = [
+        index for index in registry
+        if index.visibility and (not types or index.name in types)
+    ]
+    if not match or not indexes:
+        return {'results': [], 'total': 0, 'facets': {}}
+
+    visible = {}
+    for index in indexes:
+        queryset = index.visible_to(user)
+        for facet, values in (filters or {}).items():
+            if values:
+                queryset = queryset.filter(pk__in=SearchFacet.objects.filter(
+                    index=index.name, facet=facet, value__in=values,
+                ).values('object_id'))
+        visible[index.name] = queryset
+
+    matched = Q()
+    for index in indexes:
+        matched |= Q(
+            index=index.name,
+            object_id__in=index.filter(visible[index.name], query).values('pk'),
+        )
+    facets = defaultdict(dict)
+    for row in (
+        SearchFacet.objects.filter(matched)
+        .values('facet', 'value').annotate(count=Count('pk')).order_by()
+    ):
+        facets[row['facet']][row['value']] = row['count']
+    total = sum(facets.get('type', {}).values())
+
+    if fts5_available():
+        selects, params = [], []
+        for index in indexes:
+            sql, visible_params = index.hits_sql(visible[index.name])
+            selects.append(sql)
+            params += [match, *visible_params]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT type, pk, title, rank, snippet FROM ({" UNION ALL ".join(selects)}) '
+                f'ORDER BY rank, type, pk LIMIT %s OFFSET %s',
+                params + [limit, offset],
+            )
+            rows = cursor.fetchall()
+    else:
+        rows = []
+        for index in indexes:
+            title = index.columns[next(iter(index.columns))][0]
+            rows += [
+                (index.name, pk, name, 0, '')
+                for pk, name in index.filter(visible[index.name], query)
+                .order_by('-pk').values_list('pk', title)
+            ]
+        rows = rows[offset:offset + limit]
+
+    results = [
+        {
+            'type': type_,
+            'id': pk,
+            'title': title,
+            'snippet': highlight(snippet),
+            'url': registry[type_].get_url(pk),
+            'rank': rank,
+        }
+        for type_, pk, title, rank, snippet in rows
+    ]
+    return {'results': results, 'total': total, 'facets': dict(facets)}
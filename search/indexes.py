@@ -0,0 +1,96 @@
+"""
+Indexed models. Each entry names the FTS5 table (search_<name>), the ORM
+paths feeding its columns, the bm25 weight of each column and the facets
+counted by the unified search. Submissions have no visibility rule here, so
+they are only searched from their own list.
+"""
+from problems.models import PROJECT_PATHS
+from search.index import SearchIndex, registry
+
+
+registry.register(SearchIndex(
+    'project', 'project.Project',
+    columns={
+        'name': ['name'],
+        'summary': ['summary'],
+        'desc': ['desc'],
+        'tags': ['tags', 'skills__name'],
+    },
+    weights={'name': 10, 'summary': 4, 'tags': 3},
+    facets={'status': 'status', 'project': 'id', 'skill': 'skills__id'},
+    visibility='visible_to',
+    detail_url='project:project',
+))
+
+registry.register(SearchIndex(
+    'task', 'task.Task',
+    columns={
+        'name': ['name'],
+        'desc': ['desc'],
+        'skills': ['skills__name'],
+        'creator': ['created_by__username'],
+    },
+    weights={'name': 10, 'skills': 3, 'creator': 2},
+    facets={'status': 'status', 'project': 'to_project_id', 'skill': 'skills__id'},
+    visibility='visible_to',
+    detail_url='task:task_detail',
+))
+
+registry.register(SearchIndex(
+    'need', 'need.Need',
+    columns={
+        'name': ['name'],
+        'desc': ['desc'],
+        'skills': ['required_skills__name'],
+    },
+    weights={'name': 10, 'skills': 3},
+    facets={'status': 'status', 'project': 'to_project_id', 'skill': 'required_skills__id'},
+    visibility='visible_to',
+    detail_url='need:need',
+))
+
+registry.register(SearchIndex(
+    'problem', 'problems.Problem',
+    columns={
+        'name': ['name'],
+        'summary': ['summary'],
+        'desc': ['desc'],
+        'skills': ['skills__name'],
+    },
+    weights={'name': 10, 'summary': 4, 'skills': 3},
+    # Same attachments as Problem.objects.for_project
+    facets={
+        'status': 'status',
+        'project': [f'{path}_id' for path in PROJECT_PATHS],
+        'skill': 'skills__id',
+    },
+    visibility='visible_to',
+    detail_url='problems:detail',
+))
+
+registry.register(SearchIndex(
+    'intro', 'intros.Intro',
+    columns={
+        'name': ['name'],
+        'summary': ['summary'],
+        'desc': ['desc'],
+    },
+    weights={'name': 10, 'summary': 4},
+    facets={
+        'status': 'status',
+        'project': ['main_project_id', *(f'relations__{path}_id' for path in PROJECT_PATHS)],
+    },
+    visibility='visible_to_user',
+    detail_url='intros:detail',
+))
+
+registry.register(SearchIndex(
+    'submission', 'submissions.Submission',
+    columns={
+        'applicant': ['applicant__username', 'applicant__first_name', 'applicant__last_name'],
+        'why_fit': ['why_fit'],
+        'additional_info': ['additional_info'],
+    },
+    weights={'applicant': 5},
+    facets={'status': 'status'},
+))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from search.indexes import registry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search tables and search facets from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'indexes', nargs='*',
+            help='Index names to rebuild (default: all of them)',
+        )
+
+    def handle(self, *args, **options):
+        names = options['indexes'] or [index.name for index in registry]
+        for name in names:
+            try:
+                index = registry[name]
+            except KeyError:
+                raise CommandError(f'Unknown search index "{name}"')
+            with transaction.atomic():
+                count = index.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Successfully indexed {count} rows into {index.table}'))
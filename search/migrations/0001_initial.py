@@ -0,0 +1,97 @@
+from django.db import migrations
+
+
+def _skill_names(through, owner_column, owner_table):
+    return (
+        f'(SELECT group_concat("name", \' \') FROM (SELECT DISTINCT s."name" FROM "{through}" t '
+        f'JOIN "skills_skill" s ON s."id" = t."skill_id" WHERE t."{owner_column}" = "{owner_table}"."id"))'
+    )
+
+
+def _user_field(field, user_column, owner_table):
+    return f'(SELECT u."{field}" FROM "auth_user" u WHERE u."id" = "{owner_table}"."{user_column}")'
+
+
+def _joined(*expressions):
+    return 'trim(' + " || ' ' || ".join(f"COALESCE({expression}, '')" for expression in expressions) + ')'
+
+
+# The FTS5 tables as of this migration: table -> (indexed table, {column: SQL expression})
+INDEXES = {
+    'search_project': ('project_project', {
+        'name': '"name"',
+        'summary': '"summary"',
+        'desc': '"desc"',
+        'tags': _joined('"tags"', _skill_names('project_project_skills', 'project_id', 'project_project')),
+    }),
+    'search_task': ('task_task', {
+        'name': '"name"',
+        'desc': '"desc"',
+        'skills': _skill_names('task_task_skills', 'task_id', 'task_task'),
+        'creator': _user_field('username', 'created_by_id', 'task_task'),
+    }),
+    'search_need': ('need_need', {
+        'name': '"name"',
+        'desc': '"desc"',
+        'skills': _skill_names('need_need_required_skills', 'need_id', 'need_need'),
+    }),
+    'search_problem': ('problems_problem', {
+        'name': '"name"',
+        'summary': '"summary"',
+        'desc': '"desc"',
+        'skills': _skill_names('problems_problem_skills', 'problem_id', 'problems_problem'),
+    }),
+    'search_intro': ('intros_intro', {
+        'name': '"name"',
+        'summary': '"summary"',
+        'desc': '"desc"',
+    }),
+    'search_submission': ('submissions_submission', {
+        'applicant': _joined(*(
+            _user_field(field, 'applicant_id', 'submissions_submission')
+            for field in ('username', 'first_name', 'last_name')
+        )),
+        'why_fit': '"why_fit"',
+        'additional_info': '"additional_info"',
+    }),
+}
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, (source, columns) in INDEXES.items():
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS "{table}" USING fts5('
+            f"{', '.join(columns)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(f'DELETE FROM "{table}"')
+        names = ', '.join(f'"{column}"' for column in columns)
+        values = ', '.join(f"COALESCE({expression}, '')" for expression in columns.values())
+        schema_editor.execute(f'INSERT INTO "{table}" (rowid, {names}) SELECT "id", {values} FROM "{source}"')
+        schema_editor.execute(f'INSERT INTO "{table}" ("{table}") VALUES (\'optimize\')')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in INDEXES:
+        schema_editor.execute(f'DROP TABLE IF EXISTS "{table}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('skills', '0001_initial'),
+        ('project', '0005_alter_membership_is_member'),
+        ('task', '0003_alter_task_options_task_actual_hours_task_due_date_and_more'),
+        ('need', '0002_need_main_project'),
+        ('problems', '0001_initial'),
+        ('intros', '0003_introrelation_linkingissue_and_more'),
+        ('submissions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:02
+
+from django.db import migrations, models
+
+
+# The facets as of this migration: index -> (model, {facet: ORM path})
+FACETS = {
+    'project': ('project.Project', {'status': 'status', 'project': 'id', 'skill': 'skills__id'}),
+    'task': ('task.Task', {'status': 'status', 'project': 'to_project_id', 'skill': 'skills__id'}),
+    'need': ('need.Need', {'status': 'status', 'project': 'to_project_id', 'skill': 'required_skills__id'}),
+    'problem': ('problems.Problem', {'status': 'status', 'project': 'to_project_id', 'skill': 'skills__id'}),
+    'intro': ('intros.Intro', {'status': 'status', 'project': 'main_project_id'}),
+    'submission': ('submissions.Submission', {'status': 'status'}),
+}
+
+
+def fill_facets(apps, schema_editor):
+    SearchFacet = apps.get_model('search', 'SearchFacet')
+    for index, (model_label, facets) in FACETS.items():
+        model = apps.get_model(model_label)
+        rows = set()
+        for row in model.objects.values('pk', *dict.fromkeys(facets.values())).order_by():
+            rows.add((row['pk'], 'type', index))
+            for facet, path in facets.items():
+                if row[path] not in (None, ''):
+                    rows.add((row['pk'], facet, str(row[path])[:100]))
+        SearchFacet.objects.bulk_create([
+            SearchFacet(index=index, object_id=pk, facet=facet, value=value)
+            for pk, facet, value in rows
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.CharField(max_length=30)),
+                ('object_id', models.PositiveIntegerField()),
+                ('facet', models.CharField(max_length=30)),
+                ('value', models.CharField(max_length=100)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['index', 'object_id'], name='search_sear_index_aaae1a_idx'), models.Index(fields=['index', 'facet', 'value'], name='search_sear_index_418cc7_idx')],
+            },
+        ),
+        migrations.RunPython(fill_facets, migrations.RunPython.noop),
+    ]
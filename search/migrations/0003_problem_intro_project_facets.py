@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+# The project facet paths as of this migration: index -> (model, ORM paths)
+PROJECT_FACETS = {
+    'problem': ('problems.Problem', (
+        'to_project_id', 'to_task__to_project_id', 'to_need__to_project_id',
+    )),
+    'intro': ('intros.Intro', (
+        'main_project_id', 'relations__to_project_id',
+        'relations__to_task__to_project_id', 'relations__to_need__to_project_id',
+    )),
+}
+
+
+def fill_project_facets(apps, schema_editor):
+    SearchFacet = apps.get_model('search', 'SearchFacet')
+    for index, (model_label, paths) in PROJECT_FACETS.items():
+        model = apps.get_model(model_label)
+        rows = set()
+        for row in model.objects.values('pk', *paths).order_by():
+            for path in paths:
+                if row[path] is not None:
+                    rows.add((row['pk'], str(row[path])))
+        SearchFacet.objects.filter(index=index, facet='project').delete()
+        SearchFacet.objects.bulk_create([
+            SearchFacet(index=index, object_id=pk, facet='project', value=value)
+            for pk, value in rows
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_search_facet'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_project_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+from django.db import models
+
+
+class SearchFacet(models.Model):
+    """One facet value (type, status, project, skill) of an indexed object"""
+    index = models.CharField(max_length=30)
+    object_id = models.PositiveIntegerField()
+    facet = models.CharField(max_length=30)
+    value = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['index', 'object_id']),
+            models.Index(fields=['index', 'facet', 'value']),
+        ]
+
+    def __str__(self):
+        return f'{self.index}:{self.object_id} {self.facet}={self.value}'
@@ -0,0 +1,216 @@
+from django.contrib.auth.models import AnonymousUser, User
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from intros.models import Intro, IntroRelation
+from intros.views import IntroListView
+from need.models import Need
+from problems.models import Problem
+from project.models import Membership, Project
+from search.index import build_match_query, highlight, search, search_all
+from search.models import SearchFacet
+from skills.models import Skill
+from task.models import Task
+from task.views import can_view_task
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='x')
+        self.project = Project.objects.create(name='Solar Garden', summary='community energy', created_by=self.user)
+        self.website = Task.objects.create(
+            name='Build website', desc='Using django and htmx', created_by=self.user, to_project=self.project
+        )
+        self.fence = Task.objects.create(
+            name='Paint fence', desc='Outdoor work', created_by=self.user, to_project=self.project
+        )
+
+    def ids(self, queryset):
+        return sorted(queryset.values_list('pk', flat=True))
+
+    def test_match_query(self):
+        self.assertEqual(build_match_query('Djan, rest!'), '"djan"* "rest"*')
+        self.assertEqual(build_match_query('!!'), '')
+
+    def test_search_matches_prefixes(self):
+        self.assertEqual(self.ids(search(Task.objects.all(), 'djang')), [self.website.pk])
+        self.assertEqual(self.ids(search(Task.objects.all(), 'alice')), [self.website.pk, self.fence.pk])
+        self.assertEqual(self.ids(search(Task.objects.all(), 'zzz')), [])
+        task = search(Task.objects.all(), 'django').get()
+        self.assertIn('<mark>django</mark>', highlight(task.search_snippet))
+
+    def test_index_follows_related_changes(self):
+        skill = Skill.objects.create(name='Carpentry')
+        self.fence.skills.add(skill)
+        self.assertEqual(self.ids(search(Task.objects.all(), 'carp')), [self.fence.pk])
+        skill.name = 'Woodwork'
+        skill.save()
+        self.assertEqual(self.ids(search(Task.objects.all(), 'carp')), [])
+        self.assertEqual(self.ids(search(Task.objects.all(), 'wood')), [self.fence.pk])
+        self.website.delete()
+        self.assertEqual(self.ids(search(Task.objects.all(), 'djang')), [])
+
+    def test_ranking(self):
+        Task.objects.create(name='Garden', desc='x', created_by=self.user)
+        Task.objects.create(name='y', desc='something about a garden', created_by=self.user)
+        ranked = list(search(Task.objects.all(), 'garden').order_by('search_rank'))
+        self.assertEqual(ranked[0].name, 'Garden')
+
+    def test_query_without_words_is_ordered_by_rank(self):
+        for query in ('!!', '   ', ''):
+            tasks = search(Task.objects.all(), query).order_by('search_rank', '-created_at')
+            self.assertEqual(self.ids(tasks), [self.website.pk, self.fence.pk])
+            self.assertEqual({task.search_snippet for task in tasks}, {''})
+
+    def test_views_with_query_without_words(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('project:api_search_projects'), {'q': '!!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([project['id'] for project in response.json()['results']], [self.project.pk])
+        response = self.client.get(reverse('task:api_task_search'), {'search': '!!', 'sort': 'relevance'})
+        self.assertEqual(response.status_code, 200)
+        request = RequestFactory().get(reverse('intros:list'), {'search': '!!'})
+        request.user = self.user
+        view = IntroListView()
+        view.setup(request)
+        self.assertEqual(list(view.get_queryset()), [])
+
+
+class VisibilityQuerySetTests(TestCase):
+    """The visibility querysets search_all() filters with agree with the per-object checks"""
+
+    def setUp(self):
+        self.owner, self.member, self.moderator, self.outsider, self.staff = [
+            User.objects.create_user(name) for name in ('owner', 'member', 'moderator', 'outsider', 'staff')
+        ]
+        self.staff.is_staff = True
+        self.staff.save()
+        for i, visibility in enumerate(['public', 'logged_in', 'restricted', 'private']):
+            project = Project.objects.create(name=f'p{i}', visibility=visibility, created_by=self.owner)
+            project.add_member(self.member, 'VIEWER')
+            project.add_member(self.moderator, 'MODERATOR')
+            for need_visibility in ('public', 'members', 'admins'):
+                Need.objects.create(name='n', desc='d', to_project=project, visibility=need_visibility)
+        Need.objects.create(name='n', desc='d', visibility='members')
+        for visibility in ('public', 'logged_in', 'restricted'):
+            Task.objects.create(name='t', desc='d', created_by=self.owner, visibility=visibility)
+
+    def users(self):
+        return [User.objects.get(pk=user.pk) for user in
+                (self.owner, self.member, self.moderator, self.outsider, self.staff)] + [AnonymousUser()]
+
+    def assertSameRows(self, model, check):
+        for user in self.users():
+            expected = {obj.pk for obj in model.objects.all() if check(obj, user)}
+            self.assertEqual(set(model.objects.visible_to(user).values_list('pk', flat=True)), expected, user)
+
+    def test_projects(self):
+        self.assertSameRows(Project, lambda project, user: project.user_can_view(user))
+
+    def test_tasks(self):
+        self.assertSameRows(Task, lambda task, user: can_view_task(user, task))
+
+    def test_needs(self):
+        self.assertSameRows(Need, lambda need, user: bool(need.user_can_view(user)))
+
+
+class UnifiedSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice')
+        self.owner = User.objects.create_user('olga')
+        self.python = Skill.objects.create(name='Python')
+        self.public = Project.objects.create(name='Garden public', created_by=self.owner, visibility='public')
+        self.private = Project.objects.create(name='Garden secret', created_by=self.owner, visibility='private')
+        self.task = Task.objects.create(name='Garden beds', desc='d', created_by=self.owner, to_project=self.public)
+        self.task.skills.add(self.python)
+        Task.objects.create(name='Garden restricted', desc='d', created_by=self.owner, visibility='restricted')
+        Need.objects.create(
+            name='Garden tools', desc='d', created_by=self.owner, to_project=self.private, visibility='members'
+        )
+        self.problem = Problem.objects.create(name='Garden flooding', desc='d', created_by=self.owner, to_project=self.public)
+        self.problem.skills.add(self.python)
+
+    def hits(self, results):
+        return sorted((hit['type'], hit['id']) for hit in results['results'])
+
+    def test_results_and_facets_only_cover_visible_rows(self):
+        results = search_all('garden', AnonymousUser())
+        self.assertEqual(self.hits(results), sorted([
+            ('project', self.public.pk), ('task', self.task.pk), ('problem', self.problem.pk),
+        ]))
+        self.assertEqual(results['facets']['type'], {'project': 1, 'task': 1, 'problem': 1})
+        self.assertEqual(results['facets']['skill'], {str(self.python.pk): 2})
+        self.assertEqual(search_all('garden', self.user)['total'], 3)
+        Membership.objects.create(user=self.user, project=self.private)
+        self.assertEqual(search_all('garden', User.objects.get(pk=self.user.pk))['total'], 5)
+        self.assertEqual(search_all('garden', self.owner)['total'], 6)
+
+    def test_filters_and_paging(self):
+        results = search_all('garden', self.owner, filters={'skill': [str(self.python.pk)]})
+        self.assertEqual(self.hits(results), sorted([('task', self.task.pk), ('problem', self.problem.pk)]))
+        self.assertEqual(search_all('garden', self.owner, types=['task'])['total'], 2)
+        first = search_all('garden', self.owner, limit=4)['results']
+        second = search_all('garden', self.owner, offset=4, limit=4)['results']
+        self.assertEqual(len(first) + len(second), 6)
+        self.assertFalse({(hit['type'], hit['id']) for hit in first} & {(hit['type'], hit['id']) for hit in second})
+
+    def test_facets_follow_changes(self):
+        self.task.status = 'completed'
+        self.task.save()
+        facets = SearchFacet.objects.filter(index='task', object_id=self.task.pk)
+        self.assertTrue(facets.filter(facet='status', value='completed').exists())
+        self.task.skills.clear()
+        self.assertFalse(facets.filter(facet='skill').exists())
+        self.task.delete()
+        self.assertFalse(facets.exists())
+
+    def test_queries_without_words_find_nothing(self):
+        for query in ('', '!!'):
+            self.assertEqual(search_all(query, self.owner)['total'], 0)
+
+
+class ProjectFacetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('olga')
+        self.first = Project.objects.create(name='First', created_by=self.user)
+        self.second = Project.objects.create(name='Second', created_by=self.user)
+        self.task = Task.objects.create(name='Task', desc='d', created_by=self.user, to_project=self.first)
+        self.need = Need.objects.create(name='Need', desc='d', to_project=self.first)
+
+    def projects(self, index, obj):
+        return set(SearchFacet.objects.filter(
+            index=index, object_id=obj.pk, facet='project'
+        ).values_list('value', flat=True))
+
+    def test_problems_take_the_project_of_their_task_or_need(self):
+        on_task = Problem.objects.create(name='Leak', desc='d', to_task=self.task)
+        on_need = Problem.objects.create(name='Leak', desc='d', to_need=self.need)
+        self.assertEqual(self.projects('problem', on_task), {str(self.first.pk)})
+        self.assertEqual(self.projects('problem', on_need), {str(self.first.pk)})
+        self.assertEqual(
+            search_all('leak', self.user, filters={'project': [str(self.first.pk)]})['total'], 2
+        )
+
+        self.task.to_project = self.second
+        self.task.save()
+        self.need.to_project = None
+        self.need.save()
+        self.assertEqual(self.projects('problem', on_task), {str(self.second.pk)})
+        self.assertEqual(self.projects('problem', on_need), set())
+        self.assertEqual(
+            set(Problem.objects.for_project(self.second).values_list('pk', flat=True)),
+            {int(pk) for pk in SearchFacet.objects.filter(
+                index='problem', facet='project', value=str(self.second.pk)
+            ).values_list('object_id', flat=True)},
+        )
+
+    def test_intros_take_the_projects_of_their_entities(self):
+        intro = Intro.objects.create(name='Intro', summary='s', desc='d', by_user=self.user)
+        self.assertEqual(self.projects('intro', intro), set())
+        relation = IntroRelation.objects.create(intro=intro, to_task=self.task, linked_by=self.user)
+        self.assertEqual(self.projects('intro', intro), {str(self.first.pk)})
+        self.task.to_project = self.second
+        self.task.save()
+        self.assertEqual(self.projects('intro', intro), {str(self.second.pk)})
+        relation.delete()
+        self.assertEqual(self.projects('intro', intro), set())
@@ -0,0 +1,93 @@
+from django.http import JsonResponse
+
+from project.models import Project
+from skills.models import Skill
+from search.index import search_all
+from search.indexes import registry
+
+
+FACETS = ('type', 'status', 'skill', 'project')
+FACET_FILTERS = ('status', 'skill', 'project')
+
+
+def _split(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _facet_labels(request, facets):
+    """Display labels for facet values; projects the user cannot see are dropped"""
+    labels = {
+        'type': {
+            index.name: str(index.model._meta.verbose_name_plural).title()
+            for index in registry
+        },
+    }
+    if facets.get('project'):
+        labels['project'] = {
+            str(pk): name
+            for pk, name in Project.objects.visible_to(request.user).filter(
+                pk__in=[int(pk) for pk in facets['project']]
+            ).values_list('pk', 'name')
+        }
+    if facets.get('skill'):
+        labels['skill'] = {
+            str(pk): name
+            for pk, name in Skill.objects.filter(
+                pk__in=[int(pk) for pk in facets['skill']]
+            ).values_list('pk', 'name')
+        }
+    return labels
+
+
+def api_search(request):
+    """
+    Search projects, tasks, needs, problems and intros at once.
+
+    GET parameters: q (text), types, status, skill, project (comma-separated
+    facet values to narrow by), page and per_page. Returns relevance-ordered
+    results of mixed types plus facet counts for the whole result set.
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+        per_page = min(max(int(request.GET.get('per_page', 20)), 1), 50)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid page'}, status=400)
+
+    filters = {facet: _split(request.GET.get(facet, '')) for facet in FACET_FILTERS}
+    found = search_all(
+        query,
+        request.user,
+        types=_split(request.GET.get('types', '')),
+        filters=filters,
+        offset=(page - 1) * per_page,
+        limit=per_page,
+    )
+
+    labels = _facet_labels(request, found['facets'])
+    facets = {}
+    for facet in FACETS:
+        counts = found['facets'].get(facet, {})
+        facet_labels = labels.get(facet)
+        facets[facet] = sorted(
+            (
+                {
+                    'value': value,
+                    'label': facet_labels[value] if facet_labels else value,
+                    'count': count,
+                }
+                for value, count in counts.items()
+                if facet_labels is None or value in facet_labels
+            ),
+            key=lambda item: (-item['count'], item['label']),
+        )
+
+    return JsonResponse({
+        'query': query,
+        'results': found['results'],
+        'total': found['total'],
+        'page': page,
+        'per_page': per_page,
+        'has_next': page * per_page < found['total'],
+        'facets': facets,
+    })
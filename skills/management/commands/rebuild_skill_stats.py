@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from skills.models import SkillStats
+
+
+class Command(BaseCommand):
+    help = 'Recount the per-skill project/task/need/problem/submission counts in SkillStats'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = SkillStats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt stats for {count} skills'))
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+RELATIONS = (
+    ('project_count', 'project', 'Project', 'skills'),
+    ('task_count', 'task', 'Task', 'skills'),
+    ('need_count', 'need', 'Need', 'required_skills'),
+    ('problem_count', 'problems', 'Problem', 'skills'),
+    ('submission_count', 'submissions', 'Submission', 'relevant_skills'),
+)
+
+
+def count_skills(apps, schema_editor):
+    Skill = apps.get_model('skills', 'Skill')
+    SkillStats = apps.get_model('skills', 'SkillStats')
+    stats = {pk: SkillStats(skill_id=pk) for pk in Skill.objects.values_list('pk', flat=True)}
+    for count_field, app_label, model_name, field_name in RELATIONS:
+        through = apps.get_model(app_label, model_name)._meta.get_field(field_name).remote_field.through
+        for row in through.objects.values('skill_id').annotate(total=Count('pk')).order_by():
+            setattr(stats[row['skill_id']], count_field, row['total'])
+    SkillStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skills', '0001_initial'),
+        ('project', '0005_alter_membership_is_member'),
+        ('task', '0003_alter_task_options_task_actual_hours_task_due_date_and_more'),
+        ('need', '0002_need_main_project'),
+        ('problems', '0001_initial'),
+        ('submissions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillStats',
+            fields=[
+                ('skill', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='skills.skill')),
+                ('project_count', models.PositiveIntegerField(default=0)),
+                ('task_count', models.PositiveIntegerField(default=0)),
+                ('need_count', models.PositiveIntegerField(default=0)),
+                ('problem_count', models.PositiveIntegerField(default=0)),
+                ('submission_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'skill stats',
+            },
+        ),
+        migrations.RunPython(count_skills, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,11 @@
+from collections import defaultdict
+
+from django.apps import apps
 from django.db import models
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 class Skill(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -24,4 +30,91 @@ class Skill(models.Model):
             return cls.objects.create(name=name.strip().title())
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+# (count field, model label, m2m field to Skill) kept in SkillStats
+SKILL_STAT_RELATIONS = (
+    ('project_count', 'project.Project', 'skills'),
+    ('task_count', 'task.Task', 'skills'),
+    ('need_count', 'need.Need', 'required_skills'),
+    ('problem_count', 'problems.Problem', 'skills'),
+    ('submission_count', 'submissions.Submission', 'relevant_skills'),
+)
+
+
+class SkillStats(models.Model):
+    """Per-skill usage counts, kept up to date by skills.signals"""
+    skill = models.OneToOneField(Skill, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    project_count = models.PositiveIntegerField(default=0)
+    task_count = models.PositiveIntegerField(default=0)
+    need_count = models.PositiveIntegerField(default=0)
+    problem_count = models.PositiveIntegerField(default=0)
+    submission_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNT_FIELDS = [relation[0] for relation in SKILL_STAT_RELATIONS]
+
+    class Meta:
+        verbose_name_plural = 'skill stats'
+
+    def __str__(self):
+        return f'Stats for {self.skill_id}'
+
+    @staticmethod
+    def through_model(model_label, field_name):
+        return apps.get_model(model_label)._meta.get_field(field_name).remote_field.through
+
+    @classmethod
+    def for_skill(cls, skill):
+        """Stats row of a skill, or an unsaved all-zero one"""
+        try:
+            return skill.stats
+        except cls.DoesNotExist:
+            return cls(skill=skill)
+
+    @classmethod
+    def adjust(cls, count_field, deltas):
+        """Apply {skill_id: delta} to one count with set-based updates"""
+        deltas = {skill_id: delta for skill_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        cls.objects.bulk_create(
+            [cls(skill_id=skill_id) for skill_id in deltas], ignore_conflicts=True
+        )
+        by_delta = defaultdict(list)
+        for skill_id, delta in deltas.items():
+            by_delta[delta].append(skill_id)
+        for delta, skill_ids in by_delta.items():
+            cls.objects.filter(skill_id__in=skill_ids).update(**{
+                count_field: Greatest(F(count_field) + delta, 0),
+                'updated_at': timezone.now(),
+            })
+
+    @classmethod
+    def rebuild(cls, skill_ids=None):
+        """Recount from the m2m tables: one GROUP BY per relation and one upsert"""
+        counts = defaultdict(dict)
+        for count_field, model_label, field_name in SKILL_STAT_RELATIONS:
+            rows = cls.through_model(model_label, field_name).objects.values('skill_id')
+            if skill_ids is not None:
+                rows = rows.filter(skill_id__in=skill_ids)
+            for row in rows.annotate(total=Count('pk')).order_by():
+                counts[row['skill_id']][count_field] = row['total']
+
+        skills = Skill.objects.all()
+        if skill_ids is not None:
+            skills = skills.filter(pk__in=skill_ids)
+        stats = [
+            cls(skill_id=skill_id, **{
+                field: counts[skill_id].get(field, 0) for field in cls.COUNT_FIELDS
+            })
+            for skill_id in skills.values_list('pk', flat=True)
+        ]
+        cls.objects.bulk_create(
+            stats,
+            update_conflicts=True,
+            unique_fields=['skill'],
+            update_fields=[*cls.COUNT_FIELDS, 'updated_at'],
+            batch_size=500,
+        )
+        return len(stats)
@@ -0,0 +1,73 @@
+"""
+Keep SkillStats counts in step with the skill relations of projects, tasks,
+needs, problems and submissions.
+
+Adds are counted from the signal's pk_set, which Django limits to new rows.
+Removals, clears and deletions of the owning object look up the rows that
+actually existed first, since their pk_set (if any) is not filtered.
+"""
+from django.apps import apps
+from django.db.models.signals import m2m_changed, pre_delete, post_delete
+
+from skills.models import SkillStats, SKILL_STAT_RELATIONS
+
+
+def _existing(through, source_field, instance, reverse, pk_set):
+    """Skill ids (or, in reverse, the owner count) a remove/clear will drop"""
+    rows = through.objects.all()
+    if reverse:
+        rows = rows.filter(skill_id=instance.pk)
+        if pk_set is not None:
+            rows = rows.filter(**{f'{source_field}__in': pk_set})
+        return {instance.pk: rows.count()}
+    rows = rows.filter(**{source_field: instance.pk})
+    if pk_set is not None:
+        rows = rows.filter(skill_id__in=pk_set)
+    return {skill_id: 1 for skill_id in rows.values_list('skill_id', flat=True)}
+
+
+def _m2m_receiver(count_field, through, source_field):
+    def count_skills(sender, instance, action, reverse, pk_set, **kwargs):
+        if action == 'post_add':
+            deltas = {instance.pk: len(pk_set)} if reverse else dict.fromkeys(pk_set, 1)
+            SkillStats.adjust(count_field, deltas)
+        elif action in ('pre_remove', 'pre_clear'):
+            pending = instance.__dict__.setdefault('_skill_stats_pending', {})
+            pending[count_field] = _existing(
+                through, source_field, instance, reverse,
+                pk_set if action == 'pre_remove' else None,
+            )
+        elif action in ('post_remove', 'post_clear'):
+            pending = instance.__dict__.get('_skill_stats_pending', {}).pop(count_field, {})
+            SkillStats.adjust(count_field, {
+                skill_id: -count for skill_id, count in pending.items()
+            })
+    return count_skills
+
+
+def _delete_receivers(count_field, field_name):
+    def remember_skills(sender, instance, **kwargs):
+        instance.__dict__.setdefault('_skill_stats_deleted', {})[count_field] = list(
+            getattr(instance, field_name).values_list('pk', flat=True)
+        )
+
+    def count_deleted(sender, instance, **kwargs):
+        skill_ids = instance.__dict__.get('_skill_stats_deleted', {}).pop(count_field, [])
+        SkillStats.adjust(count_field, dict.fromkeys(skill_ids, -1))
+
+    return remember_skills, count_deleted
+
+
+def connect():
+    for count_field, model_label, field_name in SKILL_STAT_RELATIONS:
+        model = apps.get_model(model_label)
+        field = model._meta.get_field(field_name)
+        through = field.remote_field.through
+        m2m_changed.connect(
+            _m2m_receiver(count_field, through, f'{field.m2m_field_name()}_id'),
+            sender=through,
+            weak=False,
+        )
+        remember_skills, count_deleted = _delete_receivers(count_field, field_name)
+        pre_delete.connect(remember_skills, sender=model, weak=False)
+        post_delete.connect(count_deleted, sender=model, weak=False)
@@ -1,3 +1,89 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from need.models import Need
+from problems.models import Problem
+from project.models import Project
+from skills.models import Skill, SkillStats
+from task.models import Task
+
+
+def stats_snapshot():
+    rows = SkillStats.objects.values_list('skill_id', *SkillStats.COUNT_FIELDS)
+    return sorted(row for row in rows if any(row[1:]))
+
+
+class SkillStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('olga')
+        self.python, self.django, self.rust = [
+            Skill.objects.create(name=name) for name in ('Python', 'Django', 'Rust')
+        ]
+
+    def counts(self, skill, field):
+        return getattr(SkillStats.for_skill(Skill.objects.get(pk=skill.pk)), field)
+
+    def assertMatchesRebuild(self):
+        live = stats_snapshot()
+        SkillStats.objects.all().delete()
+        SkillStats.rebuild()
+        self.assertEqual(stats_snapshot(), live)
+
+    def test_relation_changes_move_counts(self):
+        task = Task.objects.create(name='t', desc='d', created_by=self.user)
+        task.skills.add(self.python, self.django)
+        task.skills.add(self.python)
+        self.assertEqual(self.counts(self.python, 'task_count'), 1)
+        task.skills.remove(self.django, self.rust)
+        self.assertEqual(self.counts(self.django, 'task_count'), 0)
+
+        other = Task.objects.create(name='t2', desc='d', created_by=self.user)
+        self.python.task_set.add(other)
+        self.assertEqual(self.counts(self.python, 'task_count'), 2)
+        self.python.task_set.clear()
+        self.assertEqual(self.counts(self.python, 'task_count'), 0)
+        self.assertMatchesRebuild()
+
+    def test_deleting_an_owner_releases_its_skills(self):
+        project = Project.objects.create(name='p', created_by=self.user)
+        project.skills.add(self.python)
+        need = Need.objects.create(name='n', desc='d')
+        need.required_skills.add(self.python, self.rust)
+        problem = Problem.objects.create(name='x', desc='d', to_project=project)
+        problem.skills.set([self.rust])
+        self.assertEqual(self.counts(self.rust, 'need_count'), 1)
+        self.assertEqual(self.counts(self.rust, 'problem_count'), 1)
+
+        need.delete()
+        problem.delete()
+        self.assertEqual(self.counts(self.rust, 'need_count'), 0)
+        self.assertEqual(self.counts(self.rust, 'problem_count'), 0)
+        self.assertEqual(self.counts(self.python, 'project_count'), 1)
+        self.assertMatchesRebuild()
+
+
+class SkillDetailTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('olga')
+        self.skill = Skill.objects.create(name='Python')
+        for visibility in ('public', 'logged_in', 'restricted'):
+            Task.objects.create(name=visibility, desc='d', created_by=self.user, visibility=visibility).skills.add(
+                self.skill
+            )
+        Project.objects.create(name='hidden', visibility='private', created_by=self.user).skills.add(self.skill)
+
+    def counts(self):
+        response = self.client.get(reverse('skill_detail', args=[self.skill.pk]))
+        self.assertEqual(response.status_code, 200)
+        return response.context['counts']
+
+    def test_counts_only_cover_visible_items(self):
+        counts = self.counts()
+        self.assertEqual((counts['projects'], counts['tasks']), (0, 1))
+        self.client.force_login(User.objects.create_user('alice'))
+        counts = self.counts()
+        self.assertEqual((counts['projects'], counts['tasks']), (0, 2))
+        self.client.force_login(self.user)
+        counts = self.counts()
+        self.assertEqual((counts['projects'], counts['tasks']), (1, 3))
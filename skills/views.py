@@ -10,6 +10,7 @@ from project.models import Project
 from task.models import Task
 from problems.models import Problem
 from need.models import Need
+from search.autocomplete import search_skills, popular_skills
 
 
 class SkillListCreateView(generics.ListCreateAPIView):
@@ -26,25 +27,19 @@ def api_skills_autocomplete(request):
     query = request.GET.get('q', '').strip()
     
     if not query:
-        # Return popular skills when no query provided
-        skills = Skill.objects.annotate(
-            task_count=Count('task')
-        ).order_by('-task_count', 'name')[:50]
+        # Return the most used skills when no query provided
+        skills = popular_skills(50)
     else:
         if len(query) < 2:
             return JsonResponse({'skills': []})
         
         # Filter skills based on query
-        skills = Skill.objects.filter(
-            name__icontains=query
-        ).annotate(
-            task_count=Count('task')
-        ).order_by('-task_count', 'name')[:20]
+        skills = search_skills(query, 20)
     
     skills_data = [
         {
-            'name': skill.name,
-            'task_count': getattr(skill, 'task_count', 0)
+            'name': skill['name'],
+            'task_count': skill['task_count']
         }
         for skill in skills
     ]
@@ -52,20 +47,31 @@ def api_skills_autocomplete(request):
     return JsonResponse({'skills': skills_data})
 
 
+SKILL_PAGE_ITEMS = 20
+
+
 def skill_detail(request, skill_id):
     # Use get_object_or_404 for cleaner error handling
     skill = get_object_or_404(Skill, id=skill_id)
     
-    projects = Project.objects.filter(skills=skill)
-    tasks = Task.objects.filter(skills=skill)
-    needs = Need.objects.filter(required_skills=skill)
-    problems = Problem.objects.filter(skills=skill)
+    # Counted over what the user can see, like the lists of the latest items
+    user = request.user
+    projects = Project.objects.visible_to(user).filter(skills=skill)
+    tasks = Task.objects.visible_to(user).filter(skills=skill)
+    needs = Need.objects.visible_to(user).filter(required_skills=skill)
+    problems = Problem.objects.visible_to(user).filter(skills=skill)
     context ={
         'skill': skill,
-        'projects': projects,
-        'tasks': tasks,
-        'needs': needs,
-        'problems': problems
+        'counts': {
+            'projects': projects.count(),
+            'tasks': tasks.count(),
+            'needs': needs.count(),
+            'problems': problems.count(),
+        },
+        'projects': projects.order_by('-id')[:SKILL_PAGE_ITEMS],
+        'tasks': tasks.order_by('-created_at')[:SKILL_PAGE_ITEMS],
+        'needs': needs.order_by('-created_date')[:SKILL_PAGE_ITEMS],
+        'problems': problems.order_by('-created_at')[:SKILL_PAGE_ITEMS]
 
     }
     return render(request, 'skills/projects_with_skill.html', context=context)
\ No newline at end of file
@@ -40,6 +40,13 @@ class Submission(models.Model):
     class Meta:
         unique_together = (('applicant', 'to_project'), ('applicant', 'to_task'))
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so the applicant can be told when it changes
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
     def clean(self):
         if not self.to_project and not self.to_task and not self.to_need:
             raise ValidationError('A submission must be linked to either a project, task or need.')
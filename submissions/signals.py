@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.urls import reverse
+
+from notifications.outbox import emit
+
+from .models import Submission
+
+
+@receiver(post_save, sender=Submission)
+def notify_status_change(sender, instance, created, raw=False, **kwargs):
+    """Queue a notification for the applicant when a reviewer changes the status"""
+    if raw or created:
+        return
+    if instance.status != getattr(instance, '_loaded_status', instance.status):
+        target = instance.to_project or instance.to_task or instance.to_need
+        emit(
+            instance.applicant_id,
+            'submission',
+            f"Your application to {target} is now {instance.get_status_display().lower()}",
+            group=f'submission:{instance.pk}',
+            url=reverse('submissions:submission_detail', args=[instance.pk]),
+        )
+    instance._loaded_status = instance.status
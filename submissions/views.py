@@ -17,6 +17,7 @@ from task.models import Task
 from need.models import Need
 from skills.models import Skill
 from messaging.models import Conversation
+from search.index import search
 
 
 @login_required
@@ -223,17 +224,13 @@ def submission_list(request, content_type, content_id):
     if status_filter:
         submissions = submissions.filter(status=status_filter)
     if search_query:
-        submissions = submissions.filter(
-            Q(applicant__username__icontains=search_query) |
-            Q(applicant__first_name__icontains=search_query) |
-            Q(applicant__last_name__icontains=search_query) |
-            Q(why_fit__icontains=search_query) |
-            Q(additional_info__icontains=search_query)
-        )
+        submissions = search(submissions, search_query)
 
     valid_sort_fields = ['submitted_at', '-submitted_at', 'status', '-status',
                          'applicant__username', '-applicant__username']
-    if sort_by in valid_sort_fields:
+    if sort_by == 'relevance' and search_query:
+        submissions = submissions.order_by('search_rank', '-submitted_at')
+    elif sort_by in valid_sort_fields:
         submissions = submissions.order_by(sort_by)
     else:
         submissions = submissions.order_by('-submitted_at')
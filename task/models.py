@@ -3,6 +3,20 @@ from django.utils import timezone
 from django.conf import settings
 from skills.models import Skill
 
+
+class TaskQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Tasks the user can view; same rules as task.views.can_view_task"""
+        if not user or not user.is_authenticated:
+            return self.filter(visibility='public')
+        if user.is_staff or user.is_superuser:
+            return self.filter(visibility__in=['public', 'logged_in', 'restricted'])
+        return self.filter(
+            models.Q(visibility__in=['public', 'logged_in']) |
+            models.Q(visibility='restricted', created_by=user)
+        )
+
+
 class Task(models.Model):
     PRIORITY_CHOICES = [
         (1, 'Low'),
@@ -54,6 +68,8 @@ class Task(models.Model):
     
     # Skills relationship
     skills = models.ManyToManyField('skills.Skill', blank=True)
+
+    objects = TaskQuerySet.as_manager()
     
     # Comment permission fields
     allow_anonymous_comments = models.BooleanField(
@@ -71,6 +87,14 @@ class Task(models.Model):
                 self.main_project = self.to_task.main_project
         
         super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored project so moving the task refreshes both projects' stats
+        instance._loaded_to_project_id = instance.__dict__.get('to_project_id')
+        return instance
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
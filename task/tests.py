@@ -1,3 +1,27 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from skills.models import Skill
+from task.models import Task
+
+
+class FilterOptionsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='x')
+        self.python = Skill.objects.create(name='Python')
+        self.secret = Skill.objects.create(name='Lockpicking')
+        for visibility in ('public', 'public', 'logged_in', 'restricted'):
+            task = Task.objects.create(name='t', desc='d', created_by=self.user, visibility=visibility)
+            task.skills.add(self.python)
+        Task.objects.create(name='s', desc='d', created_by=self.user, visibility='restricted').skills.add(self.secret)
+
+    def skill_counts(self):
+        response = self.client.get(reverse('task:api_filter_options'))
+        self.assertEqual(response.status_code, 200)
+        return {skill['name']: skill['task_count'] for skill in response.json()['skills']}
+
+    def test_counts_only_tasks_the_viewer_can_see(self):
+        self.assertEqual(self.skill_counts(), {'Python': 2})
+        self.client.force_login(self.user)
+        self.assertEqual(self.skill_counts(), {'Python': 3})
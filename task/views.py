@@ -10,9 +10,12 @@ from django.template.loader import render_to_string
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from .models import Task
 from .forms import TaskForm
-from comment.models import Comment, CommentVote
+from comment.models import Comment
 from skills.models import Skill
 from project.models import Project
+from search.index import search, highlight
+from search.autocomplete import search_skills, popular_skills
+from feed.recommend import recommended
 from django.contrib.auth.decorators import login_required
 import json
 
@@ -28,27 +31,13 @@ def task_detail(request, task_id):
         return redirect('task:task_list')
     
     # Fetch top-level comments with all necessary relations
+    # Load the whole reply tree and the user's votes in a fixed number of queries
     comments = Comment.objects.filter(
         to_task=task_id, 
         parent__isnull=True
-    ).select_related('user').prefetch_related(
-        Prefetch('replies', queryset=Comment.objects.select_related('user')),
-        'votes')
-    
-    # Add user vote status to comments
-    for comment in comments:
-        if request.user.is_authenticated:
-            user_vote = comment.votes.filter(user=request.user).first()
-            comment.user_vote = user_vote.vote_type if user_vote else None
-        else:
-            comment.user_vote = None
-
-        for reply in comment.replies.all():
-            if request.user.is_authenticated:
-                reply_vote = reply.votes.filter(user=request.user).first()
-                reply.user_vote = reply_vote.vote_type if reply_vote else None
-            else:
-                reply.user_vote = None
+    ).select_related('user').with_user_vote(request.user).with_changelog().with_reply_tree(
+        Comment.objects.select_related('user').with_user_vote(request.user).with_changelog()
+    )
 
     context = {
         "task": task,
@@ -74,6 +63,7 @@ def task_list(request):
         'projects': projects,
         'skills': skills,
         'total_tasks': total_tasks,
+        'recommended': recommended(request.user, 'task'),
     }
     
     return render(request, 'task_list.html', context)
@@ -102,7 +92,12 @@ def api_task_search(request):
     
     # Apply sorting
     sort_by = request.GET.get('sort', '-created_at')
-    queryset = queryset.order_by(sort_by)
+    if sort_by != 'relevance':
+        queryset = queryset.order_by(sort_by)
+    elif request.GET.get('search', '').strip():
+        queryset = queryset.order_by('search_rank', '-created_at')
+    else:
+        queryset = queryset.order_by('-created_at')
     
     # Pagination
     page = int(request.GET.get('page', 1))
@@ -145,6 +140,7 @@ def api_task_search(request):
             'can_edit': request.user.is_authenticated and request.user == task.created_by,
             'estimated_hours': task.estimated_hours,
             'actual_hours': task.actual_hours,
+            'snippet': highlight(getattr(task, 'search_snippet', '')),
         }
         tasks_data.append(task_data)
     
@@ -216,14 +212,9 @@ def apply_task_filters(queryset, params):
     Apply filters to task queryset based on GET parameters.
     """
     # Search filter
-    search = params.get('search', '').strip()
-    if search:
-        queryset = queryset.filter(
-            Q(name__icontains=search) |
-            Q(desc__icontains=search) |
-            Q(skills__name__icontains=search) |
-            Q(created_by__username__icontains=search)
-        ).distinct()
+    query = params.get('search', '').strip()
+    if query:
+        queryset = search(queryset, query)
     
     # Project filter
     projects = params.get('projects', '').strip()
@@ -551,25 +542,19 @@ def api_skills_autocomplete(request):
     query = request.GET.get('q', '').strip()
     
     if not query:
-        # Return top skills when no query provided (for initial autocomplete data)
-        skills = Skill.objects.annotate(
-            task_count=Count('task')
-        ).order_by('-task_count', 'name')[:50]  # Get top 50 most used skills
+        # Return the most used skills when no query provided
+        skills = popular_skills(50)
     else:
         if len(query) < 2:
             return JsonResponse({'skills': []})
         
         # Filter skills based on query
-        skills = Skill.objects.filter(
-            name__icontains=query
-        ).annotate(
-            task_count=Count('task')
-        ).order_by('-task_count', 'name')[:20]
+        skills = search_skills(query, 20)
     
     skills_data = [
         {
-            'name': skill.name,
-            'task_count': skill.task_count
+            'name': skill['name'],
+            'task_count': skill['task_count']
         }
         for skill in skills
     ]
@@ -589,9 +574,11 @@ def api_filter_options(request):
         task__in=visible_tasks
     ).distinct().order_by('name').values('id', 'name')
     
+    # Counted over the tasks the viewer can see, so they match the filtered
+    # list; SkillStats totals include tasks hidden from them
     skills = Skill.objects.filter(
         task__in=visible_tasks
-    ).distinct().annotate(
+    ).annotate(
         task_count=Count('task')
     ).order_by('-task_count', 'name').values('name', 'task_count')
     
@@ -3,6 +3,10 @@ ASGI config for todonet project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the project through an ASGI server (e.g. ``uvicorn todonet.asgi:application``)
+to keep the messaging event stream (messaging.views.event_stream) open; under
+WSGI it falls back to one batch of events per request.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
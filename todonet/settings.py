@@ -72,6 +72,10 @@ INSTALLED_APPS = [
     'plans',
     'problems',
     'intros',  
+    'search.apps.SearchConfig',
+    'feed.apps.FeedConfig',
+    'notifications.apps.NotificationsConfig',
+    'jobs.apps.JobsConfig',
 
 
 ]
@@ -82,6 +86,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'utils.middleware.ProjectPermissionsMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -118,6 +123,19 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory is per process; switch to
+# 'django.core.cache.backends.filebased.FileBasedCache' with a LOCATION
+# to share cached entries between worker processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -174,4 +192,50 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Queue comment vote score changes and apply them with `manage.py flush_comment_votes`
+COMMENT_VOTE_BUFFERING = False
+
+# Membership/permission cache used by utils.permissions (timeout in seconds);
+# None keeps permissions cached within a request only
+PERMISSION_CACHE_ALIAS = 'default'
+PERMISSION_CACHE_TIMEOUT = 300
+
+# Real-time messaging events (messaging.events); the broker only reaches
+# clients of the same process, point this at a shared implementation to scale out
+MESSAGING_EVENT_BROKER = 'messaging.events.InProcessBroker'
+MESSAGING_EVENT_TIMEOUT = 25
+
+# Seconds before the in-memory skill/user autocomplete indexes (search.autocomplete) are reloaded
+AUTOCOMPLETE_INDEX_TTL = 300
+
+# Seconds before the in-memory user x skill matrix used for volunteer matching (need.matching) is reloaded
+VOLUNTEER_MATRIX_TTL = 600
+
+# Recommendations kept per user and kind by manage.py build_feed (feed.recommend)
+FEED_ITEMS_PER_KIND = 30
+
+# Rendered comment nodes (comment.fragment_cache): cache alias and seconds an entry is kept
+COMMENT_FRAGMENT_CACHE_ALIAS = 'default'
+COMMENT_FRAGMENT_CACHE_TIMEOUT = 300
+
+# Every n-th stored revision of a comment's text is a full snapshot, the rest are deltas (comment.history)
+COMMENT_HISTORY_SNAPSHOT_INTERVAL = 10
+
+# Notification outbox (notifications.dispatch), delivered by `manage.py send_notifications --loop`
+# (see README): seconds a user's events are held so they can be combined, where digests
+# are emailed, and the prefix making inbox links absolute
+NOTIFICATION_DIGEST_DELAY = 60
+NOTIFICATION_EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+NOTIFICATION_SITE_URL = ''
+
+# Background jobs (jobs.queue), run by `manage.py run_jobs --loop` next to the web server
+# (see README). JOBS_RUN_INLINE calls deferred tasks in the request's process once it
+# commits instead, so a development server needs no worker; turn it off in production
+# only together with starting the worker
+JOBS_RUN_INLINE = DEBUG
+# Seconds before a failed job is retried (doubling per attempt), and before a job
+# left running by a worker that died is claimed again
+JOBS_RETRY_DELAY = 30
+JOBS_LOCK_TIMEOUT = 600
@@ -23,7 +23,9 @@ urlpatterns = [
 
     path('favicon.ico', RedirectView.as_view(url=settings.STATIC_URL + 'favicon.ico', permanent=True)),
     path("messages/", include("messaging.urls")),
+    path("notifications/", include("notifications.urls")),
     path("problems/", include("problems.urls")),  # Problems app URLs
+    path('api/search/', include('search.urls')),
     path('api/', include('problems.api_urls')),
     path("intros/", include("intros.urls")),  # Intros app URLs
 ]
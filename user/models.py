@@ -33,6 +33,31 @@ def generate_avatar_upload_path(instance, filename):
         return f'avatars/fallback_{timestamp}.webp'
 
 
+def remove_avatar_files(name):
+    """Delete an avatar file and the ImageKit variants generated from it"""
+    try:
+        if default_storage.exists(name):
+            default_storage.delete(name)
+
+        # Clean up ImageKit generated files
+        old_hash = os.path.basename(name).split('.')[0]
+        cache_dir = os.path.join(settings.MEDIA_ROOT, 'CACHE', 'images', 'avatars')
+
+        if os.path.exists(cache_dir):
+            for cache_file in os.listdir(cache_dir):
+                if cache_file.startswith(old_hash):
+                    cache_file_path = os.path.join(cache_dir, cache_file)
+                    try:
+                        os.remove(cache_file_path)
+                    except OSError:
+                        pass  # File might already be gone
+
+    except Exception as e:
+        import logging
+        logger = logging.getLogger(__name__)
+        logger.warning(f"Failed to cleanup old avatar: {e}")
+
+
 class UserProfile(models.Model):
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
@@ -110,36 +135,16 @@ class UserProfile(models.Model):
         return bool(self.avatar and self.avatar.name)
     
     def cleanup_old_avatar(self, old_avatar_field):
-        """Clean up old avatar files"""
-        if not old_avatar_field:
-            return
-            
-        try:
-            # Delete the physical file
-            if hasattr(old_avatar_field, 'path') and os.path.isfile(old_avatar_field.path):
-                os.remove(old_avatar_field.path)
-                
-            # Clean up ImageKit generated files
-            old_hash = os.path.basename(old_avatar_field.name).split('.')[0]
-            cache_dir = os.path.join(settings.MEDIA_ROOT, 'CACHE', 'images', 'avatars')
-            
-            if os.path.exists(cache_dir):
-                for cache_file in os.listdir(cache_dir):
-                    if cache_file.startswith(old_hash):
-                        cache_file_path = os.path.join(cache_dir, cache_file)
-                        try:
-                            os.remove(cache_file_path)
-                        except OSError:
-                            pass  # File might already be gone
-                            
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Failed to cleanup old avatar: {e}")
+        """Clean up old avatar files in the background"""
+        from user.tasks import remove_avatar_files
+        if old_avatar_field and old_avatar_field.name:
+            remove_avatar_files.defer(old_avatar_field.name)
     
     def save(self, *args, **kwargs):
         """Override save to handle old avatar cleanup"""
+        from user.tasks import generate_avatar_specs
         old_avatar = None
+        avatar_changed = not self.pk
         
         # Get old avatar for cleanup if this is an update
         if self.pk:
@@ -147,8 +152,9 @@ class UserProfile(models.Model):
                 old_profile = UserProfile.objects.get(pk=self.pk)
                 if old_profile.avatar != self.avatar:
                     old_avatar = old_profile.avatar
+                    avatar_changed = True
             except UserProfile.DoesNotExist:
-                pass
+                avatar_changed = True
         
         # Save the profile
         super().save(*args, **kwargs)
@@ -156,6 +162,9 @@ class UserProfile(models.Model):
         # Clean up old avatar after successful save
         if old_avatar:
             self.cleanup_old_avatar(old_avatar)
+        # Render the smaller variants off the request
+        if avatar_changed and self.has_avatar():
+            generate_avatar_specs.defer(self.pk)
     
     def delete(self, *args, **kwargs):
         """Clean up avatar files when profile is deleted"""
@@ -0,0 +1,18 @@
+"""Avatar image work run by manage.py run_jobs (see jobs.queue)"""
+from jobs.queue import background_task
+
+from user import models
+
+
+@background_task(dedup_key=lambda profile_id: f'avatar-specs:{profile_id}')
+def generate_avatar_specs(profile_id):
+    """Render the thumbnail and small avatar ahead of the first page that shows them"""
+    profile = models.UserProfile.objects.filter(pk=profile_id).first()
+    if profile is not None and profile.has_avatar():
+        profile.avatar_thumbnail.generate()
+        profile.avatar_small.generate()
+
+
+@background_task()
+def remove_avatar_files(name):
+    models.remove_avatar_files(name)
@@ -0,0 +1,20 @@
+from django.utils.functional import SimpleLazyObject
+
+from utils.permissions import get_project_perms
+
+
+class ProjectPermissionsMiddleware:
+    """
+    Attach a lazy request.project_perms resolver.
+
+    Nothing is queried unless a view or template asks for a permission;
+    the user's memberships are then loaded once and reused for the rest of
+    the request. Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.project_perms = SimpleLazyObject(lambda: get_project_perms(request.user))
+        return self.get_response(request)
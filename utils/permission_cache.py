@@ -0,0 +1,133 @@
+"""
+Cross-request cache of project membership flags.
+
+Entries are keyed by (user_id, project_id) and hold the project's visibility
+plus the user's Membership role flags (or None for non-members). They live in
+the cache named by PERMISSION_CACHE_ALIAS, so any Django backend works,
+including the local-memory and file-based ones; None turns the cache off.
+
+Every key also holds the project's permissions_version, which is stored on
+the Project row and replaced when one of its memberships or its visibility
+changes. Readers take the version from the project row they load for the
+request, so an entry written before a change is no longer found by any
+worker process, even when each process keeps its own local-memory cache.
+The entry of the user whose membership changed is also deleted, for
+Project instances loaded before the change.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from project.models import Project, Membership, new_permissions_version
+
+
+MEMBERSHIP_FLAGS = (
+    'role',
+    'is_moderator',
+    'is_administrator',
+    'is_owner',
+    'is_contributor',
+    'is_member',
+    'custom_permissions',
+)
+
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def get_cache():
+    """The cache holding the entries, or None when caching across requests is off"""
+    alias = getattr(settings, 'PERMISSION_CACHE_ALIAS', 'default')
+    return caches[alias] if alias is not None else None
+
+
+def get_timeout():
+    return getattr(settings, 'PERMISSION_CACHE_TIMEOUT', 300)
+
+
+def _entry_key(user_id, project_id, version):
+    return f'project_perms:{project_id}:{version}:{user_id}'
+
+
+def get_entry(user_id, project_id, version):
+    """Return the cached entry dict, or None on a miss"""
+    cache = get_cache()
+    if cache is None:
+        return None
+    entry = cache.get(_entry_key(user_id, project_id, version))
+    if entry is None:
+        _stats['misses'] += 1
+    else:
+        _stats['hits'] += 1
+    return entry
+
+
+def set_entries(user_id, entries, versions):
+    """Store {project_id: entry} for a user"""
+    cache = get_cache()
+    if cache is None:
+        return
+    cache.set_many(
+        {
+            _entry_key(user_id, project_id, versions[project_id]): entry
+            for project_id, entry in entries.items()
+        },
+        get_timeout(),
+    )
+
+
+def make_entry(visibility, membership_values=None):
+    """Build a cache entry from a project visibility and Membership values"""
+    return {
+        'visibility': visibility,
+        'membership': (
+            {field: membership_values[field] for field in MEMBERSHIP_FLAGS}
+            if membership_values is not None else None
+        ),
+    }
+
+
+def invalidate_project(project_id, user_id=None):
+    """
+    Retire every entry for a project by giving it a new permissions_version;
+    returns the new version. The old entry of user_id is deleted as well.
+    """
+    cache = get_cache()
+    if cache is not None and user_id is not None:
+        old_version = Project.objects.filter(pk=project_id).values_list(
+            'permissions_version', flat=True
+        ).first()
+        if old_version is not None:
+            cache.delete(_entry_key(user_id, project_id, old_version))
+    version = new_permissions_version()
+    Project.objects.filter(pk=project_id).update(permissions_version=version)
+    _stats['invalidations'] += 1
+    return version
+
+
+def permission_cache_stats():
+    """Hit/miss counters for this process"""
+    lookups = _stats['hits'] + _stats['misses']
+    return {
+        **_stats,
+        'hit_rate': _stats['hits'] / lookups if lookups else 0.0,
+    }
+
+
+def reset_permission_cache_stats():
+    for key in _stats:
+        _stats[key] = 0
+
+
+@receiver([post_save, post_delete], sender=Membership)
+def invalidate_membership(sender, instance, **kwargs):
+    version = invalidate_project(instance.project_id, instance.user_id)
+    if Membership.project.is_cached(instance):
+        instance.project.permissions_version = version
+
+
+@receiver(post_save, sender=Project)
+def invalidate_project_visibility(sender, instance, created, **kwargs):
+    if not created and instance.visibility != getattr(instance, '_loaded_visibility', None):
+        instance.permissions_version = invalidate_project(instance.pk)
+    instance._loaded_visibility = instance.visibility
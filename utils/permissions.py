@@ -2,7 +2,266 @@ from functools import wraps
 from django.shortcuts import redirect, get_object_or_404
 from django.http import HttpResponseForbidden
 from django.contrib import messages
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from project.models import Project, Membership
+from utils import permission_cache
+
+
+# Bumped whenever a Membership row changes so resolvers built earlier in the
+# same process reload instead of answering from a stale snapshot.
+_membership_generation = 0
+
+
+@receiver([post_save, post_delete], sender=Membership)
+def bump_membership_generation(sender, **kwargs):
+    global _membership_generation
+    _membership_generation += 1
+
+
+def get_project_id(obj):
+    """
+    Return the id of the project an object belongs to.
+
+    Accepts a Project, a project id, or anything attached to a project
+    (tasks, needs, problems, comments, intros).
+    """
+    if obj is None or isinstance(obj, int):
+        return obj
+    if isinstance(obj, Project):
+        return obj.pk
+    for field in ('to_project_id', 'main_project_id'):
+        project_id = getattr(obj, field, None)
+        if project_id:
+            return project_id
+    for parent in ('to_task', 'to_need', 'to_problem'):
+        if getattr(obj, f'{parent}_id', None):
+            return get_project_id(getattr(obj, parent))
+    return None
+
+
+class MembershipFlags:
+    """Role flags of a Membership as held in the permission cache"""
+
+    def __init__(self, values):
+        for field in permission_cache.MEMBERSHIP_FLAGS:
+            setattr(self, field, values.get(field))
+
+
+class ProjectPermissions:
+    """
+    Answers project permission checks for one user from memory.
+
+    Lookups go to the cross-request permission cache first when one is
+    configured (see utils.permission_cache). On the first miss all of the user's Membership
+    rows are loaded with a single query and written back to the cache; every
+    later check in the request is a dictionary lookup.
+    Use get_project_perms(user) (or request.project_perms) rather than
+    instantiating this directly so the resolver is shared for the request.
+    """
+
+    ACTIONS = ('view', 'comment', 'contribute', 'moderate', 'admin')
+
+    def __init__(self, user):
+        self.user = user
+        self._reset()
+
+    def _reset(self):
+        # project id -> (visibility, MembershipFlags or None)
+        self._entries = {}
+        self._versions = {}
+        self._loaded = False
+        self._generation = _membership_generation
+
+    def _remember(self, project_id, entry):
+        membership = entry['membership']
+        self._entries[project_id] = (
+            entry['visibility'],
+            MembershipFlags(membership) if membership is not None else None,
+        )
+
+    def _load_memberships(self):
+        """Load every membership of the user and write them to the cache"""
+        rows = Membership.objects.filter(user=self.user).values(
+            'project_id', 'project__visibility', 'project__permissions_version',
+            *permission_cache.MEMBERSHIP_FLAGS
+        )
+        entries = {}
+        for row in rows:
+            entries[row['project_id']] = permission_cache.make_entry(row['project__visibility'], row)
+            self._versions[row['project_id']] = row['project__permissions_version']
+        permission_cache.set_entries(self.user.pk, entries, self._versions)
+        for project_id, entry in entries.items():
+            self._remember(project_id, entry)
+        self._loaded = True
+
+    def _entry(self, project):
+        """Return (visibility, MembershipFlags or None), or None if there is no such project"""
+        if self._generation != _membership_generation:
+            self._reset()
+        project_id = get_project_id(project)
+        if project_id in self._entries:
+            return self._entries[project_id]
+
+        if isinstance(project, Project):
+            visibility = project.visibility
+            self._versions.setdefault(project_id, project.permissions_version)
+        else:
+            row = Project.objects.filter(pk=project_id).values_list(
+                'visibility', 'permissions_version'
+            ).first()
+            if row is None:
+                return None
+            visibility, self._versions[project_id] = row
+        entry = permission_cache.get_entry(self.user.pk, project_id, self._versions[project_id])
+        if entry is None and not self._loaded:
+            self._load_memberships()
+            if project_id in self._entries:
+                return self._entries[project_id]
+        if entry is None:
+            # Not a member; remember the project's visibility for id-only checks
+            entry = permission_cache.make_entry(visibility)
+            permission_cache.set_entries(self.user.pk, {project_id: entry}, self._versions)
+        self._remember(project_id, entry)
+        return self._entries[project_id]
+
+    def membership(self, project):
+        """Return the user's MembershipFlags for a project (or id), None for non-members"""
+        if not self.user or not self.user.is_authenticated or project is None:
+            return None
+        entry = self._entry(project)
+        return entry[1] if entry else None
+
+    def is_member(self, project):
+        return self.membership(project) is not None
+
+    def is_creator(self, project):
+        return (
+            self.user.is_authenticated and
+            project.created_by_id is not None and
+            project.created_by_id == self.user.pk
+        )
+
+    def can_view(self, project):
+        """Same rules as Project.user_can_view"""
+        if project.visibility == 'public':
+            return True
+        if not self.user.is_authenticated:
+            return False
+        if project.visibility == 'logged_in':
+            return True
+        if project.visibility in ['restricted', 'private']:
+            return self.is_creator(project) or self.is_member(project)
+        return False
+
+    def can_comment(self, project):
+        """Same rules as Project.user_can_comment"""
+        if project.allow_anonymous_comments and project.visibility == 'public':
+            return True
+        if not self.user.is_authenticated:
+            return False
+        if project.visibility == 'logged_in':
+            return True
+        return self.is_member(project)
+
+    def can_contribute(self, project):
+        """Same rules as Project.user_can_contribute"""
+        if not self.user.is_authenticated:
+            return False
+        if self.is_creator(project):
+            return True
+        membership = self.membership(project)
+        return bool(membership and (
+            membership.is_administrator or membership.is_contributor or membership.is_moderator
+        ))
+
+    def can_moderate_comments(self, project):
+        """Same rules as Project.user_can_moderate_comments; accepts a project or id"""
+        if not self.user.is_authenticated:
+            return False
+        if self.user.is_superuser or self.user.is_staff:
+            return True
+        membership = self.membership(project)
+        return bool(membership and membership.is_moderator)
+
+    def has_permission(self, project, permission_type):
+        """Same rules as user_has_project_permission"""
+        if not self.user.is_authenticated:
+            return False
+        if self.user.is_superuser:
+            return True
+
+        membership = self.membership(project)
+        if membership is None:
+            if permission_type == 'can_view':
+                entry = self._entry(project)
+                return entry is not None and entry[0] in ['public', 'logged_in']
+            return False
+
+        if permission_type == 'can_admin':
+            return membership.is_administrator
+        elif permission_type == 'can_moderate':
+            return membership.is_moderator or membership.is_administrator
+        elif permission_type == 'can_contribute':
+            return membership.is_contributor or membership.is_moderator or membership.is_administrator
+        elif permission_type in ('can_comment', 'can_view'):
+            return True
+
+        if membership.custom_permissions and permission_type in membership.custom_permissions:
+            return membership.custom_permissions[permission_type]
+        return False
+
+    def can(self, action, objects):
+        """
+        Bulk check an action against many objects.
+
+        Each object is resolved to its project (see get_project_id) and the
+        projects are fetched in one query. Returns a dict of object pk -> bool;
+        objects without a project are denied.
+        """
+        if action not in self.ACTIONS:
+            raise ValueError(f"Unknown action '{action}'")
+        objects = list(objects)
+        project_ids = {obj: get_project_id(obj) for obj in objects}
+        projects = Project.objects.in_bulk(
+            {project_id for project_id in project_ids.values() if project_id}
+        )
+        check = {
+            'view': self.can_view,
+            'comment': self.can_comment,
+            'contribute': self.can_contribute,
+            'moderate': self.can_moderate_comments,
+            'admin': lambda project: self.has_permission(project, 'can_admin'),
+        }[action]
+
+        results = {}
+        for obj, project_id in project_ids.items():
+            project = projects.get(project_id)
+            results[getattr(obj, 'pk', obj)] = project is not None and check(project)
+        return results
+
+
+def get_project_perms(user):
+    """
+    Return the ProjectPermissions resolver for a user.
+
+    The resolver is stored on the user object itself, so every check made
+    against request.user during a request shares one Membership query.
+    """
+    perms = getattr(user, '_project_perms', None)
+    if perms is None:
+        perms = ProjectPermissions(user)
+        try:
+            user._project_perms = perms
+        except AttributeError:
+            pass
+    return perms
+
+
+def can(user, action, objects):
+    """Bulk permission check for list pages, see ProjectPermissions.can"""
+    return get_project_perms(user).can(action, objects)
+
 
 def user_has_project_permission(user, project, permission_type):
     """
@@ -20,46 +279,8 @@ def user_has_project_permission(user, project, permission_type):
     if not user.is_authenticated:
         return False
         
-    # Site-wide admin can do anything
-    if user.is_superuser:
-        return True
-        
-    # Get project instance if an ID was passed
-    if isinstance(project, int):
-        try:
-            project = Project.objects.get(id=project)
-        except Project.DoesNotExist:
-            return False
-            
-    # Check project membership
-    try:
-        membership = Membership.objects.get(user=user, project=project)
-    except Membership.DoesNotExist:
-        # User not a member, check project visibility
-        if permission_type == 'can_view' and project.visibility in ['public', 'logged_in']:
-            return True
-        return False
-    
-    # Check permission based on membership role
-    if permission_type == 'can_admin':
-        return membership.is_administrator
-    elif permission_type == 'can_moderate':
-        return membership.is_moderator or membership.is_administrator
-    elif permission_type == 'can_contribute':
-        return membership.is_contributor or membership.is_moderator or membership.is_administrator
-    elif permission_type == 'can_comment':
-        # All members can comment
-        return True
-    elif permission_type == 'can_view':
-        # All members can view
-        return True
-        
-    # Check for custom permissions
-    if membership.custom_permissions and permission_type in membership.custom_permissions:
-        return membership.custom_permissions[permission_type]
-        
-    # Default deny for unknown permission types
-    return False
+    # Memberships are resolved once per user object (i.e. once per request)
+    return get_project_perms(user).has_permission(project, permission_type)
 
 
 def requires_project_permission(permission_type, project_id_param='project_id'):
@@ -111,17 +332,10 @@ def can_moderate_comment(user, comment):
     if user.is_superuser or user.is_staff:
         return True
         
-    # For project comments, check project moderation permissions
-    if comment.to_project:
-        return user_has_project_permission(user, comment.to_project, 'can_moderate')
-        
-    # For task comments
-    if comment.to_task and comment.to_task.to_project:
-        return user_has_project_permission(user, comment.to_task.to_project, 'can_moderate')
-        
-    # For need comments
-    if comment.to_need and comment.to_need.to_project:
-        return user_has_project_permission(user, comment.to_need.to_project, 'can_moderate')
+    # For project, task and need comments, check project moderation permissions
+    project_id = get_project_id(comment)
+    if project_id:
+        return user_has_project_permission(user, project_id, 'can_moderate')
         
     # For comment replies, check the parent comment's context
     if comment.parent: